@@ -0,0 +1,3 @@
+"""
+Вспомогательные инструменты для api-тестов json-rpc и провайдерского api.
+"""
@@ -0,0 +1,98 @@
+"""
+Модуль с кэшами данных, которые не меняются в течение тестовой сессии.
+"""
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+HOST_TTL = 600
+USER_TTL = 300
+# Методы, после вызова которых закэшированные профили пользователя неактуальны
+PROFILE_METHODS = frozenset(['addProfile', 'removeProfile', 'setProfile'])
+
+
+class TtlCache:
+    """
+    Потокобезопасный словарь, значения в котором живут ttl секунд.
+    """
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._data = {}
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Возвращает значение по ключу или None, если его нет или оно устарело.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+
+            value, expires = item
+            if expires < monotonic():
+                del self._data[key]
+                return None
+
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, monotonic() + self.ttl)
+
+    def invalidate(self, key=None):
+        """
+        Сбрасывает значение по ключу, без ключа - весь кэш.
+        """
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+
+class BoundedCache:
+    """
+    Потокобезопасный словарь не больше size значений, при переполнении
+    вытесняется значение, к которому дольше всего не обращались.
+    Для данных, которые не устаревают, например результатов разбора по хэшу содержимого.
+    """
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """
+        Возвращает значение по ключу или None, если его нет.
+        """
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Ключ - (host, method): версия приложения, внешний ip и т.п.
+host_cache = TtlCache(HOST_TTL)
+# Ключ - (host, login): айдишник дефолтного профиля и uid пользователя
+user_cache = TtlCache(USER_TTL)
+
+
+def invalidate_user(host, login):
+    """
+    Сбрасывает закэшированные данные пользователя.
+    """
+    user_cache.invalidate((host, login))
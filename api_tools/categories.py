@@ -0,0 +1,150 @@
+"""
+Множества категорий фильтрации в виде битовых масок.
+
+Категории приходят списками в userFilter, setFilterCats, all_cats пресетов presetList
+и в фильтре getCategoriesDailyStats. Порядок в этих списках не важен и у разных хостов
+разный (у треди пользовательский пресет начинается с 65), поэтому списки сравниваются
+как множества. CategorySet хранит множество как int, где бит n - категория n:
+объединение, разность и проверка вложенности - одна операция над числами,
+так в переборах и нагрузочных прогонах сравниваются тысячи наборов в секунду.
+"""
+import pytest
+
+
+# Категории фильтрации, которые принимают userFilter и setFilterCats
+VALID_CATEGORIES = frozenset(range(2, 61)) | {65, 66}
+
+
+class CategorySet:
+    """
+    Неизменяемое множество категорий. Создается из любого набора номеров категорий,
+    сравнивается с другим CategorySet или со списком категорий без учета порядка.
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, categories=()):
+        mask = 0
+        for category in categories:
+            if isinstance(category, bool) or not isinstance(category, int) or category < 0:
+                raise ValueError('Номер категории должен быть неотрицательным целым: {!r}'.format(category))
+            mask |= 1 << category
+        self.mask = mask
+
+    @classmethod
+    def from_mask(cls, mask):
+        categories = cls()
+        categories.mask = mask
+
+        return categories
+
+    @classmethod
+    def coerce(cls, value):
+        return value if isinstance(value, cls) else cls(value)
+
+    def __iter__(self):
+        mask = self.mask
+        while mask:
+            lowest = mask & -mask
+            yield lowest.bit_length() - 1
+            mask ^= lowest
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return bool(self.mask)
+
+    def __contains__(self, category):
+        return isinstance(category, int) and category >= 0 and bool(self.mask >> category & 1)
+
+    def __eq__(self, other):
+        try:
+            return self.mask == self.coerce(other).mask
+        except (TypeError, ValueError):
+            return NotImplemented
+
+    def __hash__(self):
+        return hash(self.mask)
+
+    def __or__(self, other):
+        return self.from_mask(self.mask | self.coerce(other).mask)
+
+    def __and__(self, other):
+        return self.from_mask(self.mask & self.coerce(other).mask)
+
+    def __sub__(self, other):
+        return self.from_mask(self.mask & ~self.coerce(other).mask)
+
+    def __xor__(self, other):
+        return self.from_mask(self.mask ^ self.coerce(other).mask)
+
+    def __le__(self, other):
+        return self.issubset(other)
+
+    def __ge__(self, other):
+        return self.issuperset(other)
+
+    def __repr__(self):
+        return 'CategorySet({})'.format(self.to_list())
+
+    def issubset(self, other):
+        return not self.mask & ~self.coerce(other).mask
+
+    def issuperset(self, other):
+        return self.coerce(other).issubset(self)
+
+    def to_list(self):
+        """
+        Категории по возрастанию.
+
+        :return: list of int
+        """
+        return list(self)
+
+
+def diff_categories(actual, expected):
+    """
+    Понятное описание отличий набора категорий от ожидаемого.
+    Повторы в списке тоже считаются отличием.
+
+    :return: str, пустая строка, если наборы совпадают
+    """
+    actual_set = CategorySet.coerce(actual)
+    expected_set = CategorySet.coerce(expected)
+    lines = []
+
+    extra = actual_set - expected_set
+    if extra:
+        lines.append('лишние категории: {}'.format(extra.to_list()))
+    missing = expected_set - actual_set
+    if missing:
+        lines.append('нет категорий: {}'.format(missing.to_list()))
+    if not isinstance(actual, CategorySet) and len(actual) != len(actual_set):
+        repeated = sorted({category for category in actual if actual.count(category) > 1})
+        lines.append('повторяются категории: {}'.format(repeated))
+
+    return '; '.join(lines)
+
+
+def assert_categories(actual, expected, message='Набор категорий не совпадает с ожидаемым'):
+    """
+    Сравнивает набор категорий из ответа с ожидаемым без учета порядка,
+    при отличии тест падает с перечнем лишних и недостающих категорий.
+    """
+    difference = diff_categories(actual, expected)
+    if difference:
+        pytest.fail('{}: {}\nответ: {}'.format(message, difference, actual))
+
+
+def sort_preset_categories(presets):
+    """
+    Приводит all_cats пресетов из presetList к порядку по возрастанию,
+    чтобы ответы разных хостов можно было сравнивать со снапшотом.
+
+    :return: list of dict - те же пресеты
+    """
+    for preset in presets:
+        # sorted, а не CategorySet: повторы категорий должны остаться видны в сравнении
+        preset['all_cats'] = sorted(preset['all_cats'])
+
+    return presets
@@ -0,0 +1,234 @@
+"""
+Модуль с клиентом json-rpc api.
+"""
+from http.cookiejar import DefaultCookiePolicy
+from itertools import count
+from threading import Lock
+from time import perf_counter
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api_tools.cache import PROFILE_METHODS, invalidate_user
+from api_tools.jsonlib import dumps
+from api_tools.response import ApiResponse
+
+
+RPC_PATH = '/api/json/v2'
+TIMEOUT = 10
+POOL_SIZE = 10
+BATCH_SIZE = 50
+
+_sessions = {}
+# Хосты, отклонившие пакетный запрос: дальше вызовы на них уходят по одному
+_no_batch_hosts = set()
+_clients = {}
+_clients_lock = Lock()
+# Слушатели вызовов: callable(host, method, elapsed, status_code)
+_listeners = []
+
+
+def add_call_listener(listener):
+    """
+    Подписывает слушателя на все запросы клиентов.
+    Слушатель вызывается после каждого запроса с хостом, методом, временем ответа
+    в секундах и статус-кодом (None, если ответ не получен).
+    Для пакетного запроса метод - 'batch'.
+    """
+    _listeners.append(listener)
+
+
+def remove_call_listener(listener):
+    _listeners.remove(listener)
+
+
+def set_pool_size(size):
+    """
+    Задает размер пула соединений для новых сессий,
+    например под число виртуальных пользователей нагрузочного прогона.
+    """
+    global POOL_SIZE
+    POOL_SIZE = size
+
+
+def make_session(pool_size=None):
+    """
+    Создает сессию с keep-alive пулом соединений.
+
+    :return: requests.Session
+    """
+    pool_size = pool_size or POOL_SIZE
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.verify = False
+    # Сессия общая для разных пользователей хоста, cookie между ними не переносим
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    session.headers['Content-Type'] = 'application/json'
+
+    return session
+
+
+class RpcClient:
+    """
+    Клиент json-rpc api одного хоста для пары логин/пароль.
+    Параметры запроса передаются обычными python-объектами:
+    client.call('addDomain', profile_id, 'black', domain)
+    """
+    def __init__(self, host, login=None, password=None, session=None, timeout=TIMEOUT):
+        self.host = host
+        self.url = '{host}{path}'.format(host=host, path=RPC_PATH)
+        self.auth = (login, password) if login is not None else None
+        self.session = session if session is not None else make_session()
+        self.timeout = timeout
+        self._ids = count(1)
+
+    def build(self, method, *params):
+        """
+        Формирует тело json-rpc запроса.
+
+        :return: dict
+        """
+        return {'jsonrpc': '2.0', 'method': method, 'params': list(params), 'id': next(self._ids)}
+
+    def post(self, payload, stream=False):
+        """
+        Отправляет подготовленное тело запроса через пул соединений.
+        С stream=True тело ответа не загружается сразу, его читают по частям
+        через response.iter_content(), время ответа считается до получения заголовков.
+
+        :return: ApiResponse
+        """
+        method = payload['method'] if isinstance(payload, dict) else 'batch'
+        status_code = None
+        started = perf_counter()
+
+        try:
+            response = self.session.post(
+                self.url, data=dumps(payload), auth=self.auth, timeout=self.timeout, stream=stream,
+            )
+            status_code = response.status_code
+        except (ReadTimeout, ConnectionError):
+            pytest.fail('Время установки соединения превышает предельно допустимое значение')
+        finally:
+            elapsed = perf_counter() - started
+            for listener in _listeners:
+                listener(self.host, method, elapsed, status_code)
+
+        return ApiResponse(response)
+
+    def call(self, method, *params):
+        """
+        Вызов метода json-rpc api.
+
+        :return: ApiResponse
+        """
+        self.invalidate(method)
+
+        return self.post(self.build(method, *params))
+
+    def stream(self, method, *params):
+        """
+        Вызов метода с потоковым чтением ответа, для больших ответов.
+        Соединение возвращается в пул после того, как ответ прочитан до конца или закрыт.
+
+        :return: ApiResponse
+        """
+        self.invalidate(method)
+
+        return self.post(self.build(method, *params), stream=True)
+
+    def batch(self, calls, batch_size=BATCH_SIZE):
+        """
+        Пакетный вызов json-rpc 2.0. calls - список кортежей (method, *params).
+        В один запрос уходит не более batch_size вызовов, ответы сопоставляются
+        с вызовами по id. Если хост не принимает пакеты, вызовы отправляются
+        по одному через то же keep-alive соединение.
+
+        :return: list of dict - ответы в порядке вызовов
+        """
+        for call in calls:
+            self.invalidate(call[0])
+
+        payloads = [self.build(*call) for call in calls]
+        replies = []
+
+        for start in range(0, len(payloads), batch_size):
+            chunk = payloads[start:start + batch_size]
+
+            if self.host not in _no_batch_hosts:
+                chunk_replies = self._post_batch(chunk)
+                if chunk_replies is not None:
+                    replies.extend(chunk_replies)
+                    continue
+                _no_batch_hosts.add(self.host)
+
+            replies.extend(self.post(payload).body for payload in chunk)
+
+        return replies
+
+    def invalidate(self, method):
+        """
+        Сбрасывает кэш профилей пользователя перед вызовом метода, меняющего профили.
+        """
+        if method in PROFILE_METHODS and self.auth is not None:
+            invalidate_user(self.host, self.auth[0])
+
+    def _post_batch(self, payloads):
+        """
+        Отправляет пакет и разбирает ответы по id.
+        Возвращает None, если хост ответил не массивом, т.е. пакеты не поддерживает.
+
+        :return: list of dict or None
+        """
+        response = self.post(payloads)
+
+        try:
+            body = response.body
+        except ValueError:
+            return None
+
+        if not isinstance(body, list):
+            return None
+
+        replies = {reply.get('id'): reply for reply in body if isinstance(reply, dict)}
+        missing = [payload['id'] for payload in payloads if payload['id'] not in replies]
+        if missing:
+            pytest.fail('В пакетном ответе отсутствуют ответы для id {}: {}'.format(missing, body))
+
+        return [replies[payload['id']] for payload in payloads]
+
+
+def get_rpc_client(host, login=None, password=None):
+    """
+    Возвращает клиента для хоста и пары логин/пароль.
+    Все клиенты одного хоста делят общий пул соединений,
+    поэтому соединение не открывается заново ни на запрос, ни на пользователя.
+
+    :return: RpcClient
+    """
+    key = (host, login, password)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = make_session()
+            client = _clients[key] = RpcClient(host, login, password, session=session)
+
+    return client
+
+
+def close_rpc_clients():
+    """
+    Закрывает пулы соединений всех хостов и сбрасывает клиентов.
+    """
+    with _clients_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _clients.clear()
@@ -0,0 +1,184 @@
+"""
+Модуль проверки списков доменов (black, white, alias) под полной нагрузкой.
+
+Список заполняется до лимита тарифа шагами по step доменов, домены шага добавляются
+параллельно. После каждого шага замеряется время addDomain и чтения списка domains,
+так видно, как время ответа зависит от размера списка. На полном списке замеряется
+clearDomains и проверяется, что домен сверх лимита не добавляется.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import pytest
+
+from api_tools.ip_pool import allocate_ips, release_ip
+from api_tools.load import percentile
+
+
+# Лимит каждого списка берется из возможностей тарифа в userInfo
+LIST_LIMIT_FEATURES = {
+    'black': 'black_list_size',
+    'white': 'white_list_size',
+    'alias': 'aliases_list_size',
+}
+STEP = 10
+CONCURRENCY = 8
+
+
+def get_list_limits(client):
+    """
+    Лимиты списков доменов тарифа пользователя.
+
+    :return: dict {list_type: limit}
+    """
+    features = client.call('userInfo').result['plan']['features']
+
+    try:
+        return {list_type: features[feature] for list_type, feature in LIST_LIMIT_FEATURES.items()}
+    except KeyError:
+        pytest.fail('Ошибка поиска лимитов списков в возможностях тарифа: {}'.format(features))
+
+
+def make_domain(list_type, number):
+    return 'scale-{}.{}.domain.ru'.format(number, list_type)
+
+
+class DomainListScale:
+    """
+    Заполнение списков доменов одного профиля до лимита с замерами времени.
+    """
+    def __init__(self, client, profile_id, step=STEP, concurrency=CONCURRENCY):
+        self.client = client
+        self.profile_id = profile_id
+        self.step = step
+        self.concurrency = concurrency
+        # Адреса для alias-доменов, включая адрес для домена сверх лимита
+        self._addresses = {}
+
+    def timed_call(self, method, *params):
+        """
+        :return: tuple(время ответа в мс, ApiResponse)
+        """
+        started = perf_counter()
+        response = self.client.call(method, *params)
+
+        return (perf_counter() - started) * 1000, response
+
+    def add(self, list_type, number, address=None):
+        params = [self.profile_id, list_type, make_domain(list_type, number)]
+        if address is not None:
+            params.append(address)
+
+        return self.timed_call('addDomain', *params)
+
+    def fill(self, list_type, limit):
+        """
+        Заполняет список до лимита.
+
+        :return: list of dict - замеры после каждого шага
+        """
+        addresses = allocate_ips(limit + 1) if list_type == 'alias' else [None] * (limit + 1)
+        self._addresses[list_type] = addresses
+        rows = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for start in range(0, limit, self.step):
+                numbers = range(start, min(start + self.step, limit))
+                timings = []
+                for elapsed, response in executor.map(lambda n: self.add(list_type, n, addresses[n]), numbers):
+                    if 'error' in response.body:
+                        pytest.fail('Ошибка добавления домена в список {} размера {}: {}'.format(
+                            list_type, start, response.body))
+                    timings.append(elapsed)
+
+                elapsed, response = self.timed_call('domains', self.profile_id, list_type)
+                size = len(response.result)
+                assert size == numbers.stop, 'В списке {} {} доменов вместо {}'.format(list_type, size, numbers.stop)
+
+                timings.sort()
+                rows.append({
+                    'size': size,
+                    'add_p50': round(percentile(timings, 50), 2),
+                    'add_max': round(timings[-1], 2),
+                    'domains': round(elapsed, 2),
+                })
+
+        return rows
+
+    def overflow(self, list_type, limit):
+        """
+        Пытается добавить домен сверх лимита.
+
+        :return: dict - ошибка из ответа
+        """
+        _, response = self.add(list_type, limit, self._addresses[list_type][limit])
+
+        assert 'result' not in response.body, 'Домен добавлен в полный список {} ({} доменов): {}'.format(
+            list_type, limit, response.body)
+
+        return response.error
+
+    def clear(self, list_type):
+        """
+        Очищает полный список.
+
+        :return: время clearDomains в мс
+        """
+        elapsed, response = self.timed_call('clearDomains', self.profile_id, list_type)
+        if 'error' in response.body:
+            pytest.fail('Ошибка очистки списка {}: {}'.format(list_type, response.body))
+
+        assert not self.client.call('domains', self.profile_id, list_type).result, \
+            'Список {} не очищен'.format(list_type)
+
+        if list_type == 'alias':
+            release_ip(*self._addresses[list_type])
+
+        return round(elapsed, 2)
+
+    def run(self, limits):
+        """
+        Прогон по всем спискам.
+
+        :return: dict {list_type: {'limit', 'rows', 'clear', 'overflow_error'}}
+        """
+        report = {}
+
+        for list_type, limit in limits.items():
+            rows = self.fill(list_type, limit)
+            error = self.overflow(list_type, limit)
+            report[list_type] = {
+                'limit': limit,
+                'rows': rows,
+                'clear': self.clear(list_type),
+                'overflow_error': error.get('message'),
+            }
+
+        return report
+
+
+def format_report(report):
+    """
+    Отчет в виде таблицы: время ответа (мс) в зависимости от размера списка.
+    """
+    lines = []
+
+    for list_type, stats in report.items():
+        lines.append('Список {} (лимит {}), clearDomains: {} мс, ошибка сверх лимита: {}'.format(
+            list_type, stats['limit'], stats['clear'], stats['overflow_error']))
+        lines.append('{:>8}{:>12}{:>12}{:>12}'.format('size', 'add_p50', 'add_max', 'domains'))
+        for row in stats['rows']:
+            lines.append('{size:>8}{add_p50:>12}{add_max:>12}{domains:>12}'.format(**row))
+
+    return '\n'.join(lines)
+
+
+def latency_growth(rows, key='add_p50', window=2):
+    """
+    Во сколько раз время ответа на полном списке больше, чем на пустом.
+    Сравниваются минимумы первых и последних window шагов, чтобы единичный всплеск
+    времени ответа не считался ростом.
+    """
+    first = min(row[key] for row in rows[:window]) or 1
+
+    return min(row[key] for row in rows[-window:]) / first
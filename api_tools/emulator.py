@@ -0,0 +1,689 @@
+"""
+Локальный эмулятор json-rpc api xorp/tredy (/api/json/v2) на asyncio.
+
+Хранит состояние пользователей в памяти, поддерживает пакетные запросы json-rpc 2.0,
+keep-alive соединения и искусственную задержку ответа. Используется как герметичная
+цель для замеров клиента, пакетных вызовов и параллельного запуска тестов.
+
+Запуск отдельным процессом:
+    python -m api_tools.emulator --flavour tredy --port 8080 --latency 0.05
+
+Запуск из кода:
+    emulator = Emulator('xorp')
+    host = emulator.start_in_thread()
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta, timezone
+from itertools import count
+from threading import Event, Thread
+from uuid import uuid4
+
+from api_tools.categories import VALID_CATEGORIES
+from api_tools.jsonlib import dumps, loads
+
+
+RPC_PATH = '/api/json/v2'
+LIST_TYPES = ('black', 'white', 'alias')
+MINUTES_IN_WEEK = 7 * 24 * 60
+# Методы, которые вызываются без авторизации
+PUBLIC_METHODS = frozenset(['register', 'testAuth', 'getPlans'])
+
+FLAVOURS = {
+    'xorp': {
+        'plan_name': 'Домашний',
+        'tz': 3.0,
+        'tz_minutes': 180.0,
+        'list_size': 100,
+        'plans_amount': 13,
+        'presets_amount': 48,
+        'default_categories': [3, 4, 6, 9, 11, 12, 13, 16, 18],
+        'advertising': ['http://www.skydns.ru/', 'https://www.xorp.ru/'],
+    },
+    'tredy': {
+        'plan_name': 'Safe@Home',
+        'tz': -5.0,
+        'tz_minutes': -300,
+        'list_size': 50,
+        'plans_amount': 30,
+        'presets_amount': 3,
+        'default_categories': [3, 4, 6, 7, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 65],
+        'advertising': ['http://www.safedns.com/', 'https://www.tredy.ru/'],
+    },
+}
+PLAN_FEATURES = {
+    'aliases_list_size': 15,
+    'agent_ip_mode': False,
+    'safe_search': True,
+    'max_profiles': 3,
+    'white_list_mode': True,
+    'show_dns_listen_addr': False,
+}
+CATEGORY_GROUPS = [
+    ('Security', [3, 4, 12]),
+    ('Illegal Activity', [6, 7, 8, 9, 10, 11, 19, 31, 65, 66]),
+    ('Adult Related', [13, 14, 15, 16, 17, 18]),
+    ('Bandwidth Hogs', [20, 21, 22, 23, 24]),
+    ('Time Wasters', [5, 26, 27, 28, 29, 30]),
+    ('General Sites', list(range(32, 61))),
+]
+PRESETS = [
+    {
+        'is_custom': False, 'is_combine': True, 'name': 'Kids', 'icon': 'kids',
+        'all_cats': [3, 4, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 26],
+        'white_list_only': False, 'safe_search_enabled': True, 'block_ads': False,
+        'safe_youtube_enabled': True, 'id': 23, 'block_unknown_sites': False,
+        'description': 'Block Illegal Activity, Adult Related, Ads, Torrent & P2P, Chats & Messenger, '
+        'Weapons websites. Force Safe Search and Youtube Restricted Mode.'
+    },
+    {
+        'is_custom': False, 'is_combine': False, 'name': 'Block All', 'icon': 'block_all', 'all_cats': [],
+        'white_list_only': False, 'safe_search_enabled': False, 'block_ads': False, 'safe_youtube_enabled': False,
+        'id': 21, 'block_unknown_sites': False, 'description': 'Block all, no internet.'
+    },
+    {
+        'is_custom': False, 'is_combine': False, 'name': 'Allow All', 'icon': 'allow_all', 'all_cats': [],
+        'white_list_only': False, 'safe_search_enabled': False, 'block_ads': False, 'safe_youtube_enabled': False,
+        'id': 22, 'block_unknown_sites': False, 'description': 'Nothing blocked.'
+    },
+    {
+        'is_custom': True, 'is_combine': False, 'name': 'Custom', 'icon': 'custom', 'all_cats': [],
+        'white_list_only': False, 'safe_search_enabled': False, 'block_ads': False, 'safe_youtube_enabled': False,
+        'id': None, 'block_unknown_sites': False, 'description': None
+    },
+]
+PUBLIC_ADDRESS = '195.46.39.39'
+STATUS_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found'}
+
+
+class RpcError(Exception):
+    """
+    Ошибка выполнения метода, отдается клиенту в поле error.
+    """
+    def __init__(self, name, message, code=-32602, status=200):
+        Exception.__init__(self, message)
+        self.name = name
+        self.message = message
+        self.code = code
+        self.status = status
+
+    def to_dict(self):
+        return {'code': self.code, 'name': self.name, 'message': '{}: {}'.format(self.name, self.message)}
+
+
+def invalid_params(message):
+    return RpcError('JsonRpcInvalidParamsError', message)
+
+
+def is_enabled(flag):
+    """
+    Флаги приходят и json-значениями, и строками 'true'/'' - приводим к bool.
+    """
+    if isinstance(flag, str):
+        return flag.lower() not in ('', 'false', '0')
+
+    return bool(flag)
+
+
+def schedule_activity(schedule, minute):
+    """
+    Активность фильтрации по расписанию в заданную минуту недели.
+    schedule - отсортированный список переходов [[минута недели, активность], ...].
+
+    :return: list [активность, минута недели следующего переключения или -1]
+    """
+    if not schedule:
+        return [True, -1]
+
+    active = schedule[-1][1]
+    next_change = schedule[0][0]
+
+    for start, state in schedule:
+        if start > minute:
+            next_change = start
+            break
+        active = state
+
+    return [active, next_change]
+
+
+def default_categories_tree():
+    """
+    Дерево категорий фильтрации в формате метода categories.
+    """
+    return [
+        {'items': [{'id': cat, 'title': 'Category {}'.format(cat)} for cat in cats], 'title': title}
+        for title, cats in CATEGORY_GROUPS
+    ]
+
+
+class Emulator:
+    """
+    Эмулятор api одного хоста.
+
+    :param flavour: 'xorp' или 'tredy' - набор тарифов, размеров списков и пресетов
+    :param latency: задержка ответа в секундах, число или словарь {метод: задержка}
+    :param categories: дерево категорий для метода categories
+    """
+    def __init__(self, flavour='xorp', latency=0, categories=None):
+        self.flavour = FLAVOURS[flavour]
+        self.latency = latency
+        self.categories = categories if categories is not None else default_categories_tree()
+        self.users = {}
+        self.host = None
+        self._ids = count(1)
+        self._loop = None
+        self._server = None
+
+    # Сетевая часть
+
+    async def handle(self, reader, writer):
+        """
+        Обслуживает одно keep-alive соединение.
+        """
+        peer = writer.get_extra_info('peername')[0]
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                http_method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                if http_method != 'POST' or path.split('?')[0] != RPC_PATH:
+                    status, reply = 404, {'error': {'name': 'NotFound', 'message': 'Not Found'}}
+                else:
+                    status, reply = await self.dispatch(body, peer, headers.get('authorization'))
+
+                data = dumps(reply) if reply is not None else b''
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                head = (
+                    'HTTP/1.1 {status} {reason}\r\n'
+                    'Content-Type: application/json\r\n'
+                    'Content-Length: {length}\r\n'
+                    'Connection: {connection}\r\n\r\n'
+                ).format(
+                    status=status, reason=STATUS_REASONS.get(status, ''), length=len(data),
+                    connection='keep-alive' if keep_alive else 'close',
+                )
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, body, peer, authorization):
+        """
+        Разбирает тело запроса, одиночного или пакетного, и выполняет вызовы.
+
+        :return: tuple(http-статус, тело ответа)
+        """
+        try:
+            payload = loads(body)
+        except ValueError:
+            return 400, {'jsonrpc': '2.0', 'id': None, 'error': {
+                'code': -32700, 'name': 'JsonRpcParseError', 'message': 'JsonRpcParseError: Parse error',
+            }}
+
+        user = self.authenticate(authorization)
+
+        if isinstance(payload, list):
+            if not payload:
+                error = RpcError('JsonRpcInvalidRequestError', 'Empty batch', -32600)
+                return 200, {'jsonrpc': '2.0', 'id': None, 'error': error.to_dict()}
+
+            replies = []
+            for request in payload:
+                _, reply = await self.call(request, user, peer)
+                replies.append(reply)
+            return 200, replies
+
+        return await self.call(payload, user, peer)
+
+    async def call(self, request, user, peer):
+        """
+        Выполняет один вызов json-rpc.
+
+        :return: tuple(http-статус, ответ)
+        """
+        request_id = request.get('id') if isinstance(request, dict) else None
+
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+                raise RpcError('JsonRpcInvalidRequestError', 'Invalid request', -32600)
+
+            method = request['method']
+            params = request.get('params', [])
+            handler = getattr(self, 'rpc_' + method, None)
+            if handler is None:
+                raise RpcError('JsonRpcMethodNotFoundError', 'Method not found', -32601, status=404)
+            if not isinstance(params, list):
+                raise invalid_params('Params must be an array')
+            if user is None and method not in PUBLIC_METHODS:
+                raise RpcError('JsonRpcUnauthorizedError', 'Authentication required', -32001)
+
+            delay = self.get_latency(method)
+            if delay:
+                await asyncio.sleep(delay)
+
+            try:
+                result = handler(user, peer, *params)
+            except TypeError:
+                raise invalid_params('Wrong number of params')
+            except (KeyError, IndexError, ValueError, AttributeError):
+                raise invalid_params('Wrong params')
+        except RpcError as error:
+            return error.status, {'jsonrpc': '2.0', 'id': request_id, 'error': error.to_dict()}
+
+        return 200, {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    def authenticate(self, authorization):
+        """
+        Проверяет basic-авторизацию.
+
+        :return: dict пользователя или None
+        """
+        if not authorization or not authorization.startswith('Basic '):
+            return None
+
+        try:
+            login, _, password = base64.b64decode(authorization[6:]).decode('utf-8').partition(':')
+        except (binascii.Error, UnicodeDecodeError):
+            return None
+
+        user = self.users.get(login)
+        if user is None or user['password'] != password:
+            return None
+
+        return user
+
+    def get_latency(self, method):
+        if isinstance(self.latency, dict):
+            return self.latency.get(method, 0)
+
+        return self.latency
+
+    # Запуск
+
+    async def serve(self, host='127.0.0.1', port=0):
+        """
+        Запускает сервер в текущем event loop.
+
+        :return: asyncio.Server
+        """
+        self._server = await asyncio.start_server(self.handle, host, port)
+        address, port = self._server.sockets[0].getsockname()[:2]
+        self.host = 'http://{}:{}'.format(address, port)
+
+        return self._server
+
+    def start_in_thread(self, host='127.0.0.1', port=0):
+        """
+        Запускает сервер в отдельном потоке со своим event loop.
+
+        :return: str - адрес хоста для клиента, например http://127.0.0.1:34567
+        """
+        started = Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        Thread(target=run, daemon=True).start()
+        started.wait()
+
+        return self.host
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    # Состояние
+
+    def new_profile(self, user, name, default=False):
+        profile_id = next(self._ids)
+        user['profiles'][profile_id] = {
+            'id': profile_id,
+            'name': name,
+            'default': default,
+            'token': next(self._ids),
+            'white_list_only': False,
+            'safe_search_enabled': False,
+            'is_schedule_enabled': False,
+            'safe_youtube_enabled': False,
+            'block_unknown_enabled': False,
+        }
+        user['state'][profile_id] = {
+            'domains': {list_type: {} for list_type in LIST_TYPES},
+            'categories': set(self.flavour['default_categories']),
+            'schedule': [],
+            'presets': [user['custom_preset']],
+            'stats': [],
+        }
+
+        return user['profiles'][profile_id]
+
+    def get_profile(self, user, profile_id):
+        profile = user['profiles'].get(profile_id)
+        if profile is None:
+            raise invalid_params('Profile does not exist')
+
+        return profile
+
+    def get_state(self, user, profile_id):
+        self.get_profile(user, profile_id)
+
+        return user['state'][profile_id]
+
+    def add_stats(self, login, profile_id, rows):
+        """
+        Добавляет профилю пользователя записи статистики, которые отдает getCategoriesDailyStats.
+        Не метод api: вызывается из кода, например генератором синтетической статистики.
+        """
+        self.get_state(self.users[login], profile_id)['stats'].extend(rows)
+
+    def default_profile_id(self, user):
+        return [profile['id'] for profile in user['profiles'].values() if profile['default']][0]
+
+    def week_minute(self, user):
+        """
+        Текущая минута недели (с понедельника) в часовом поясе пользователя.
+        """
+        now = datetime.now(timezone.utc) + timedelta(minutes=self.flavour['tz_minutes'])
+
+        return now.weekday() * 24 * 60 + now.hour * 60 + now.minute
+
+    # Методы api. Первые два аргумента - пользователь и ip клиента, далее params запроса
+
+    def rpc_register(self, user, peer, login, password):
+        if login in self.users:
+            raise invalid_params('User already exists')
+
+        new_user = {
+            'id': next(self._ids),
+            'password': password,
+            'profiles': {},
+            'state': {},
+            'uids': {},
+            'custom_preset': next(self._ids),
+            'feedback': [],
+        }
+        self.users[login] = new_user
+        self.new_profile(new_user, 'Default', default=True)
+
+        return [True]
+
+    def rpc_testAuth(self, user, peer, login, password):
+        registered = self.users.get(login)
+
+        return registered is not None and registered['password'] == password
+
+    def rpc_getPlans(self, user, peer):
+        return [
+            [plan_id, 'PLAN-{}'.format(plan_id), 'Plan {}'.format(plan_id), 0, 30, True, False]
+            for plan_id in range(1, self.flavour['plans_amount'] + 1)
+        ]
+
+    def rpc_getPlan(self, user, peer):
+        return {'isMobile': True, 'expired': 15, 'name': self.flavour['plan_name'], 'code': 'PREMIUM'}
+
+    def rpc_userInfo(self, user, peer):
+        features = dict(PLAN_FEATURES)
+        features['black_list_size'] = self.flavour['list_size']
+        features['white_list_size'] = self.flavour['list_size']
+
+        return {
+            'plan': {'code': 'PREMIUM', 'name': self.flavour['plan_name'], 'features': features},
+            'tz': self.flavour['tz'],
+            'tz_minutes': self.flavour['tz_minutes'],
+        }
+
+    def rpc_getAPCVersion(self, user, peer):
+        return {'current': 1, 'minimalSupported': 0}
+
+    def rpc_myip(self, user, peer):
+        return peer
+
+    def rpc_systemInfo(self, user, peer):
+        return {
+            'blockapi': PUBLIC_ADDRESS,
+            'blockpage_token': PUBLIC_ADDRESS,
+            'public_dns': [PUBLIC_ADDRESS],
+            'nxdomain': PUBLIC_ADDRESS,
+            'blockpage': PUBLIC_ADDRESS,
+        }
+
+    def rpc_getAdvertising(self, user, peer):
+        return list(self.flavour['advertising'])
+
+    def rpc_feedback(self, user, peer, title, message):
+        user['feedback'].append((title, message))
+
+    def rpc_categories(self, user, peer):
+        return self.categories
+
+    def rpc_profiles(self, user, peer):
+        return list(user['profiles'].values())
+
+    def rpc_addProfile(self, user, peer, name):
+        if len(user['profiles']) >= PLAN_FEATURES['max_profiles']:
+            raise invalid_params('Profiles limit is reached')
+
+        return self.new_profile(user, name)
+
+    def rpc_removeProfile(self, user, peer, profile_id):
+        if self.get_profile(user, profile_id)['default']:
+            raise invalid_params('Default profile is not allowed')
+
+        del user['profiles'][profile_id]
+        del user['state'][profile_id]
+        default_id = self.default_profile_id(user)
+        for uid, uid_profile_id in user['uids'].items():
+            if uid_profile_id == profile_id:
+                user['uids'][uid] = default_id
+
+    def rpc_renameProfile(self, user, peer, profile_id, name):
+        self.get_profile(user, profile_id)['name'] = name
+
+        return name
+
+    def rpc_getProfile(self, user, peer, uid, hostname, version, os_info, address):
+        if uid not in user['uids']:
+            uid = str(uuid4())
+            user['uids'][uid] = self.default_profile_id(user)
+
+        return [uid, user['id'], user['uids'][uid]]
+
+    def rpc_setProfile(self, user, peer, uid, profile_id):
+        self.get_profile(user, profile_id)
+        if uid not in user['uids']:
+            raise invalid_params('Unknown uid')
+
+        user['uids'][uid] = profile_id
+
+    def rpc_updateNic(self, user, peer, profile_id, hostname):
+        self.get_profile(user, profile_id)
+
+        return peer
+
+    def rpc_presetList(self, user, peer, profile_id, locale='en'):
+        state = self.get_state(user, profile_id)
+        custom = dict(PRESETS[-1], id=user['custom_preset'], all_cats=sorted(state['categories']))
+
+        # Реальный api отдает список пресетов json-строкой
+        return json.dumps(PRESETS[:-1] + [custom])
+
+    def rpc_getActivePresetList(self, user, peer, profile_id):
+        return json.dumps(self.get_state(user, profile_id)['presets'])
+
+    def rpc_setActivePresets(self, user, peer, profile_id, preset_ids):
+        state = self.get_state(user, profile_id)
+        for preset_id in preset_ids:
+            if not 0 < preset_id < self.flavour['presets_amount'] and preset_id != user['custom_preset']:
+                raise invalid_params('Preset does not Exist')
+
+        state['presets'] = list(preset_ids)
+
+    def rpc_setPresetSafeSearchEnabled(self, user, peer, profile_id, flag):
+        self.get_profile(user, profile_id)
+        raise invalid_params('Preset does not Exist')
+
+    def rpc_setPresetSafeYoutubeEnabled(self, user, peer, profile_id, preset, flag):
+        self.get_profile(user, profile_id)
+        raise invalid_params('Preset does not Exist')
+
+    def set_flag(self, user, profile_id, key, flag):
+        self.get_profile(user, profile_id)[key] = is_enabled(flag)
+
+    def rpc_setWhiteListOnly(self, user, peer, profile_id, flag):
+        self.set_flag(user, profile_id, 'white_list_only', flag)
+
+    def rpc_setSafeSearchEnabled(self, user, peer, profile_id, flag):
+        self.set_flag(user, profile_id, 'safe_search_enabled', flag)
+
+    def rpc_setSafeYoutubeEnabled(self, user, peer, profile_id, flag):
+        self.set_flag(user, profile_id, 'safe_youtube_enabled', flag)
+
+    def rpc_setBlockUnknownEnabled(self, user, peer, profile_id, flag):
+        self.set_flag(user, profile_id, 'block_unknown_enabled', flag)
+
+    def rpc_userFilter(self, user, peer, profile_id):
+        return sorted(self.get_state(user, profile_id)['categories'])
+
+    def rpc_setFilterCat(self, user, peer, profile_id, category, flag):
+        state = self.get_state(user, profile_id)
+        if category not in VALID_CATEGORIES:
+            raise invalid_params('Category does not exist')
+
+        if is_enabled(flag):
+            state['categories'].add(category)
+        else:
+            state['categories'].discard(category)
+
+    def rpc_setFilterCats(self, user, peer, profile_id, categories):
+        state = self.get_state(user, profile_id)
+        if not set(categories) <= VALID_CATEGORIES:
+            raise invalid_params('Category does not exist')
+
+        state['categories'] = set(categories)
+
+        return sorted(state['categories'])
+
+    def list_limit(self, list_type):
+        if list_type == 'alias':
+            return PLAN_FEATURES['aliases_list_size']
+
+        return self.flavour['list_size']
+
+    def get_domains(self, user, profile_id, list_type):
+        domains = self.get_state(user, profile_id)['domains'].get(list_type)
+        if domains is None:
+            raise invalid_params('Unknown list type')
+
+        return domains
+
+    def rpc_domains(self, user, peer, profile_id, list_type):
+        domains = self.get_domains(user, profile_id, list_type)
+
+        return [dict(item, id=domain_id) for domain_id, item in domains.items()]
+
+    def rpc_addDomain(self, user, peer, profile_id, list_type, domain, address=None):
+        domains = self.get_domains(user, profile_id, list_type)
+        if len(domains) >= self.list_limit(list_type):
+            raise invalid_params('List size limit is reached')
+        if any(item['domain'] == domain for item in domains.values()):
+            raise invalid_params('Domain already exists')
+
+        domain_id = next(self._ids)
+        domains[domain_id] = {'domain': domain, 'ip': address}
+
+        return domain_id
+
+    def rpc_removeDomain(self, user, peer, profile_id, list_type, domain_id):
+        domains = self.get_domains(user, profile_id, list_type)
+        if domains.pop(domain_id, None) is None:
+            raise invalid_params('Domain does not exist')
+
+    def rpc_clearDomains(self, user, peer, profile_id, list_type):
+        self.get_domains(user, profile_id, list_type).clear()
+
+    def rpc_setSchedule(self, user, peer, profile_id, schedule):
+        state = self.get_state(user, profile_id)
+        minutes = [minute for minute, _ in schedule]
+        if any(not isinstance(minute, int) or not 0 <= minute < MINUTES_IN_WEEK for minute in minutes):
+            raise invalid_params('Invalid schedule')
+        if minutes != sorted(set(minutes)):
+            raise invalid_params('Invalid schedule')
+
+        state['schedule'] = [[minute, bool(active)] for minute, active in schedule]
+
+        return True
+
+    def rpc_setScheduleEnabled(self, user, peer, profile_id, flag):
+        profile = self.get_profile(user, profile_id)
+        if profile['default']:
+            raise invalid_params('Default profile is not allowed')
+
+        profile['is_schedule_enabled'] = is_enabled(flag)
+
+        return True
+
+    def rpc_multiSchedule(self, user, peer, profile_id):
+        return self.get_state(user, profile_id)['schedule']
+
+    def rpc_profileScheduleActivity(self, user, peer, profile_id):
+        profile = self.get_profile(user, profile_id)
+        if profile['default'] or not profile['is_schedule_enabled']:
+            return [True, -1]
+
+        return schedule_activity(user['state'][profile_id]['schedule'], self.week_minute(user))
+
+    def rpc_getCategoriesDailyStats(self, user, peer, profile_id, locale='en', categories=None):
+        stats = self.get_state(user, profile_id)['stats']
+        if categories is None:
+            return stats
+
+        return [item for item in stats if item['category'] in categories]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Эмулятор json-rpc api xorp/tredy')
+    parser.add_argument('--flavour', choices=sorted(FLAVOURS), default='xorp')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='задержка ответа в секундах')
+    args = parser.parse_args()
+
+    emulator = Emulator(args.flavour, latency=args.latency)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(emulator.serve(args.host, args.port))
+    print('Эмулятор {} слушает {}{}'.format(args.flavour, emulator.host, RPC_PATH))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
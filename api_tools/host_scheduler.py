@@ -0,0 +1,106 @@
+"""
+Pytest-плагин для распределения тестов по воркерам xdist с учетом целевого хоста.
+
+Тесты, параметризованные фикстурой xorp_and_tredy_hosts, раскладываются в очереди
+по хостам, очереди разных хостов выполняются параллельно. Число параллельных очередей
+на хост задается опцией --host-concurrency (по умолчанию одна очередь на хост).
+Тесты с маркером host_serial всегда попадают в первую очередь своего хоста
+и выполняются в порядке сбора.
+
+Запуск:
+    pytest -n 6 --dist loadgroup -p api_tools.host_scheduler --host-concurrency tredy_host=4
+"""
+from zlib import crc32
+
+import pytest
+
+
+HOST_FIXTURE = 'xorp_and_tredy_hosts'
+DEFAULT_CONCURRENCY = 1
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('host_scheduler')
+    group.addoption(
+        '--host-concurrency', action='append', default=[], metavar='HOST=N',
+        help='Число параллельных очередей тестов на хост, например tredy_host=4',
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'host_serial: тест выполняется в общей очереди своего хоста по порядку')
+
+    if hasattr(config, 'workerinput') or not config.pluginmanager.hasplugin('xdist'):
+        return
+
+    dist = config.getoption('dist')
+    if dist != 'no' and dist != 'loadgroup':
+        raise pytest.UsageError('api_tools.host_scheduler работает только с --dist loadgroup')
+
+
+def parse_concurrency(values):
+    """
+    Разбирает значения опции --host-concurrency.
+
+    :return: dict {host: concurrency}
+    """
+    limits = {}
+
+    for value in values:
+        host, _, concurrency = value.partition('=')
+        try:
+            limits[host] = max(int(concurrency), 1)
+        except ValueError:
+            raise pytest.UsageError('Неверное значение --host-concurrency: {}'.format(value))
+
+    return limits
+
+
+def get_host(item):
+    """
+    Определяет хост, на который нацелен тест.
+
+    :return: str or None
+    """
+    callspec = getattr(item, 'callspec', None)
+    if callspec is None:
+        return None
+
+    return callspec.params.get(HOST_FIXTURE)
+
+
+def get_queue_name(item, limits):
+    """
+    Имя очереди теста вида "<host>:<номер очереди>".
+    Номер вычисляется по nodeid, поэтому одинаков на всех воркерах.
+
+    :return: str or None
+    """
+    host = get_host(item)
+    if host is None:
+        return None
+
+    concurrency = limits.get(host, DEFAULT_CONCURRENCY)
+    if item.get_closest_marker('host_serial') is not None:
+        queue = 0
+    else:
+        queue = crc32(item.nodeid.encode('utf-8')) % concurrency
+
+    return '{}:{}'.format(host, queue)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(config, items):
+    """
+    Проставляет тестам маркер xdist_group с именем очереди.
+    Выполняется раньше xdist, который по этому маркеру группирует тесты на воркерах.
+    """
+    if not hasattr(config, 'workerinput'):
+        return
+
+    limits = parse_concurrency(config.getoption('host_concurrency'))
+
+    for item in items:
+        queue_name = get_queue_name(item, limits)
+        if queue_name is not None:
+            item.add_marker(pytest.mark.xdist_group(queue_name))
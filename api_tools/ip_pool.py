@@ -0,0 +1,172 @@
+"""
+Модуль выдачи уникальных публичных IPv4-адресов для тестов add_ip, update_ip и alias-доменов.
+
+Адреса выдаются по порядку из зарезервированной под тесты сети, счетчик хранится в sqlite,
+поэтому адрес не повторяется ни между воркерами xdist, ни между прогонами: адреса прошлых
+прогонов остаются привязанными к тестовым пользователям. Освобожденные через release()
+адреса (после clear_ip/remove_ip) выдаются повторно раньше новых.
+
+Новая база начинает выдачу со случайного места сети, поэтому машины с разными базами
+и прогоны после потери базы (очистка временного каталога) почти не пересекаются по адресам.
+Для полной гарантии IP_POOL_DB должен указывать на постоянный локальный диск машины,
+а машинам нужно выделить разные сети в IP_POOL_NETWORK. Сетевой диск для базы не подходит:
+sqlite в режиме WAL на сетевых файловых системах работает некорректно.
+"""
+import os
+import random
+import sqlite3
+import tempfile
+from ipaddress import IPv4Address, IPv4Network
+from threading import Lock
+
+import pytest
+
+
+# 100.128.0.0/16 - публичная сеть сразу за диапазоном CGNAT 100.64.0.0/10
+IP_POOL_NETWORK = os.environ.get('IP_POOL_NETWORK', '100.128.0.0/16')
+IP_POOL_DB = os.environ.get('IP_POOL_DB', os.path.join(tempfile.gettempdir(), 'api_tests_ip_pool.sqlite3'))
+# Время ожидания блокировки базы другим процессом, секунды
+LOCK_TIMEOUT = 30
+
+_allocators = {}
+_allocators_lock = Lock()
+
+
+class IpAllocator:
+    """
+    Выдает адреса сети network по счетчику в базе path.
+    Каждая выдача - одна короткая транзакция BEGIN IMMEDIATE.
+    """
+    def __init__(self, network=IP_POOL_NETWORK, path=IP_POOL_DB):
+        self.network = IPv4Network(network)
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS counter (network TEXT PRIMARY KEY, next INTEGER NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS start (network TEXT PRIMARY KEY, offset INTEGER NOT NULL)'
+        )
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS released (network TEXT, address TEXT, PRIMARY KEY (network, address))'
+        )
+
+    def allocate(self, count=1):
+        """
+        Выдает count свободных адресов.
+
+        :return: list of str
+        """
+        network = str(self.network)
+
+        with self._lock:
+            cursor = self._connection.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                addresses = [row[0] for row in cursor.execute(
+                    'SELECT address FROM released WHERE network = ? LIMIT ?', (network, count),
+                )]
+                cursor.executemany(
+                    'DELETE FROM released WHERE network = ? AND address = ?',
+                    [(network, address) for address in addresses],
+                )
+
+                offset = self._offset(cursor, network)
+                row = cursor.execute('SELECT next FROM counter WHERE network = ?', (network,)).fetchone()
+                index = row[0] if row else 0
+                while len(addresses) < count:
+                    address, index = self._address(offset, index)
+                    addresses.append(address)
+                cursor.execute('INSERT OR REPLACE INTO counter (network, next) VALUES (?, ?)', (network, index))
+
+                cursor.execute('COMMIT')
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+
+        return addresses
+
+    def release(self, *addresses):
+        """
+        Возвращает адреса для повторной выдачи. Вызывать только после того,
+        как адреса отвязаны от пользователя (clear_ip, remove_ip).
+        """
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO released (network, address) VALUES (?, ?)',
+                [(str(self.network), address) for address in addresses],
+            )
+
+    def close(self):
+        self._connection.close()
+
+    def _offset(self, cursor, network):
+        """
+        Место сети, с которого база выдает адреса. Выбирается случайно при первой выдаче.
+
+        :return: int
+        """
+        row = cursor.execute('SELECT offset FROM start WHERE network = ?', (network,)).fetchone()
+        if row:
+            return row[0]
+
+        offset = random.randrange(self.network.num_addresses)
+        cursor.execute('INSERT INTO start (network, offset) VALUES (?, ?)', (network, offset))
+
+        return offset
+
+    def _address(self, offset, index):
+        """
+        Адрес с порядковым номером index, отсчет идет от offset по кругу.
+        Адреса, оканчивающиеся на .0 и .255, пропускаются.
+
+        :return: tuple(адрес, следующий номер)
+        """
+        while True:
+            if index >= self.network.num_addresses:
+                pytest.fail('Адреса сети {} для тестов закончились, задайте другую сеть в IP_POOL_NETWORK'.format(
+                    self.network))
+            address = IPv4Address(int(self.network.network_address) + (offset + index) % self.network.num_addresses)
+            index += 1
+            if address.packed[-1] not in (0, 255):
+                return str(address), index
+
+
+def get_ip_allocator():
+    """
+    Общий для процесса экземпляр IpAllocator.
+
+    :return: IpAllocator
+    """
+    key = (IP_POOL_NETWORK, IP_POOL_DB)
+
+    with _allocators_lock:
+        allocator = _allocators.get(key)
+        if allocator is None:
+            allocator = _allocators[key] = IpAllocator(*key)
+
+    return allocator
+
+
+def allocate_ip():
+    """
+    Уникальный публичный IPv4-адрес для теста.
+
+    :return: str
+    """
+    return get_ip_allocator().allocate()[0]
+
+
+def allocate_ips(count):
+    """
+    Несколько уникальных публичных IPv4-адресов одной транзакцией.
+
+    :return: list of str
+    """
+    return get_ip_allocator().allocate(count)
+
+
+def release_ip(*addresses):
+    get_ip_allocator().release(*addresses)
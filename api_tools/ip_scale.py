@@ -0,0 +1,363 @@
+"""
+Масштабная проверка адресов провайдерского api (add_ip, list_ip, clear_ip, update_ip, remove_ip).
+
+Пользователю по очереди добавляются пачки адресов растущего размера (10, 100, 1000, 10000).
+add_ip принимает список адресов и параллельный список комментариев, пачка уходит частями
+по chunk_size адресов. Если сервер отклоняет слишком большой запрос (413/414), часть делится
+пополам и отправляется заново, найденный размер используется для следующих пачек.
+
+В каждую часть добавляется непубличный адрес: он должен вернуться в invalid_adresses
+с сообщением 'This address is not public', а все остальные адреса - в added_addresses.
+После добавления список адресов сверяется по list_ip и очищается clear_ip.
+update_ip и remove_ip принимают один адрес, их время и пропускная способность
+замеряются на update_sample адресах пачки параллельными запросами.
+
+Запуск:
+    python -m api_tools.ip_scale --host https://www.tredy.com --key KEY --plan ENTERPRISE
+"""
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from api_tools.ip_pool import allocate_ips, release_ip
+from api_tools.load import percentile
+
+try:
+    from matplotlib import pyplot
+except ImportError:
+    pyplot = None
+
+
+SIZES = (10, 100, 1000, 10000)
+CHUNK_SIZE = 1000
+UPDATE_SAMPLE = 100
+CONCURRENCY = 8
+# Статусы, которыми сервер отклоняет слишком большой запрос
+PAYLOAD_LIMIT_STATUSES = (413, 414)
+NOT_PUBLIC_ADDRESS = '255.255.255.255'
+NOT_PUBLIC_MESSAGE = 'This address is not public'
+LIMIT_MESSAGE = 'The limit is reached'
+METHODS = ('add_ip', 'list_ip', 'clear_ip', 'update_ip', 'remove_ip')
+
+
+def parse_invalid(data):
+    """
+    Отклоненные адреса из ответа add_ip: список словарей {адрес: причина} в одном словаре.
+    Поле invalid_adresses отсутствует, если отклоненных адресов нет.
+
+    :return: dict {адрес: причина}
+    """
+    invalid = {}
+    for item in data.get('invalid_adresses', []):
+        invalid.update(item)
+
+    return invalid
+
+
+def is_ok(response):
+    """
+    Успешен ли ответ: статус 200 и status 'ok' в теле. Тело не в json - неуспешный ответ.
+    """
+    if response.status_code != 200:
+        return False
+
+    try:
+        body = response.body
+    except ValueError:
+        return False
+
+    return isinstance(body, dict) and body.get('status') == 'ok'
+
+
+class IpBatchScale:
+    """
+    Прогон пачек адресов для одного пользователя провайдерского api.
+
+    :param provider: ProviderClient
+    """
+    def __init__(self, provider, login, chunk_size=CHUNK_SIZE, update_sample=UPDATE_SAMPLE,
+                 concurrency=CONCURRENCY):
+        self.provider = provider
+        self.login = login
+        self.chunk_size = chunk_size
+        self.update_sample = update_sample
+        self.concurrency = concurrency
+
+    def timed_request(self, method, **params):
+        """
+        :return: tuple(время ответа в мс, ApiResponse)
+        """
+        started = perf_counter()
+        response = self.provider.request(method, ident=self.login, **params)
+
+        return (perf_counter() - started) * 1000, response
+
+    def default_profile(self):
+        data = self.provider.call('profiles', ident=self.login).data
+
+        return [key for key, value in data.items() if value == 'Default'][0]
+
+    def add_chunk(self, addresses, failures):
+        """
+        Добавляет часть пачки вместе с непубличным адресом.
+        При отказе по размеру запроса часть делится пополам.
+
+        :return: tuple(list of float - время запросов в мс, число добавленных адресов, достигнут ли лимит тарифа)
+        """
+        sent = addresses + [NOT_PUBLIC_ADDRESS]
+        comments = ['scale_{}'.format(number) for number in range(len(sent))]
+        elapsed, response = self.timed_request('add_ip', ip=sent, comment=comments)
+
+        if response.status_code in PAYLOAD_LIMIT_STATUSES and len(addresses) > 1:
+            half = len(addresses) // 2
+            self.chunk_size = min(self.chunk_size, half)
+            timings, added, limited = self.add_chunk(addresses[:half], failures)
+            if not limited:
+                more_timings, more_added, limited = self.add_chunk(addresses[half:], failures)
+                timings += more_timings
+                added += more_added
+            return timings, added, limited
+
+        if not is_ok(response):
+            failures.append('add_ip {} адресов: ответ {} {}'.format(
+                len(addresses), response.status_code, response.text[:200]))
+            return [elapsed], 0, False
+
+        data = response.data
+        added = data.get('added_addresses', [])
+        invalid = parse_invalid(data)
+
+        if invalid.pop(NOT_PUBLIC_ADDRESS, None) != NOT_PUBLIC_MESSAGE:
+            failures.append('add_ip {} адресов: непубличный адрес не отклонен: {}'.format(len(addresses), data))
+        if NOT_PUBLIC_ADDRESS in added:
+            failures.append('add_ip {} адресов: непубличный адрес добавлен'.format(len(addresses)))
+
+        limited = [address for address, reason in invalid.items() if reason == LIMIT_MESSAGE]
+        unexpected = {address: reason for address, reason in invalid.items() if reason != LIMIT_MESSAGE}
+        if unexpected:
+            failures.append('add_ip {} адресов: отклонены адреса {}'.format(len(addresses), unexpected))
+
+        missing = set(addresses) - set(added) - set(invalid)
+        if missing:
+            failures.append('add_ip {} адресов: нет ни в added_addresses, ни в invalid_adresses: {}'.format(
+                len(addresses), sorted(missing)[:10]))
+
+        return [elapsed], len(added), bool(limited)
+
+    def add_batch(self, addresses, failures):
+        """
+        :return: dict - замеры add_ip
+        """
+        timings = []
+        added = 0
+        limited = False
+        started = perf_counter()
+
+        position = 0
+        while position < len(addresses) and not limited:
+            chunk = addresses[position:position + self.chunk_size]
+            chunk_timings, chunk_added, limited = self.add_chunk(chunk, failures)
+            timings += chunk_timings
+            added += chunk_added
+            position += len(chunk)
+
+        return dict(self.stats(timings, added, perf_counter() - started), limit_reached=limited)
+
+    def check_list(self, addresses, profile_id, failures):
+        """
+        :return: dict - замеры list_ip
+        """
+        elapsed, response = self.timed_request('list_ip', profile=profile_id)
+        if not is_ok(response):
+            failures.append('list_ip: ответ {} {}'.format(response.status_code, response.text[:200]))
+            return self.stats([elapsed], 0, elapsed / 1000)
+
+        listed = {item['address'] for item in response.body.get('data', {}).get('ip', [])}
+        missing = set(addresses) - listed
+        if missing:
+            failures.append('list_ip: нет {} адресов из {}, например {}'.format(
+                len(missing), len(addresses), sorted(missing)[:10]))
+
+        return self.stats([elapsed], len(listed), elapsed / 1000)
+
+    def clear(self, profile_id, count, failures):
+        """
+        :param count: число адресов в списке перед очисткой
+        :return: dict - замеры clear_ip
+        """
+        elapsed, response = self.timed_request('clear_ip', profile=profile_id)
+        if not is_ok(response):
+            failures.append('clear_ip: ответ {} {}'.format(response.status_code, response.text[:200]))
+
+        _, response = self.timed_request('list_ip', profile=profile_id)
+        if not is_ok(response):
+            failures.append('list_ip после clear_ip: ответ {} {}'.format(response.status_code, response.text[:200]))
+        elif response.body.get('data', {}).get('ip'):
+            failures.append('clear_ip: после очистки осталось {} адресов'.format(len(response.body['data']['ip'])))
+
+        return self.stats([elapsed], count, elapsed / 1000)
+
+    def single_calls(self, method, addresses, failures):
+        """
+        Параллельные вызовы метода, принимающего один адрес.
+
+        :return: dict - замеры
+        """
+        started = perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(lambda address: self.timed_request(method, ip=address), addresses))
+
+        rejected = [response for _, response in results if not is_ok(response)]
+        if rejected:
+            failures.append('{}: отклонено {} из {} запросов, например {}'.format(
+                method, len(rejected), len(addresses), rejected[0].text[:200]))
+
+        return self.stats([elapsed for elapsed, _ in results], len(addresses) - len(rejected),
+                          perf_counter() - started)
+
+    @staticmethod
+    def stats(timings, addresses, seconds):
+        timings = sorted(timings)
+
+        return {
+            'requests': len(timings),
+            'addresses': addresses,
+            'p50': round(percentile(timings, 50), 2),
+            'max': round(timings[-1], 2) if timings else 0.0,
+            'seconds': round(seconds, 3),
+            'per_second': round(addresses / seconds, 1) if seconds else 0.0,
+        }
+
+    def run_size(self, size, profile_id):
+        """
+        Прогон одной пачки.
+
+        :return: dict - строка отчета
+        """
+        failures = []
+        addresses = allocate_ips(size)
+
+        add = self.add_batch(addresses, failures)
+        methods = {'add_ip': add}
+        if not add['limit_reached']:
+            methods['list_ip'] = self.check_list(addresses, profile_id, failures)
+        methods['clear_ip'] = self.clear(profile_id, add['addresses'], failures)
+
+        sample = addresses[:self.update_sample]
+        methods['update_ip'] = self.single_calls('update_ip', sample, failures)
+        methods['remove_ip'] = self.single_calls('remove_ip', sample, failures)
+        release_ip(*addresses)
+
+        return {
+            'size': size,
+            'chunk_size': self.chunk_size,
+            'limit_reached': add['limit_reached'],
+            'methods': methods,
+            'failures': failures,
+        }
+
+    def run(self, sizes=SIZES):
+        """
+        Прогон пачек по возрастанию размера. Пачки больше лимита адресов тарифа
+        не отправляются: лимит определяется по 'The limit is reached' в invalid_adresses.
+
+        :return: dict - отчет
+        """
+        profile_id = self.default_profile()
+        rows = []
+
+        for size in sorted(sizes):
+            row = self.run_size(size, profile_id)
+            rows.append(row)
+            if row['limit_reached'] or row['failures']:
+                break
+
+        return {
+            'rows': rows,
+            'failures': [failure for row in rows for failure in row['failures']],
+        }
+
+
+def format_report(report):
+    """
+    Таблица по пачкам: время запроса (p50, мс) и адресов в секунду для каждого метода.
+    """
+    lines = ['{:>8}{:>8}  '.format('size', 'chunk') + ''.join('{:>22}'.format(method) for method in METHODS)]
+    lines.append(' ' * 18 + '{:>12}{:>10}'.format('p50 ms', 'ip/s') * len(METHODS))
+
+    for row in report['rows']:
+        line = '{size:>8}{chunk_size:>8}  '.format(**row)
+        for method in METHODS:
+            stats = row['methods'].get(method)
+            line += '{p50:>12}{per_second:>10}'.format(**stats) if stats else '{:>22}'.format('-')
+        if row['limit_reached']:
+            line += '  лимит тарифа'
+        lines.append(line)
+
+    lines.extend(report['failures'])
+
+    return '\n'.join(lines)
+
+
+def plot_report(report, path):
+    """
+    Графики времени запроса и пропускной способности от размера пачки, нужен matplotlib.
+    """
+    if pyplot is None:
+        raise RuntimeError('Для графиков нужен matplotlib')
+
+    figure, (latency_axis, throughput_axis) = pyplot.subplots(1, 2, figsize=(12, 5))
+    for method in METHODS:
+        rows = [row for row in report['rows'] if method in row['methods']]
+        sizes = [row['size'] for row in rows]
+        latency_axis.plot(sizes, [row['methods'][method]['p50'] for row in rows], marker='o', label=method)
+        throughput_axis.plot(sizes, [row['methods'][method]['per_second'] for row in rows], marker='o', label=method)
+
+    for axis, title in ((latency_axis, 'p50, мс'), (throughput_axis, 'адресов в секунду')):
+        axis.set_xscale('log')
+        axis.set_xlabel('размер пачки')
+        axis.set_title(title)
+        axis.legend()
+
+    figure.tight_layout()
+    figure.savefig(path)
+    pyplot.close(figure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Масштабная проверка адресов провайдерского api')
+    parser.add_argument('--host', required=True, help='адрес хоста, например https://www.xorp.ru')
+    parser.add_argument('--key', required=True, help='ключ провайдерского api')
+    parser.add_argument('--login', help='пользователь, по умолчанию создается новый на тарифе --plan')
+    parser.add_argument('--plan', default='ENTERPRISE', help='тариф нового пользователя')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='размеры пачек через запятую')
+    parser.add_argument('--chunk', type=int, default=CHUNK_SIZE, help='начальный размер части запроса add_ip')
+    parser.add_argument('--sample', type=int, default=UPDATE_SAMPLE, help='адресов для update_ip и remove_ip')
+    parser.add_argument('--plot', help='сохранить графики в файл, нужен matplotlib')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    from api_tools.provider import get_provider_client
+    provider = get_provider_client(args.host, args.key)
+
+    login = args.login
+    if login is None:
+        from api_tools.plan_pool import PlanUserPool
+        users = PlanUserPool(args.host, args.key, stock_size=0)
+        login, _ = users.lease(args.plan)
+        users.close()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = IpBatchScale(provider, login, chunk_size=args.chunk, update_sample=args.sample).run(sizes)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    if args.plot:
+        plot_report(report, args.plot)
+
+    if report['failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""
+Модуль сериализации json. Если установлен orjson, используется он,
+для разбора также подходит ujson, иначе стандартный json.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def dumps(data, sort_keys=False):
+    """
+    Сериализация в байты. С sort_keys ключи словарей сортируются,
+    так одинаковые данные всегда дают одинаковые байты.
+
+    :return: bytes
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS if sort_keys else None)
+
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=sort_keys).encode('utf-8')
+
+
+def loads(data):
+    """
+    Десериализация из байтов или строки.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if ujson is not None:
+        return ujson.loads(data)
+
+    return json.loads(data)
@@ -0,0 +1,272 @@
+"""
+Pytest-плагин с гистограммами времени ответа по парам (хост, метод).
+
+Время каждого вызова через RpcClient и обернутый timed() make_request попадает
+в гистограмму с логарифмическими корзинами в духе HDR: точность около 1%
+на всем диапазоне при нескольких сотнях корзин на метод.
+По окончании прогона гистограммы можно сохранить компактным json-артефактом
+и сравнить p95 каждого метода с базовым артефактом прошлого прогона:
+если p95 вырос больше допустимого, сессия завершается с ошибкой.
+
+Запуск:
+    pytest -p api_tools.latency --latency-report latency.json \\
+        --latency-baseline baseline/latency.json --latency-threshold 0.5
+"""
+from collections import defaultdict
+from functools import wraps
+from threading import Lock
+from time import perf_counter
+
+import pytest
+
+from api_tools.client import add_call_listener, remove_call_listener
+from api_tools.jsonlib import dumps, loads
+
+
+# Число бит под корзину внутри степени двойки: 2 ** 7 корзин дают точность ~1%
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+ARTIFACT_VERSION = 1
+DEFAULT_THRESHOLD = 0.5
+DEFAULT_MIN_SAMPLES = 5
+# Рост p95 меньше этого значения (мс) не считается регрессией, чтобы не ловить шум быстрых методов
+DEFAULT_MIN_DELTA = 20
+
+
+class LatencyHistogram:
+    """
+    Гистограмма времени ответа в микросекундах.
+    Значения меньше SUB_COUNT хранятся точно, большие - в корзинах шириной 2 ** shift,
+    где shift растет с порядком значения.
+    """
+    def __init__(self, counts=None):
+        self.counts = defaultdict(int, counts or {})
+
+    @staticmethod
+    def bucket(value):
+        """
+        Номер корзины для значения в микросекундах.
+        """
+        shift = max(value.bit_length() - SUB_BITS, 0)
+
+        return shift * SUB_COUNT + (value >> shift)
+
+    @staticmethod
+    def bucket_value(bucket):
+        """
+        Середина корзины в микросекундах.
+        """
+        shift, sub = divmod(bucket, SUB_COUNT)
+
+        return (sub << shift) + ((1 << shift) >> 1)
+
+    def record(self, seconds):
+        self.counts[self.bucket(int(seconds * 1000000))] += 1
+
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] += count
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def percentile(self, q):
+        """
+        Перцентиль q в миллисекундах.
+        """
+        total = self.total
+        if not total:
+            return 0.0
+
+        rank = max(q / 100 * total, 1)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return self.bucket_value(bucket) / 1000
+
+        return self.bucket_value(max(self.counts)) / 1000
+
+
+_histograms = defaultdict(LatencyHistogram)
+_histograms_lock = Lock()
+
+
+def record(host, method, elapsed, status_code=None):
+    """
+    Записывает время вызова. Подходит как слушатель api_tools.client.add_call_listener.
+    """
+    with _histograms_lock:
+        _histograms[(host, method)].record(elapsed)
+
+
+def timed(func):
+    """
+    Декоратор для функций вида func(host, method, ...), например make_request:
+    время каждого вызова записывается в гистограмму (host, method).
+    """
+    @wraps(func)
+    def wrapper(host, method, *args, **kwargs):
+        started = perf_counter()
+        try:
+            return func(host, method, *args, **kwargs)
+        finally:
+            record(host, method, perf_counter() - started)
+
+    return wrapper
+
+
+def get_histograms():
+    """
+    Копия накопленных гистограмм.
+
+    :return: dict {(host, method): LatencyHistogram}
+    """
+    with _histograms_lock:
+        return {key: LatencyHistogram(histogram.counts) for key, histogram in _histograms.items()}
+
+
+def reset_histograms():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def dump_histograms(histograms):
+    """
+    Сериализует гистограммы в компактный артефакт: только непустые корзины.
+
+    :return: bytes
+    """
+    return dumps({
+        'version': ARTIFACT_VERSION,
+        'sub_bits': SUB_BITS,
+        'histograms': {
+            '{} {}'.format(host, method): {str(bucket): count for bucket, count in histogram.counts.items()}
+            for (host, method), histogram in sorted(histograms.items())
+        },
+    })
+
+
+def load_histograms(data):
+    """
+    Разбирает артефакт dump_histograms.
+
+    :return: dict {(host, method): LatencyHistogram}
+    """
+    artifact = loads(data)
+    if artifact.get('sub_bits') != SUB_BITS:
+        raise ValueError('Артефакт записан с другой точностью гистограмм: {}'.format(artifact.get('sub_bits')))
+
+    histograms = {}
+    for key, counts in artifact['histograms'].items():
+        host, _, method = key.rpartition(' ')
+        histograms[(host, method)] = LatencyHistogram({int(bucket): count for bucket, count in counts.items()})
+
+    return histograms
+
+
+def find_regressions(current, baseline, threshold=DEFAULT_THRESHOLD,
+                     min_samples=DEFAULT_MIN_SAMPLES, min_delta=DEFAULT_MIN_DELTA):
+    """
+    Сравнивает p95 методов с базовыми значениями.
+    Методы, которых нет в базе или у которых мало вызовов, не сравниваются.
+
+    :return: list of tuple(host, method, p95 базы, текущий p95)
+    """
+    regressions = []
+
+    for key, histogram in sorted(current.items()):
+        base = baseline.get(key)
+        if base is None or histogram.total < min_samples or base.total < min_samples:
+            continue
+
+        base_p95 = base.percentile(95)
+        p95 = histogram.percentile(95)
+        if p95 > base_p95 * (1 + threshold) and p95 - base_p95 >= min_delta:
+            regressions.append((key[0], key[1], base_p95, p95))
+
+    return regressions
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('latency')
+    group.addoption('--latency-report', metavar='PATH', help='Сохранить гистограммы времени ответа в файл')
+    group.addoption('--latency-baseline', metavar='PATH', help='Базовый артефакт для сравнения p95')
+    group.addoption(
+        '--latency-threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='Допустимый относительный рост p95, по умолчанию {}'.format(DEFAULT_THRESHOLD),
+    )
+    group.addoption(
+        '--latency-min-samples', type=int, default=DEFAULT_MIN_SAMPLES,
+        help='Минимум вызовов метода для сравнения, по умолчанию {}'.format(DEFAULT_MIN_SAMPLES),
+    )
+    group.addoption(
+        '--latency-min-delta', type=float, default=DEFAULT_MIN_DELTA,
+        help='Минимальный рост p95 в мс, считающийся регрессией, по умолчанию {}'.format(DEFAULT_MIN_DELTA),
+    )
+
+
+def pytest_configure(config):
+    add_call_listener(record)
+    config._latency_regressions = []
+
+
+def pytest_unconfigure(config):
+    remove_call_listener(record)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """
+    Под xdist гистограммы воркеров сливаются на контроллере.
+    """
+    data = getattr(node, 'workeroutput', {}).get('latency')
+    if not data:
+        return
+
+    with _histograms_lock:
+        for key, histogram in load_histograms(data).items():
+            _histograms[key].merge(histogram)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_sessionfinish(session):
+    config = session.config
+
+    if hasattr(config, 'workerinput'):
+        config.workeroutput['latency'] = dump_histograms(get_histograms()).decode('utf-8')
+        return
+
+    histograms = get_histograms()
+
+    report = config.getoption('latency_report')
+    if report:
+        with open(report, 'wb') as file:
+            file.write(dump_histograms(histograms))
+
+    baseline = config.getoption('latency_baseline')
+    if not baseline:
+        return
+
+    with open(baseline, 'rb') as file:
+        baseline_histograms = load_histograms(file.read())
+
+    config._latency_regressions = find_regressions(
+        histograms, baseline_histograms,
+        threshold=config.getoption('latency_threshold'),
+        min_samples=config.getoption('latency_min_samples'),
+        min_delta=config.getoption('latency_min_delta'),
+    )
+    if config._latency_regressions and session.exitstatus == pytest.ExitCode.OK:
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    regressions = getattr(config, '_latency_regressions', [])
+    if not regressions:
+        return
+
+    terminalreporter.section('Регрессии времени ответа (p95, мс)', red=True)
+    for host, method, base_p95, p95 in regressions:
+        terminalreporter.write_line('{} {}: {:.1f} -> {:.1f}'.format(host, method, base_p95, p95))
@@ -0,0 +1,271 @@
+"""
+Нагрузочный прогон, в котором сценариями служат тесты json_rpc_api_tests.py.
+
+Каждый виртуальный пользователь в цикле выбирает сценарий с учетом веса,
+берет пользователя api из пула и выполняет тест-функцию. Время ответа записывается
+по каждому rpc-методу, по окончании печатается отчет: запросы в секунду,
+доля ошибок и перцентили времени ответа по методам, прогоны и падения по сценариям.
+
+Запуск:
+    python -m api_tools.load --host https://www.xorp.ru --users 50 --duration 60 \\
+        --scenario json_rpc_api_tests:test_profile_schedule_activity=3 \\
+        --scenario json_rpc_api_tests:test_add_domain
+
+Вместо --host можно передать --emulator xorp, тогда цель - локальный эмулятор.
+"""
+import argparse
+import asyncio
+import inspect
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from random import choices
+from threading import Lock
+from time import monotonic
+
+import pytest
+
+from api_tools.client import add_call_listener, remove_call_listener, set_pool_size
+from api_tools.user_pool import get_user_pool
+
+
+HOST_FIXTURE = 'xorp_and_tredy_hosts'
+# Фикстуры пользователей: имя -> число заранее созданных дополнительных профилей
+USER_FIXTURES = {'rpc_user': 0, 'rpc_user_with_profile': 1}
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Scenario:
+    """
+    Тест-функция в роли сценария нагрузки.
+
+    :param func: тест-функция с фикстурами xorp_and_tredy_hosts и/или rpc_user, rpc_user_with_profile
+    :param weight: относительная частота выбора сценария
+    :param params: значения остальных аргументов теста, например ожидаемые значения параметризации
+    """
+    def __init__(self, func, weight=1, **params):
+        self.func = func
+        self.name = func.__name__
+        self.weight = weight
+        self.params = params
+        self.arguments = list(inspect.signature(func).parameters)
+
+    def missing_arguments(self):
+        """
+        Аргументы теста, для которых нет ни фикстуры, ни значения.
+
+        :return: list
+        """
+        return [
+            name for name in self.arguments
+            if name != HOST_FIXTURE and name not in USER_FIXTURES and name not in self.params
+        ]
+
+    def run(self, host, pool_size):
+        """
+        Выполняет сценарий, при необходимости беря пользователя из пула.
+        """
+        kwargs = dict(self.params)
+        leases = []
+
+        if HOST_FIXTURE in self.arguments:
+            kwargs[HOST_FIXTURE] = host
+        for fixture, profiles in USER_FIXTURES.items():
+            if fixture in self.arguments:
+                pool = get_user_pool(host, size=pool_size, profiles=profiles)
+                user = pool.lease()
+                leases.append((pool, user))
+                kwargs[fixture] = user + tuple(profile.id for profile in pool.get_profiles(user))
+
+        try:
+            self.func(**kwargs)
+        finally:
+            for pool, user in leases:
+                pool.release(user)
+
+
+def load_scenario(spec, params=None):
+    """
+    Создает сценарий по строке вида "module:function=weight".
+    Из params берутся только значения аргументов этой тест-функции.
+
+    :return: Scenario
+    """
+    path, _, weight = spec.partition('=')
+    module_name, _, func_name = path.partition(':')
+    func = getattr(import_module(module_name), func_name)
+
+    arguments = inspect.signature(func).parameters
+    params = {name: value for name, value in (params or {}).items() if name in arguments}
+
+    return Scenario(func, int(weight or 1), **params)
+
+
+def percentile(samples, q):
+    """
+    Перцентиль q по отсортированному списку значений.
+    """
+    if not samples:
+        return 0.0
+
+    index = min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))
+
+    return samples[index]
+
+
+class LoadRunner:
+    """
+    Запускает users виртуальных пользователей на asyncio на duration секунд.
+    Тест-функции синхронные, поэтому каждая выполняется в пуле потоков.
+    """
+    def __init__(self, host, scenarios, users=10, duration=60):
+        self.host = host
+        self.scenarios = scenarios
+        self.users = users
+        self.duration = duration
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.runs = defaultdict(int)
+        self.failures = defaultdict(list)
+        self.elapsed = 0
+        self._lock = Lock()
+
+    def record(self, host, method, elapsed, status_code):
+        """
+        Слушатель запросов клиента. Ошибкой считается отсутствие ответа или статус 5xx.
+        """
+        if host != self.host:
+            return
+
+        with self._lock:
+            self.latencies[method].append(elapsed)
+            if status_code is None or status_code >= 500:
+                self.errors[method] += 1
+
+    async def virtual_user(self, loop, executor, deadline):
+        weights = [scenario.weight for scenario in self.scenarios]
+
+        while monotonic() < deadline:
+            scenario = choices(self.scenarios, weights)[0]
+            try:
+                await loop.run_in_executor(executor, scenario.run, self.host, self.users)
+            except (Exception, pytest.fail.Exception) as error:
+                self.failures[scenario.name].append(repr(error))
+            self.runs[scenario.name] += 1
+
+    async def run_async(self):
+        loop = asyncio.get_running_loop()
+        deadline = monotonic() + self.duration
+
+        with ThreadPoolExecutor(max_workers=self.users) as executor:
+            await asyncio.gather(*[
+                self.virtual_user(loop, executor, deadline) for _ in range(self.users)
+            ])
+
+    def run(self):
+        """
+        Выполняет прогон и возвращает отчет.
+
+        :return: dict
+        """
+        set_pool_size(self.users)
+        add_call_listener(self.record)
+        started = monotonic()
+
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            self.elapsed = monotonic() - started
+            remove_call_listener(self.record)
+
+        return self.report()
+
+    def report(self):
+        """
+        Отчет по методам (время ответа в миллисекундах) и сценариям.
+
+        :return: dict
+        """
+        methods = {}
+        for method, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            stats = {
+                'requests': len(samples),
+                'rps': round(len(samples) / self.elapsed, 2) if self.elapsed else 0.0,
+                'error_rate': round(self.errors[method] / len(samples), 4),
+                'max': round(samples[-1] * 1000, 2),
+            }
+            for q in PERCENTILES:
+                stats['p{}'.format(q)] = round(percentile(samples, q) * 1000, 2)
+            methods[method] = stats
+
+        scenarios = {
+            name: {'runs': runs, 'failures': len(self.failures[name])}
+            for name, runs in sorted(self.runs.items())
+        }
+
+        return {'elapsed': round(self.elapsed, 2), 'methods': methods, 'scenarios': scenarios}
+
+
+def format_report(report):
+    """
+    Отчет в виде текстовой таблицы.
+    """
+    header = '{:<28}{:>10}{:>10}{:>8}'.format('method', 'requests', 'rps', 'errors')
+    header += ''.join('{:>10}'.format('p{}'.format(q)) for q in PERCENTILES) + '{:>10}'.format('max')
+    lines = ['Прогон: {} c'.format(report['elapsed']), header]
+
+    for method, stats in report['methods'].items():
+        line = '{:<28}{:>10}{:>10}{:>8.2%}'.format(method, stats['requests'], stats['rps'], stats['error_rate'])
+        line += ''.join('{:>10}'.format(stats['p{}'.format(q)]) for q in PERCENTILES)
+        lines.append(line + '{:>10}'.format(stats['max']))
+
+    lines.append('')
+    lines.append('{:<40}{:>10}{:>10}'.format('scenario', 'runs', 'failures'))
+    for name, stats in report['scenarios'].items():
+        lines.append('{:<40}{:>10}{:>10}'.format(name, stats['runs'], stats['failures']))
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон на основе api-тестов')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--host', help='адрес хоста, например https://www.xorp.ru')
+    target.add_argument('--emulator', choices=['xorp', 'tredy'], help='запустить локальный эмулятор')
+    parser.add_argument(
+        '--scenario', action='append', required=True, metavar='MODULE:FUNCTION[=WEIGHT]',
+        help='тест-функция в роли сценария, можно указать несколько раз',
+    )
+    parser.add_argument(
+        '--param', action='append', default=[], metavar='NAME=JSON',
+        help='значение аргумента тест-функций, например expected_plans_amount=13',
+    )
+    parser.add_argument('--users', type=int, default=10, help='число виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=60, help='длительность прогона в секундах')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    params = {}
+    for param in args.param:
+        name, _, value = param.partition('=')
+        params[name] = json.loads(value)
+
+    scenarios = [load_scenario(spec, params) for spec in args.scenario]
+    for scenario in scenarios:
+        missing = scenario.missing_arguments()
+        if missing:
+            parser.error('Для сценария {} не заданы аргументы: {}'.format(scenario.name, ', '.join(missing)))
+
+    host = args.host
+    if args.emulator:
+        from api_tools.emulator import Emulator
+        host = Emulator(args.emulator).start_in_thread()
+
+    report = LoadRunner(host, scenarios, users=args.users, duration=args.duration).run()
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""
+Полная матрица переходов между тарифами провайдерского api (prolongate, unsubscribe).
+
+Проверяется каждый переход тариф -> тариф между всеми платными тарифами хоста и FREE:
+у треди это 18 состояний и 306 переходов. Переход в платный тариф - prolongate с plan,
+в FREE - unsubscribe. После перехода тариф сверяется по get_plan, а лимиты тарифа
+(max_profiles, размеры списков) читаются из userInfo json-rpc api. Лимиты одного тарифа
+должны совпадать, из какого бы тарифа пользователь в него ни перешел.
+
+Переходы выстраиваются в эйлеров цикл полного графа тарифов: каждый следующий переход
+начинается с тарифа, в котором закончился предыдущий, поэтому один пользователь проходит
+подряд много переходов. Цикл делится на workers отрезков, отрезки выполняются параллельно.
+
+Запуск:
+    python -m api_tools.plan_matrix --host https://www.tredy.com --key KEY --provider tredy
+"""
+import argparse
+import json
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from api_tools.client import get_rpc_client
+from api_tools.load import percentile
+from api_tools.plan_pool import FREE_PLAN, PROVIDER_PLANS, PlanUserPool
+from api_tools.provider import get_provider_client
+from website_tests.utils import get_plan
+
+
+WORKERS = 8
+# Лимиты тарифа из userInfo, которые сверяются между переходами
+PLAN_LIMITS = ('max_profiles', 'black_list_size', 'white_list_size')
+PERCENTILES = (50, 95)
+
+
+def transition_circuit(states):
+    """
+    Эйлеров цикл полного ориентированного графа состояний (алгоритм Hierholzer):
+    каждая пара (source, target), source != target, встречается ровно один раз.
+
+    :return: list of tuple(source, target)
+    """
+    states = list(states)
+    if len(states) < 2:
+        return []
+
+    remaining = {state: [target for target in reversed(states) if target != state] for state in states}
+    stack = [states[0]]
+    path = []
+
+    while stack:
+        state = stack[-1]
+        if remaining[state]:
+            stack.append(remaining[state].pop())
+        else:
+            path.append(stack.pop())
+
+    path.reverse()
+
+    return list(zip(path, path[1:]))
+
+
+def split_circuit(circuit, parts):
+    """
+    Делит цикл на parts отрезков почти равной длины, не меняя порядок переходов.
+
+    :return: list of list
+    """
+    parts = max(1, min(parts, len(circuit)))
+    size, extra = divmod(len(circuit), parts)
+    segments = []
+    start = 0
+
+    for number in range(parts):
+        end = start + size + (1 if number < extra else 0)
+        segments.append(circuit[start:end])
+        start = end
+
+    return segments
+
+
+class PlanMatrix:
+    """
+    Прогон матрицы переходов для одного хоста.
+
+    :param plans: dict код тарифа -> название, например XORP_PLANS
+    """
+    def __init__(self, host, key, plans, workers=WORKERS):
+        self.host = host
+        self.names = dict(plans, **{FREE_PLAN: FREE_PLAN})
+        self.workers = workers
+        self.provider = get_provider_client(host, key)
+        self.users = PlanUserPool(host, key, stock_size=0)
+
+    def transition(self, login, password, source, target):
+        """
+        Переводит пользователя из тарифа source в target и проверяет результат.
+
+        :return: dict - запись перехода
+        """
+        started = perf_counter()
+        if target == FREE_PLAN:
+            response = self.provider.request('unsubscribe', ident=login)
+        else:
+            response = self.provider.request('prolongate', ident=login, plan=target)
+        elapsed = (perf_counter() - started) * 1000
+
+        record = {'source': source, 'target': target, 'ms': round(elapsed, 2), 'limits': None, 'failures': []}
+        prefix = '{} -> {}: '.format(source, target)
+
+        try:
+            body = response.body
+        except ValueError:
+            body = {}
+        if response.status_code != 200 or body.get('status') != 'ok':
+            record['failures'].append(prefix + 'ответ {} {}'.format(response.status_code, response.text[:200]))
+            return record
+
+        name = get_plan(self.host, login, password).get('name')
+        if name != self.names[target]:
+            record['failures'].append(prefix + 'get_plan вернул тариф {!r} вместо {!r}'.format(
+                name, self.names[target]))
+
+        features = get_rpc_client(self.host, login, password).call('userInfo').result['plan']['features']
+        record['limits'] = {limit: features.get(limit) for limit in PLAN_LIMITS}
+        if not isinstance(features.get('max_profiles'), int) or features['max_profiles'] < 1:
+            record['failures'].append(prefix + 'некорректный max_profiles {!r}'.format(features.get('max_profiles')))
+
+        return record
+
+    def run_segment(self, segment):
+        """
+        Проходит отрезок цикла одним пользователем.
+        После неудачного перехода состояние пользователя неизвестно,
+        поэтому цепочка продолжается новым пользователем в нужном тарифе.
+
+        :return: list of dict
+        """
+        login, password = self.users.lease(segment[0][0])
+        records = []
+
+        for source, target in segment:
+            record = self.transition(login, password, source, target)
+            records.append(record)
+            if record['failures']:
+                login, password = self.users.lease(target)
+
+        return records
+
+    def check_limits(self, records):
+        """
+        Лимиты тарифа должны быть одинаковыми для всех переходов в него.
+        Эталон - самый частый набор лимитов тарифа.
+
+        :return: tuple(dict тариф -> лимиты, list of str - расхождения)
+        """
+        by_target = defaultdict(list)
+        for record in records:
+            if record['limits'] is not None:
+                by_target[record['target']].append(record)
+
+        limits = {}
+        failures = []
+        for target, target_records in sorted(by_target.items()):
+            counts = Counter(json.dumps(record['limits'], sort_keys=True) for record in target_records)
+            reference = json.loads(counts.most_common(1)[0][0])
+            limits[target] = reference
+            for record in target_records:
+                if record['limits'] != reference:
+                    failures.append('{} -> {}: лимиты {} вместо {}'.format(
+                        record['source'], target, record['limits'], reference))
+
+        return limits, failures
+
+    def run(self):
+        """
+        :return: dict - отчет
+        """
+        started = perf_counter()
+        states = [FREE_PLAN] + sorted(self.names.keys() - {FREE_PLAN})
+        circuit = transition_circuit(states)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self.run_segment, segment)
+                           for segment in split_circuit(circuit, self.workers)]
+                records = [record for future in futures for record in future.result()]
+        finally:
+            self.users.close()
+
+        limits, limit_failures = self.check_limits(records)
+        failures = [failure for record in records for failure in record['failures']] + limit_failures
+
+        samples = defaultdict(list)
+        for record in records:
+            samples[record['target']].append(record['ms'])
+        latency = {}
+        for target, target_samples in samples.items():
+            target_samples.sort()
+            stats = {'calls': len(target_samples), 'max': round(target_samples[-1], 2)}
+            stats.update(('p{}'.format(q), round(percentile(target_samples, q), 2)) for q in PERCENTILES)
+            latency[target] = stats
+
+        return {
+            'states': states,
+            'transitions': len(records),
+            'seconds': round(perf_counter() - started, 2),
+            'latency': latency,
+            'limits': limits,
+            'table': [[record['source'], record['target'], record['ms'], not record['failures']]
+                      for record in records],
+            'failures': failures,
+        }
+
+
+def format_report(report):
+    """
+    Таблица переходов: строки - исходный тариф, столбцы - номер целевого тарифа,
+    в ячейке время перехода в мс или X для неудачного перехода.
+    """
+    states = report['states']
+    lines = ['Тарифов: {}, переходов: {transitions} за {seconds} с'.format(len(states), **report)]
+
+    cells = {(source, target): '{:.0f}'.format(ms) if ok else 'X' for source, target, ms, ok in report['table']}
+    width = max(len(state) for state in states) + 6
+    lines.append(' ' * width + ''.join('{:>7}'.format(number) for number in range(1, len(states) + 1)))
+    for number, source in enumerate(states, 1):
+        row = '{:>3}. {:<{}}'.format(number, source, width - 5)
+        row += ''.join('{:>7}'.format(cells.get((source, target), '-')) for target in states)
+        lines.append(row)
+
+    lines.append('{:<{}}{:>8}'.format('target', width, 'calls')
+                 + ''.join('{:>10}'.format('p{}'.format(q)) for q in PERCENTILES) + '{:>10}'.format('max')
+                 + '  limits')
+    for target in states:
+        stats = report['latency'].get(target)
+        if stats is None:
+            continue
+        line = '{:<{}}{:>8}'.format(target, width, stats['calls'])
+        line += ''.join('{:>10}'.format(stats['p{}'.format(q)]) for q in PERCENTILES)
+        lines.append(line + '{:>10}  {}'.format(stats['max'], report['limits'].get(target, '')))
+
+    lines.extend(report['failures'])
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Матрица переходов между тарифами провайдерского api')
+    parser.add_argument('--host', required=True, help='адрес хоста, например https://www.xorp.ru')
+    parser.add_argument('--key', required=True, help='ключ провайдерского api')
+    parser.add_argument('--provider', required=True, choices=sorted(PROVIDER_PLANS), help='набор тарифов')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='число параллельных цепочек переходов')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    report = PlanMatrix(args.host, args.key, PROVIDER_PLANS[args.provider], workers=args.workers).run()
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    if report['failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
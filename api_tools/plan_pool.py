@@ -0,0 +1,170 @@
+"""
+Модуль с запасом заранее подготовленных пользователей провайдерского api по тарифам.
+
+Тестам тарифов нужен пользователь в определенном состоянии: на бесплатном тарифе,
+на Бизнесе, на Enterprise и т.д. Вместо цепочки create_user -> prolongate/unsubscribe
+в каждом тесте пул держит для каждого тарифа небольшой запас готовых пользователей
+и пополняет его в фоне. Пользователь выдается тесту один раз и в пул не возвращается:
+тесты меняют тариф, профили и адреса, сбрасывать такое состояние дороже, чем создать заново.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from threading import Lock
+
+import pytest
+
+from api_tools.provider import get_provider_client
+from website_tests.utils import create_user, generate_login_password
+
+
+# Тариф, с которым create_user создает пользователя
+DEFAULT_PLAN = 'PREMIUM'
+# Состояние после unsubscribe
+FREE_PLAN = 'FREE'
+PLAN_STOCK_SIZE = 2
+PLAN_POOL_WORKERS = 4
+# Сколько lease() ждет пользователя из запаса, секунды
+PLAN_LEASE_TIMEOUT = 300
+
+# Платные тарифы провайдеров: код тарифа -> название
+XORP_PLANS = {
+    'SCHOOL': 'Школа',
+    'PREMIUM': 'Домашний',
+    'BUSINESS': 'Бизнес',
+}
+
+TREDY_PLANS = {
+    'PREMIUM': 'Safe@Home',
+    'ENTERPRISE': 'Enterprise',
+    'EDU': 'Education',
+    'BUSINESS-5': 'Safe@Office 5',
+    'BUSINESS-10': 'Safe@Office 10',
+    'BUSINESS-25': 'Safe@Office 25',
+    'BUSINESS-50': 'Safe@Office 50',
+    'BUSINESS-75': 'Safe@Office 75',
+    'BUSINESS-100': 'Safe@Office 100',
+    'WIFI': 'HotSpot Advanced Edition',
+    'WIFI-1': 'HotSpot Edition 1',
+    'WIFI-2': 'HotSpot Edition 2',
+    'WIFI-3': 'HotSpot Edition 3',
+    'WIFI-4': 'HotSpot Edition 4',
+    'WIFI-5': 'HotSpot Edition 5',
+    'WIFI-10': 'HotSpot Edition 10',
+    'NONPROFIT': 'Nonprofit'
+}
+
+PROVIDER_PLANS = {'xorp': XORP_PLANS, 'tredy': TREDY_PLANS}
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class PlanUserPool:
+    """
+    Запас пользователей одного хоста по тарифам.
+    Для тарифов из plans запас создается сразу, для остальных - при первом lease().
+    После каждой выдачи в фоне создается пользователь на замену, так в запасе
+    по stock_size пользователей на каждый запрошенный тариф. Ошибка фоновой подготовки
+    пользователя выбрасывается из lease(), который должен был его выдать.
+    С stock_size=0 запаса нет и каждый пользователь создается в lease().
+    """
+    def __init__(self, host, key, plans=(), stock_size=PLAN_STOCK_SIZE):
+        self.host = host
+        self.stock_size = stock_size
+        self.provider = get_provider_client(host, key)
+        self._stock = defaultdict(Queue)
+        self._warmed = set()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=PLAN_POOL_WORKERS)
+
+        for plan in plans:
+            self.warm(plan)
+
+    def warm(self, plan):
+        """
+        Запускает в фоне подготовку запаса пользователей тарифа, если она еще не запущена.
+        """
+        with self._lock:
+            if plan in self._warmed:
+                return
+            self._warmed.add(plan)
+
+        for _ in range(self.stock_size):
+            self._executor.submit(self._refill, plan)
+
+    def lease(self, plan):
+        """
+        Выдает пользователя на тарифе plan ('FREE' - без платного тарифа).
+        Если запас тарифа пуст, ждет пользователя, который готовится в фоне:
+        на первый lease() тарифа не создается лишний пользователь сверх запаса.
+
+        :return: tuple(login, password)
+        """
+        if not self.stock_size:
+            return self.create(plan)
+
+        self.warm(plan)
+
+        try:
+            user = self._stock[plan].get(timeout=PLAN_LEASE_TIMEOUT)
+        except Empty:
+            return self.create(plan)
+
+        self._executor.submit(self._refill, plan)
+
+        if isinstance(user, BaseException):
+            raise user
+
+        return user
+
+    def create(self, plan):
+        """
+        Создает пользователя и переводит его на тариф plan.
+
+        :return: tuple(login, password)
+        """
+        login, password = generate_login_password()
+        create_user(self.host, login, password)
+
+        if plan == FREE_PLAN:
+            self.provider.call('unsubscribe', ident=login)
+        elif plan != DEFAULT_PLAN:
+            self.provider.call('prolongate', ident=login, plan=plan)
+
+        return login, password
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _refill(self, plan):
+        try:
+            self._stock[plan].put(self.create(plan))
+        except (Exception, pytest.fail.Exception) as error:
+            # Вместо пользователя в запас кладется ошибка, ее выбросит lease()
+            self._stock[plan].put(error)
+
+
+def get_plan_user_pool(host, key, plans=()):
+    """
+    Возвращает запас пользователей хоста по тарифам, при первом обращении создает его.
+    Под xdist у каждого воркера свой запас.
+
+    :return: PlanUserPool
+    """
+    with _pools_lock:
+        pool = _pools.get((host, key))
+        if pool is None:
+            pool = _pools[host, key] = PlanUserPool(host, key)
+
+    for plan in plans:
+        pool.warm(plan)
+
+    return pool
+
+
+def close_plan_user_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,212 @@
+"""
+Проверка всех пресетов на всех профилях пользователя (setActivePresets, getActivePresetList, presetList).
+
+Пользователю создается максимальное по тарифу число профилей, затем на каждый профиль
+по очереди ставится каждый пресет: стандартные с id от 1 до presets_amount - 1
+и пользовательский (Custom). После установки пресет проверяется по getActivePresetList,
+а presetList - на соответствие схеме и неизменность id пользовательского пресета.
+Профили обходятся параллельно, по потоку на профиль, пресеты одного профиля - по очереди,
+так как каждый setActivePresets заменяет активные пресеты профиля.
+
+Запуск:
+    python -m api_tools.preset_sweep --emulator xorp
+    python -m api_tools.preset_sweep --host https://www.xorp.ru --presets 48
+"""
+import argparse
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import perf_counter
+
+from api_tools.client import get_rpc_client
+from api_tools.load import percentile
+from api_tools.profiles import create_profiles
+from api_tools.rpc_schemas import validate_preset_list
+
+
+SWEEP_PROFILE_NAME = 'preset_sweep'
+PERCENTILES = (50, 95)
+
+
+class PresetSweep:
+    """
+    Обход пресетов для одного пользователя.
+
+    :param presets_amount: число стандартных пресетов хоста (48 у ксорпа, 3 у треди)
+    :param validator: валидатор ответа presetList, по умолчанию проверяется только форма
+    """
+    def __init__(self, host, login, password, presets_amount, validator=validate_preset_list):
+        self.host = host
+        self.login = login
+        self.password = password
+        self.presets_amount = presets_amount
+        self.validator = validator
+        self.client = get_rpc_client(host, login, password)
+        self._latency = defaultdict(list)
+        self._lock = Lock()
+
+    def timed_call(self, method, *params):
+        """
+        Вызов с замером времени ответа, время копится по методам для отчета.
+
+        :return: ApiResponse
+        """
+        started = perf_counter()
+        response = self.client.call(method, *params)
+        elapsed = (perf_counter() - started) * 1000
+
+        with self._lock:
+            self._latency[method].append(elapsed)
+
+        return response
+
+    def prepare(self):
+        """
+        Дополняет профили пользователя до лимита тарифа и находит id пользовательского пресета.
+
+        :return: tuple(list of profile_id, id пользовательского пресета)
+        """
+        max_profiles = self.client.call('userInfo').result['plan']['features']['max_profiles']
+        profiles = self.client.call('profiles').result
+        missing = max_profiles - len(profiles)
+
+        profile_ids = [profile['id'] for profile in profiles]
+        if missing > 0:
+            created = create_profiles(self.host, self.login, self.password, missing, SWEEP_PROFILE_NAME)
+            profile_ids.extend(profile.id for profile in created)
+
+        presets = json.loads(self.client.call('presetList', profile_ids[0], 'en').result)
+        custom_ids = [preset['id'] for preset in presets if preset['is_custom']]
+
+        assert custom_ids, 'Нет пользовательского пресета в presetList: {}'.format(presets)
+
+        return profile_ids, custom_ids[0]
+
+    def check_preset(self, profile_id, preset_id, custom_id):
+        """
+        Ставит профилю пресет и проверяет результат.
+
+        :return: list of str - найденные расхождения
+        """
+        prefix = 'профиль {}, пресет {}: '.format(profile_id, preset_id)
+
+        response = self.timed_call('setActivePresets', profile_id, [preset_id])
+        if 'error' in response.body:
+            return [prefix + 'ошибка setActivePresets {}'.format(response.body['error'])]
+
+        failures = []
+
+        response = self.timed_call('getActivePresetList', profile_id)
+        active = json.loads(response.result)
+        if active != [preset_id]:
+            failures.append(prefix + 'getActivePresetList вернул {}'.format(active))
+
+        response = self.timed_call('presetList', profile_id, 'en')
+        errors = self.validator(response.result)
+        if errors:
+            failures.append(prefix + 'presetList не соответствует схеме: {}'.format('; '.join(errors)))
+        else:
+            custom = [preset['id'] for preset in json.loads(response.result) if preset['is_custom']]
+            if custom != [custom_id]:
+                failures.append(prefix + 'id пользовательского пресета {} вместо {}'.format(custom, custom_id))
+
+        return failures
+
+    def sweep_profile(self, profile_id, preset_ids, custom_id):
+        failures = []
+        for preset_id in preset_ids:
+            failures.extend(self.check_preset(profile_id, preset_id, custom_id))
+
+        return failures
+
+    def run(self):
+        """
+        :return: dict - отчет
+        """
+        started = perf_counter()
+        profile_ids, custom_id = self.prepare()
+        preset_ids = list(range(1, self.presets_amount)) + [custom_id]
+
+        with ThreadPoolExecutor(max_workers=len(profile_ids)) as executor:
+            futures = [
+                executor.submit(self.sweep_profile, profile_id, preset_ids, custom_id)
+                for profile_id in profile_ids
+            ]
+            failures = [failure for future in futures for failure in future.result()]
+
+        latency = {}
+        for method, samples in self._latency.items():
+            samples = sorted(samples)
+            stats = {'calls': len(samples), 'max': round(samples[-1], 2)}
+            stats.update(('p{}'.format(q), round(percentile(samples, q), 2)) for q in PERCENTILES)
+            latency[method] = stats
+
+        return {
+            'profiles': len(profile_ids),
+            'presets': len(preset_ids),
+            'checks': len(profile_ids) * len(preset_ids),
+            'seconds': round(perf_counter() - started, 2),
+            'latency': latency,
+            'failures': failures,
+        }
+
+
+def format_report(report):
+    lines = ['Профилей: {profiles}, пресетов: {presets}, проверок: {checks} за {seconds} с'.format(**report)]
+    header = '{:<24}{:>8}'.format('method', 'calls')
+    header += ''.join('{:>10}'.format('p{}'.format(q)) for q in PERCENTILES) + '{:>10}'.format('max')
+    lines.append(header)
+
+    for method, stats in sorted(report['latency'].items()):
+        line = '{:<24}{:>8}'.format(method, stats['calls'])
+        line += ''.join('{:>10}'.format(stats['p{}'.format(q)]) for q in PERCENTILES)
+        lines.append(line + '{:>10}'.format(stats['max']))
+
+    lines.extend(report['failures'])
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Проверка всех пресетов на всех профилях пользователя')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--host', help='адрес хоста, например https://www.xorp.ru')
+    target.add_argument('--emulator', choices=['xorp', 'tredy'], help='запустить локальный эмулятор')
+    parser.add_argument('--presets', type=int, help='число стандартных пресетов хоста')
+    parser.add_argument('--login', help='пользователь, по умолчанию берется из пула')
+    parser.add_argument('--password')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    host, presets_amount = args.host, args.presets
+    if args.emulator:
+        from api_tools.emulator import FLAVOURS, Emulator
+        host = Emulator(args.emulator).start_in_thread()
+        presets_amount = presets_amount or FLAVOURS[args.emulator]['presets_amount']
+    if not presets_amount:
+        parser.error('Для --host нужно задать --presets')
+
+    pool = user = None
+    if args.login:
+        login, password = args.login, args.password
+    else:
+        from api_tools.user_pool import get_user_pool
+        pool = get_user_pool(host, 1)
+        user = login, password = pool.lease()
+
+    try:
+        report = PresetSweep(host, login, password, presets_amount).run()
+    finally:
+        if pool is not None:
+            pool.release(user)
+            pool.close()
+
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    if report['failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
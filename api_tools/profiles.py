@@ -0,0 +1,59 @@
+"""
+Модуль создания профилей фильтрации через json-rpc api.
+"""
+from collections import namedtuple
+
+import pytest
+
+from api_tools.client import get_rpc_client
+
+
+PROFILE_NAME = 'my_profile_test'
+
+Profile = namedtuple('Profile', ['id', 'name', 'token', 'default'])
+
+
+def profile_from_reply(reply):
+    """
+    Профиль из ответа addProfile.
+
+    :return: Profile
+    """
+    try:
+        result = reply['result']
+        return Profile(result['id'], result['name'], result['token'], result['default'])
+    except (KeyError, TypeError):
+        pytest.fail('Ошибка создания профиля, ответ: {}'.format(reply))
+
+
+def add_profile_calls(count, name=PROFILE_NAME):
+    """
+    Вызовы addProfile для пакетного запроса. Если профилей несколько,
+    к имени добавляется номер, чтобы имена не совпадали.
+
+    :return: list of tuple
+    """
+    if count == 1:
+        return [('addProfile', name)]
+
+    return [('addProfile', '{}_{}'.format(name, number)) for number in range(1, count + 1)]
+
+
+def create_profiles(host, login, password, count, name=PROFILE_NAME):
+    """
+    Создает пользователю count профилей одним пакетным запросом.
+
+    :return: list of Profile
+    """
+    client = get_rpc_client(host, login, password)
+
+    return [profile_from_reply(reply) for reply in client.batch(add_profile_calls(count, name))]
+
+
+def create_profile(host, login, password, name=PROFILE_NAME):
+    """
+    Создает пользователю один профиль.
+
+    :return: Profile
+    """
+    return create_profiles(host, login, password, 1, name)[0]
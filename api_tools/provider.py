@@ -0,0 +1,136 @@
+"""
+Модуль с клиентом провайдерского api (subscribe, prolongate, add_ip, add_vpn, ...).
+
+Клиент привязан к хосту и ключу провайдера: ключ подставляется в параметры каждого
+запроса, ответ оборачивается в ApiResponse и проверяется make_verification сразу
+по уже разобранному телу. Запросы уходят через keep-alive пул соединений клиента,
+поэтому повторные вызовы и вызовы из gather() не открывают новое соединение на каждый запрос.
+
+Адрес метода - хост и PROVIDER_PATH, параметры передаются формой, как в make_request
+из website_tests.utils. Путь задается переменной окружения PROVIDER_PATH.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api_tools.client import TIMEOUT, make_session
+from api_tools.latency import timed
+from api_tools.response import ApiResponse
+from website_tests.utils import make_verification
+
+
+PROVIDER_PATH = os.environ.get('PROVIDER_PATH', '/api/provider/{method}')
+GATHER_WORKERS = 8
+
+_clients = {}
+_clients_lock = Lock()
+
+
+def make_provider_session():
+    """
+    Сессия с пулом соединений для провайдерского api.
+    Параметры уходят формой, поэтому json-заголовок сессии json-rpc убирается.
+
+    :return: requests.Session
+    """
+    session = make_session(GATHER_WORKERS)
+    session.headers.pop('Content-Type', None)
+
+    return session
+
+
+@timed
+def _post(host, method, params, session, timeout):
+    try:
+        response = session.post(host + PROVIDER_PATH.format(method=method), data=params, timeout=timeout)
+    except (ReadTimeout, ConnectionError):
+        pytest.fail('Время установки соединения превышает предельно допустимое значение')
+
+    return ApiResponse(response)
+
+
+class ProviderClient:
+    """
+    Клиент провайдерского api одного хоста с ключом key.
+    Параметры передаются именованными аргументами без ключа:
+    provider.call('add_ip', ident=login, ip=address)
+    """
+    def __init__(self, host, key, session=None, timeout=TIMEOUT):
+        self.host = host
+        self.key = key
+        self.session = session if session is not None else make_provider_session()
+        self.timeout = timeout
+
+    def params(self, **params):
+        """
+        Параметры запроса с ключом провайдера.
+
+        :return: dict
+        """
+        return dict({'key': self.key}, **params)
+
+    def request(self, method, **params):
+        """
+        Запрос без проверки ответа, для негативных сценариев.
+
+        :return: ApiResponse
+        """
+        return _post(self.host, method, self.params(**params), self.session, self.timeout)
+
+    def call(self, method, **params):
+        """
+        Запрос с проверкой ответа make_verification.
+        Тело разбирается один раз, проверка и тест читают один и тот же разобранный ответ.
+
+        :return: ApiResponse
+        """
+        response = self.request(method, **params)
+        make_verification(response)
+
+        return response
+
+    def gather(self, *calls, verify=True):
+        """
+        Одновременная отправка независимых вызовов через пул соединений клиента.
+        calls - кортежи (method, dict параметров), например
+        provider.gather(('profiles', {'ident': login}), ('add_ip', {'ident': login, 'ip': address}))
+
+        :return: list of ApiResponse - ответы в порядке вызовов
+        """
+        send = self.call if verify else self.request
+
+        with ThreadPoolExecutor(max_workers=min(len(calls), GATHER_WORKERS) or 1) as executor:
+            futures = [executor.submit(send, method, **params) for method, params in calls]
+
+            return [future.result() for future in futures]
+
+    def close(self):
+        self.session.close()
+
+
+def get_provider_client(host, key):
+    """
+    Возвращает клиента провайдерского api для хоста и ключа,
+    у каждой пары хост-ключ свой пул соединений.
+
+    :return: ProviderClient
+    """
+    with _clients_lock:
+        client = _clients.get((host, key))
+        if client is None:
+            client = _clients[host, key] = ProviderClient(host, key)
+
+    return client
+
+
+def close_provider_clients():
+    """
+    Закрывает пулы соединений всех клиентов и сбрасывает клиентов.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
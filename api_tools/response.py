@@ -0,0 +1,78 @@
+"""
+Модуль с оберткой ответа api, которая разбирает тело ответа один раз.
+"""
+from functools import wraps
+
+import pytest
+
+from api_tools.jsonlib import loads
+
+
+_NOT_PARSED = object()
+
+
+class ApiResponse:
+    """
+    Ответ json-rpc или провайдерского api.
+    Тело разбирается при первом обращении и запоминается, повторные обращения
+    к body, result, error, data и json() разбор не повторяют.
+    Остальные атрибуты (status_code, text, headers) берутся из requests.Response.
+    """
+    def __init__(self, response):
+        self.response = response
+        self._body = _NOT_PARSED
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def __repr__(self):
+        return '<ApiResponse [{}]>'.format(self.response.status_code)
+
+    @property
+    def body(self):
+        """
+        Разобранное тело ответа.
+        """
+        if self._body is _NOT_PARSED:
+            self._body = loads(self.response.content)
+
+        return self._body
+
+    def json(self):
+        """
+        Совместимость с requests.Response.json(), например для make_verification.
+        """
+        return self.body
+
+    def get(self, key):
+        """
+        Значение по ключу тела ответа, при его отсутствии тест падает.
+        """
+        try:
+            return self.body[key]
+        except KeyError:
+            pytest.fail('Ошибка поиска значения по ключу "{}" в ответе: {}'.format(key, self.body))
+
+    @property
+    def result(self):
+        return self.get('result')
+
+    @property
+    def error(self):
+        return self.get('error')
+
+    @property
+    def data(self):
+        return self.get('data')
+
+
+def parsed(func):
+    """
+    Декоратор для функций, возвращающих requests.Response, например make_request:
+    ответ оборачивается в ApiResponse.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return ApiResponse(func(*args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,479 @@
+"""
+Фаззинг json-rpc api: некорректные конверты, неверное число и типы параметров, огромные значения.
+
+Для каждого известного тестам метода запросы строятся из описания параметров METHODS:
+    - envelope: испорченный конверт - не json, обрезанный json, неверные jsonrpc, method,
+      params и id, пустой и мусорный пакет, глубокая вложенность;
+    - arity: меньше или больше параметров, чем ждет метод;
+    - types: один параметр заменяется значением другого типа;
+    - huge: огромная строка или массив на месте параметра.
+Половина запросов уходит с авторизацией пользователя пула, половина без нее.
+Допустимые id профиля, пресета и домена берутся у пользователя пула: его профиль,
+активный пресет профиля и домен, добавленный перед прогоном в черный список.
+
+Запросы отправляются параллельно через общий keep-alive пул соединений с ограничением
+частоты. В ответах ищутся статус 5xx, трейсбэк, список методов api ("Available methods"),
+тело не в json и обрыв соединения, а по окончании - выбросы времени ответа по методам.
+Запрос number строится из Random(seed + number), так что находка воспроизводится по номеру.
+
+Запуск:
+    python -m api_tools.rpc_fuzz --emulator xorp --requests 20000 --rate 200
+    python -m api_tools.rpc_fuzz --host https://www.xorp.ru --requests 5000 --rate 50
+"""
+import argparse
+import json
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from time import monotonic, perf_counter, sleep
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from api_tools.client import get_rpc_client, make_session
+from api_tools.jsonlib import loads
+from api_tools.load import percentile
+from api_tools.user_pool import get_user_pool
+
+
+WORKERS = 16
+# Запросов в секунду на все потоки
+RATE = 100
+# Размер огромной строки в символах и огромного массива в элементах
+HUGE_STRING = 64 * 1024
+HUGE_ARRAY = 10000
+NESTING = 1000
+# Выброс: время ответа больше p50 метода в OUTLIER_FACTOR раз и не меньше OUTLIER_MIN_MS
+OUTLIER_FACTOR = 10
+OUTLIER_MIN_MS = 200
+# Сколько примеров запроса и ответа хранить на одну находку
+EXAMPLE_LENGTH = 300
+# Домен в черном списке профиля, id которого подставляется в removeDomain
+FUZZ_DOMAIN = 'fuzz.domain.ru'
+
+# Параметры методов: вид значения каждого параметра
+METHODS = {
+    'testAuth': ('login', 'password'),
+    'getPlans': (),
+    'getPlan': (),
+    'userInfo': (),
+    'getAPCVersion': (),
+    'myip': (),
+    'systemInfo': (),
+    'getAdvertising': (),
+    'categories': (),
+    'profiles': (),
+    'addProfile': ('name',),
+    'removeProfile': ('profile_id',),
+    'renameProfile': ('profile_id', 'name'),
+    'getProfile': ('uid', 'hostname', 'version', 'os_info', 'address'),
+    'setProfile': ('uid', 'profile_id'),
+    'updateNic': ('profile_id', 'hostname'),
+    'presetList': ('profile_id', 'locale'),
+    'getActivePresetList': ('profile_id',),
+    'setActivePresets': ('profile_id', 'preset_ids'),
+    'setPresetSafeSearchEnabled': ('profile_id', 'flag'),
+    'setPresetSafeYoutubeEnabled': ('profile_id', 'preset_id', 'flag'),
+    'setWhiteListOnly': ('profile_id', 'flag'),
+    'setSafeSearchEnabled': ('profile_id', 'flag'),
+    'setSafeYoutubeEnabled': ('profile_id', 'flag'),
+    'setBlockUnknownEnabled': ('profile_id', 'flag'),
+    'userFilter': ('profile_id',),
+    'setFilterCat': ('profile_id', 'category', 'flag'),
+    'setFilterCats': ('profile_id', 'categories'),
+    'domains': ('profile_id', 'list_type'),
+    'addDomain': ('profile_id', 'list_type', 'domain', 'address'),
+    'removeDomain': ('profile_id', 'list_type', 'domain_id'),
+    'clearDomains': ('profile_id', 'list_type'),
+    'setSchedule': ('profile_id', 'schedule'),
+    'setScheduleEnabled': ('profile_id', 'flag'),
+    'multiSchedule': ('profile_id',),
+    'profileScheduleActivity': ('profile_id',),
+    'getCategoriesDailyStats': ('profile_id', 'locale', 'categories'),
+}
+# Методы с побочным эффектом вне api (новые пользователи, письма в поддержку),
+# фаззятся только с --all-methods
+SIDE_EFFECT_METHODS = {
+    'register': ('login', 'password'),
+    'feedback': ('title', 'message'),
+}
+
+STRATEGIES = ('envelope', 'arity', 'types', 'huge')
+
+CHECKS = {
+    'server_error': 'Статус 5xx',
+    'traceback': 'Трейсбэк в ответе',
+    'methods_leak': 'Список методов api в ответе',
+    'not_json': 'Тело ответа не json',
+    'connection': 'Соединение оборвано или ответ не получен за таймаут',
+}
+
+TRACEBACK_MARKERS = ('Traceback (most recent call last)', 'File "/')
+METHODS_LEAK_MARKER = 'Available methods'
+
+WRONG_VALUES = (
+    None, True, False, 0, -1, 2 ** 31, 2 ** 63, -2 ** 63, 10 ** 30, 0.5, -1e308, '', ' ', '0', '-1',
+    'null', 'true', '[]', '{}', '\u0000', '\u202e', 'ё' * 10, '%s%n', '../../etc/passwd', "' OR 1=1 --",
+    [], [None], [[[]]], {}, {'id': 1}, {'__proto__': {}},
+)
+
+
+def encode(value):
+    """
+    Тело запроса. Стандартный json, а не jsonlib.dumps: orjson не сериализует целые больше 64 бит.
+
+    :return: bytes
+    """
+    return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+
+def valid_value(kind, rng, context):
+    """
+    Допустимое значение параметра, чтобы запрос доходил до проверки остальных параметров.
+    """
+    if kind in ('profile_id', 'preset_id', 'domain_id'):
+        return context.get(kind) or rng.randint(1, 1000)
+    if kind == 'preset_ids':
+        return [context.get('preset_id') or rng.randint(1, 48)]
+    if kind == 'flag':
+        return rng.choice([True, False, 'true', ''])
+    if kind == 'category':
+        return rng.randint(2, 66)
+    if kind == 'categories':
+        return rng.sample(range(2, 61), rng.randint(0, 5))
+    if kind == 'list_type':
+        return rng.choice(['black', 'white', 'alias'])
+    if kind == 'locale':
+        return rng.choice(['en', 'ru'])
+    if kind == 'schedule':
+        return [[0, True], [rng.randint(1, 10079), False]]
+    if kind == 'domain':
+        return 'fuzz-{}.domain.ru'.format(rng.randint(0, 10 ** 6))
+    if kind == 'address':
+        return '100.64.{}.{}'.format(rng.randint(0, 255), rng.randint(1, 254))
+    if kind == 'uid':
+        return 'fuzz-uid-{}'.format(rng.randint(0, 10 ** 6))
+
+    return 'fuzz_{}'.format(rng.randint(0, 10 ** 6))
+
+
+class RequestGenerator:
+    """
+    Строит тело запроса для случая number.
+    """
+    def __init__(self, methods, seed=0, huge_string=HUGE_STRING, huge_array=HUGE_ARRAY):
+        self.methods = methods
+        self.names = sorted(methods)
+        self.seed = seed
+        self.huge_string = huge_string
+        self.huge_array = huge_array
+
+    def generate(self, number, context):
+        """
+        :return: tuple(метод, стратегия, тело запроса в bytes)
+        """
+        rng = Random(self.seed + number)
+        method = rng.choice(self.names)
+        kinds = self.methods[method]
+        strategy = rng.choice(STRATEGIES)
+        params = [valid_value(kind, rng, context) for kind in kinds]
+
+        if strategy == 'envelope':
+            return method, strategy, self.envelope(rng, method, params)
+
+        if strategy == 'arity':
+            extra = rng.randint(1, 3)
+            params = params[:rng.randrange(len(params))] if params and rng.random() < 0.5 \
+                else params + [valid_value('name', rng, context) for _ in range(extra)]
+        elif strategy == 'types':
+            if params:
+                params[rng.randrange(len(params))] = rng.choice(WRONG_VALUES)
+            else:
+                params = [rng.choice(WRONG_VALUES)]
+        elif strategy == 'huge':
+            huge = rng.choice([
+                'x' * self.huge_string,
+                'я' * self.huge_string,
+                list(range(self.huge_array)),
+                ['x' * 100] * (self.huge_array // 10),
+            ])
+            if params:
+                params[rng.randrange(len(params))] = huge
+            else:
+                params = [huge]
+
+        return method, strategy, encode({'jsonrpc': '2.0', 'method': method, 'params': params, 'id': number})
+
+    def envelope(self, rng, method, params):
+        request = {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': 1}
+        variant = rng.randrange(14)
+
+        if variant == 0:
+            return b'not json at all'
+        if variant == 1:
+            return encode(request)[:-rng.randint(1, 10)]
+        if variant == 2:
+            return encode(dict(request, jsonrpc=rng.choice(['1.0', '3.0', None, 2, ''])))
+        if variant == 3:
+            return encode({key: value for key, value in request.items() if key != 'method'})
+        if variant == 4:
+            return encode(dict(request, method=rng.choice(WRONG_VALUES)))
+        if variant == 5:
+            return encode(dict(request, params=rng.choice([None, 'params', 1, {'profile_id': 1}])))
+        if variant == 6:
+            return encode(dict(request, id=rng.choice([{}, [], 1.5, 'id', None, 2 ** 63])))
+        if variant == 7:
+            return b'[]'
+        if variant == 8:
+            return encode([1, 'x', None, request])
+        if variant == 9:
+            return b'[' * NESTING + b']' * NESTING
+        if variant == 10:
+            return encode(dict(request, method='x' * self.huge_string))
+        if variant == 11:
+            return encode(dict(request, method='{}_{}'.format(method, 'missing')))
+        if variant == 12:
+            return encode([request] * rng.randint(100, 1000))
+        return '{{"jsonrpc": "2.0", "method": "{}", "params": [\xff]}}'.format(method).encode('latin-1')
+
+
+class RateLimiter:
+    """
+    Равномерное ограничение частоты запросов для всех потоков.
+    """
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+
+        if slot > now:
+            sleep(slot - now)
+
+
+def inspect_response(status_code, text):
+    """
+    Проверки одного ответа.
+
+    :return: list of str - названия сработавших проверок из CHECKS
+    """
+    found = []
+    if status_code >= 500:
+        found.append('server_error')
+    if any(marker in text for marker in TRACEBACK_MARKERS):
+        found.append('traceback')
+    if METHODS_LEAK_MARKER in text:
+        found.append('methods_leak')
+    if text:
+        try:
+            loads(text)
+        except ValueError:
+            found.append('not_json')
+
+    return found
+
+
+class RpcFuzzer:
+    """
+    Параллельный прогон requests запросов с частотой не выше rate в секунду.
+    """
+    def __init__(self, host, requests, workers=WORKERS, rate=RATE, seed=0, duration=None, methods=None):
+        self.host = host
+        self.requests = requests
+        self.workers = workers
+        self.duration = duration
+        self.generator = RequestGenerator(methods or METHODS, seed)
+        self.limiter = RateLimiter(rate)
+        self.session = make_session(workers)
+        self.url = get_rpc_client(host).url
+        self._lock = threading.Lock()
+        self._next_number = 0
+        self._latency = defaultdict(list)
+        self._findings = {}
+        self._counts = defaultdict(int)
+
+    def run(self):
+        """
+        :return: dict - отчет
+        """
+        pool = get_user_pool(self.host, 1, profiles=1)
+        user = pool.lease()
+        started = monotonic()
+        deadline = started + self.duration if self.duration else None
+
+        try:
+            context = self.make_context(user, pool.get_profiles(user)[0].id)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self._worker, context, deadline) for _ in range(self.workers)]
+                for future in futures:
+                    future.result()
+        finally:
+            pool.release(user)
+            self.session.close()
+
+        elapsed = monotonic() - started
+
+        return {
+            'requests': self._counts['requests'],
+            'seconds': round(elapsed, 2),
+            'requests_per_minute': round(self._counts['requests'] / elapsed * 60) if elapsed else 0,
+            'statuses': {key: value for key, value in self._counts.items() if key != 'requests'},
+            'findings': list(self._findings.values()),
+            'outliers': self.outliers(),
+        }
+
+    def make_context(self, user, profile_id):
+        """
+        Настоящие id пользователя для допустимых значений параметров.
+        Добавленный домен удаляется при возврате пользователя в пул.
+
+        :return: dict
+        """
+        client = get_rpc_client(self.host, *user)
+        presets, domain = client.batch([
+            ('getActivePresetList', profile_id),
+            ('addDomain', profile_id, 'black', FUZZ_DOMAIN),
+        ])
+
+        try:
+            return {
+                'auth': user,
+                'profile_id': profile_id,
+                'preset_id': loads(presets['result'])[0],
+                'domain_id': domain['result'],
+            }
+        except (KeyError, IndexError):
+            pytest.fail('Ошибка поиска пресета и домена в ответах: {}, {}'.format(presets, domain))
+
+    def outliers(self):
+        """
+        Самые медленные ответы по методам, если они сильно выбиваются из p50 метода.
+
+        :return: list of dict
+        """
+        found = []
+        for method, samples in self._latency.items():
+            median = percentile(sorted(elapsed for elapsed, _ in samples), 50)
+            threshold = max(median * OUTLIER_FACTOR, OUTLIER_MIN_MS)
+            slow = sorted((sample for sample in samples if sample[0] > threshold), reverse=True)
+            if slow:
+                found.append({
+                    'method': method,
+                    'p50': round(median, 2),
+                    'count': len(slow),
+                    'max': round(slow[0][0], 2),
+                    'case': slow[0][1],
+                })
+
+        return sorted(found, key=lambda item: item['max'], reverse=True)
+
+    def _worker(self, context, deadline):
+        while deadline is None or monotonic() < deadline:
+            with self._lock:
+                number = self._next_number
+                self._next_number += 1
+            if number >= self.requests:
+                break
+
+            self.limiter.wait()
+            self._run_case(number, context)
+
+    def _run_case(self, number, context):
+        method, strategy, data = self.generator.generate(number, context)
+        auth = context['auth'] if number % 2 else None
+        started = perf_counter()
+
+        try:
+            response = self.session.post(self.url, data=data, auth=auth, timeout=10)
+            status, text, checks = response.status_code, response.text, None
+        except (ReadTimeout, ConnectionError) as error:
+            status, text, checks = None, str(error), ['connection']
+        elapsed = (perf_counter() - started) * 1000
+
+        if checks is None:
+            checks = inspect_response(status, text)
+
+        with self._lock:
+            self._counts['requests'] += 1
+            self._counts[str(status)] += 1
+            if strategy != 'huge':
+                self._latency[method].append((elapsed, number))
+            for check in checks:
+                key = (check, method, strategy)
+                if key in self._findings:
+                    self._findings[key]['count'] += 1
+                    continue
+                self._findings[key] = {
+                    'check': check,
+                    'description': CHECKS[check],
+                    'method': method,
+                    'strategy': strategy,
+                    'case': number,
+                    'authorized': auth is not None,
+                    'count': 1,
+                    'request': data[:EXAMPLE_LENGTH].decode('utf-8', 'replace'),
+                    'response': '{} {}'.format(status, text[:EXAMPLE_LENGTH]),
+                }
+
+
+def format_report(report):
+    lines = ['Запросов: {requests} за {seconds} с ({requests_per_minute} в минуту)'.format(**report)]
+    lines.append('Статусы: {}'.format(', '.join(
+        '{}: {}'.format(status, count) for status, count in sorted(report['statuses'].items()))))
+
+    for finding in report['findings']:
+        lines.append(
+            '{description}: {method}, {strategy}, случай {case}, повторов {count}, '
+            'с авторизацией: {authorized}'.format(**finding)
+        )
+        lines.append('    запрос: {}'.format(finding['request']))
+        lines.append('    ответ: {}'.format(finding['response']))
+
+    for outlier in report['outliers']:
+        lines.append('Медленные ответы {method}: {count}, максимум {max} мс при p50 {p50} мс, '
+                     'случай {case}'.format(**outlier))
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Фаззинг json-rpc api')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--host', help='адрес хоста, например https://www.xorp.ru')
+    target.add_argument('--emulator', choices=['xorp', 'tredy'], help='запустить локальный эмулятор')
+    parser.add_argument('--requests', type=int, default=10000, help='число запросов')
+    parser.add_argument('--duration', type=float, help='ограничение по времени в секундах')
+    parser.add_argument('--rate', type=float, default=RATE, help='запросов в секунду, 0 - без ограничения')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='число параллельных запросов')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--all-methods', action='store_true', help='фаззить и ' + ', '.join(SIDE_EFFECT_METHODS))
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    host = args.host
+    if args.emulator:
+        from api_tools.emulator import Emulator
+        host = Emulator(args.emulator).start_in_thread()
+
+    methods = dict(METHODS, **SIDE_EFFECT_METHODS) if args.all_methods else METHODS
+    report = RpcFuzzer(
+        host, args.requests, workers=args.workers, rate=args.rate, seed=args.seed, duration=args.duration,
+        methods=methods,
+    ).run()
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    if report['findings']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
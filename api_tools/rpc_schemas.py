@@ -0,0 +1,117 @@
+"""
+Схемы ответов методов json-rpc api и скомпилированные по ним валидаторы.
+
+Схемы формы (USER_INFO, PROFILE, PRESET_LIST) проверяют только структуру и типы
+и подходят для любого ответа, например в нагрузочном прогоне.
+Схемы ожидаемых значений (DEFAULT_USER_INFO, DEFAULT_PROFILE, NEW_PROFILE, DEFAULT_PRESET_LIST)
+проверяют еще и стандартные настройки свежего пользователя. Значения, которые отличаются
+у ксорпа и треди, задаются через Param и передаются при проверке.
+"""
+from api_tools.schema import Dict, Falsy, Items, Json, ListOf, Param, Truthy, compile_schema
+
+
+NUMBER = (int, float)
+
+USER_INFO = {
+    'plan': {
+        'code': str,
+        'name': str,
+        'features': dict,
+    },
+    'tz': NUMBER,
+    'tz_minutes': NUMBER,
+}
+
+DEFAULT_USER_INFO = {
+    'plan': {
+        'code': 'PREMIUM',
+        'name': Param('plan_name'),
+        'features': {
+            'aliases_list_size': 15,
+            'agent_ip_mode': Falsy,
+            'safe_search': Truthy,
+            'max_profiles': 3,
+            'white_list_mode': Truthy,
+            'show_dns_listen_addr': Falsy,
+            'black_list_size': Param('list_size'),
+            'white_list_size': Param('list_size'),
+        },
+    },
+    'tz': Param('tz'),
+    'tz_minutes': Param('tz_minutes'),
+}
+
+PROFILE_FIELDS = {
+    'id': int,
+    'name': str,
+    'default': bool,
+    'token': int,
+    'white_list_only': bool,
+    'safe_search_enabled': bool,
+    'is_schedule_enabled': bool,
+    'safe_youtube_enabled': bool,
+    'block_unknown_enabled': bool,
+}
+
+# Настройки фильтрации профиля по умолчанию
+DEFAULT_SETTINGS = {
+    'white_list_only': Falsy,
+    'safe_search_enabled': Falsy,
+    'is_schedule_enabled': Falsy,
+    'safe_youtube_enabled': Falsy,
+    'block_unknown_enabled': Falsy,
+}
+
+PROFILE = Dict(PROFILE_FIELDS, strict=True)
+
+# Дефолтный профиль свежего пользователя сверяется целиком, включая число полей
+DEFAULT_PROFILE = Dict(dict(PROFILE_FIELDS, default=Truthy, **DEFAULT_SETTINGS), strict=True)
+
+# Новый профиль проверяется только по перечисленным ключам
+NEW_PROFILE = Dict(dict(PROFILE_FIELDS, name=Param('name'), default=Falsy, **DEFAULT_SETTINGS))
+
+PRESET_FIELDS = {
+    'id': (int, type(None)),
+    'name': str,
+    'icon': str,
+    'description': (str, type(None)),
+    'is_custom': bool,
+    'is_combine': bool,
+    'all_cats': [int],
+    'white_list_only': bool,
+    'safe_search_enabled': bool,
+    'safe_youtube_enabled': bool,
+    'block_ads': bool,
+    'block_unknown_sites': bool,
+}
+
+# Три стандартных пресета и пользовательский
+PRESETS = Items(
+    Dict(dict(PRESET_FIELDS, name='Kids', is_custom=False), strict=True),
+    Dict(dict(PRESET_FIELDS, name='Block All', is_custom=False), strict=True),
+    Dict(dict(PRESET_FIELDS, name='Allow All', is_custom=False), strict=True),
+    Dict(dict(PRESET_FIELDS, name='Custom', is_custom=True, id=int), strict=True),
+)
+
+# presetList возвращает список пресетов строкой с json. Число стандартных пресетов
+# у хостов разное (48 у ксорпа), поэтому схема формы проверяет только поля пресетов
+PRESET_LIST = Json(ListOf(Dict(PRESET_FIELDS)))
+DEFAULT_PRESET_LIST = Json(PRESETS)
+
+validate_user_info = compile_schema(USER_INFO, 'validate_user_info')
+validate_default_user_info = compile_schema(DEFAULT_USER_INFO, 'validate_default_user_info')
+validate_profiles = compile_schema([PROFILE], 'validate_profiles')
+validate_default_profile = compile_schema(DEFAULT_PROFILE, 'validate_default_profile')
+validate_profile = compile_schema(PROFILE, 'validate_profile')
+validate_new_profile = compile_schema(NEW_PROFILE, 'validate_new_profile')
+validate_presets = compile_schema(PRESETS, 'validate_presets')
+validate_preset_list = compile_schema(PRESET_LIST, 'validate_preset_list')
+validate_default_preset_list = compile_schema(DEFAULT_PRESET_LIST, 'validate_default_preset_list')
+
+# Валидаторы формы ответа по имени метода
+VALIDATORS = {
+    'userInfo': validate_user_info,
+    'profiles': validate_profiles,
+    'addProfile': validate_profile,
+    'presetList': validate_preset_list,
+}
@@ -0,0 +1,148 @@
+"""
+Эталонная модель расписания фильтрации профиля (setSchedule, profileScheduleActivity).
+
+Расписание - отсортированный список переходов [[минута недели, активность], ...],
+минуты отсчитываются от полуночи понедельника в часовом поясе пользователя (tz_minutes
+из userInfo). До первого перехода недели действует активность последнего перехода,
+следующее переключение после последнего перехода - первый переход следующей недели.
+
+schedule_activity считает ответ profileScheduleActivity для одной минуты,
+activity_table - сразу для всех 10080 минут недели. Если установлен numpy,
+таблица строится векторно через searchsorted, иначе заполнением срезов списка.
+"""
+from datetime import datetime, timedelta, timezone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+MINUTES_IN_WEEK = 7 * 24 * 60
+# Ответ profileScheduleActivity, когда расписание выключено или пустое
+ALWAYS_ACTIVE = [True, -1]
+# Допустимое расхождение часов тестовой машины и сервера, минуты
+CLOCK_SKEW = 1
+
+
+def week_minute(moment=None, tz_minutes=0):
+    """
+    Минута недели (с понедельника) момента moment в часовом поясе со смещением tz_minutes.
+
+    :return: int
+    """
+    moment = (moment or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    local = moment + timedelta(minutes=tz_minutes)
+
+    return local.weekday() * 24 * 60 + local.hour * 60 + local.minute
+
+
+def schedule_activity(schedule, minute):
+    """
+    Активность фильтрации по расписанию в заданную минуту недели.
+    schedule - отсортированный список переходов [[минута недели, активность], ...].
+
+    :return: list [активность, минута недели следующего переключения или -1]
+    """
+    if not schedule:
+        return list(ALWAYS_ACTIVE)
+
+    active = schedule[-1][1]
+    next_change = schedule[0][0]
+
+    for start, state in schedule:
+        if start > minute:
+            next_change = start
+            break
+        active = state
+
+    return [active, next_change]
+
+
+def activity_table(schedule):
+    """
+    Ответы profileScheduleActivity для всех минут недели.
+
+    :return: tuple(активность по минутам, следующее переключение по минутам) - массивы numpy
+        или списки длиной MINUTES_IN_WEEK
+    """
+    if not schedule:
+        return [True] * MINUTES_IN_WEEK, [-1] * MINUTES_IN_WEEK
+
+    starts = [start for start, _ in schedule]
+    states = [bool(state) for _, state in schedule]
+
+    if numpy is not None:
+        starts = numpy.array(starts)
+        # Число переходов не позже минуты; индекс -1 (до первого перехода) - последний переход
+        index = numpy.searchsorted(starts, numpy.arange(MINUTES_IN_WEEK), side='right')
+        return numpy.array(states)[index - 1], starts[index % len(starts)]
+
+    active = [states[-1]] * MINUTES_IN_WEEK
+    next_change = [starts[0]] * MINUTES_IN_WEEK
+    previous = 0
+    for number, start in enumerate(starts):
+        following = starts[number + 1] if number + 1 < len(starts) else MINUTES_IN_WEEK
+        active[start:following] = [states[number]] * (following - start)
+        next_change[previous:start] = [start] * (start - previous)
+        previous = start
+
+    return active, next_change
+
+
+def expected_activity(table, minutes):
+    """
+    Допустимые ответы profileScheduleActivity за интервал минут недели,
+    например между отправкой запроса и получением ответа.
+
+    :return: list of list [активность, следующее переключение]
+    """
+    active, next_change = table
+    answers = []
+
+    for minute in minutes:
+        answer = [bool(active[minute % MINUTES_IN_WEEK]), int(next_change[minute % MINUTES_IN_WEEK])]
+        if answer not in answers:
+            answers.append(answer)
+
+    return answers
+
+
+def random_schedule(rng, max_transitions=8):
+    """
+    Случайное корректное расписание: от 1 до max_transitions переходов в разные минуты,
+    активность соседних переходов чередуется.
+
+    :return: list [[минута недели, активность], ...]
+    """
+    minutes = sorted(rng.sample(range(MINUTES_IN_WEEK), rng.randint(1, max_transitions)))
+    active = rng.random() < 0.5
+
+    schedule = []
+    for minute in minutes:
+        schedule.append([minute, active])
+        active = not active
+
+    return schedule
+
+
+def check_activity(client, profile_id, table, tz_minutes):
+    """
+    Сверяет ответ profileScheduleActivity с таблицей activity_table расписания профиля.
+    Сервер считает активность по своим часам в момент запроса, поэтому допустим ответ
+    для любой минуты между отправкой запроса и получением ответа с запасом CLOCK_SKEW.
+
+    :return: list - ответ profileScheduleActivity
+    """
+    before = week_minute(tz_minutes=tz_minutes)
+    result = client.call('profileScheduleActivity', profile_id).result
+    after = week_minute(tz_minutes=tz_minutes)
+    if after < before:
+        after += MINUTES_IN_WEEK
+
+    expected = expected_activity(table, range(before - CLOCK_SKEW, after + CLOCK_SKEW + 1))
+
+    assert result in expected, 'Активность {} не совпадает с расписанием, ожидалось одно из {}'.format(
+        result, expected)
+
+    return result
@@ -0,0 +1,376 @@
+"""
+Генеративная проверка setSchedule/multiSchedule.
+
+Каждый случай - случайное расписание, корректное или испорченное одной из мутаций:
+переходы не по порядку, повтор минуты, минута вне недели, минута не целым числом,
+переход неверной формы, слишком много переходов. Ожидаемый ответ определяет
+is_valid_schedule, а не вид мутации, поэтому мутация, случайно давшая корректное
+расписание, ошибкой не считается. Проверяется, что:
+    - корректное расписание принимается и multiSchedule возвращает его без изменений;
+    - некорректное отклоняется ошибкой json-rpc, а сохраненное расписание не меняется.
+
+Корректным считается только то, что подтверждают тесты setSchedule и multiSchedule:
+непустое расписание не длиннее PROVEN_TRANSITIONS переходов. Для пустого и более длинного
+расписания (если ограничение сервера не передано в max_transitions) и для минуты true
+ожидаемый ответ не известен: такое расписание можно принять или отклонить, проверяется
+только, что принятое возвращается без изменений, а отклоненное не меняет сохраненное.
+
+Случаи выполняются параллельно: у каждого потока свой пользователь из пула со своим профилем.
+Найденное расхождение уменьшается до минимального расписания, на котором оно повторяется:
+сначала удаляются группы переходов, затем упрощаются оставшиеся.
+
+Запуск на локальном эмуляторе и на хосте с ограничением по числу случаев и времени:
+    python -m api_tools.schedule_fuzz --emulator xorp --cases 5000 --workers 8
+    python -m api_tools.schedule_fuzz --host https://www.xorp.ru --cases 300 --duration 120
+"""
+import argparse
+import json
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from random import Random
+from threading import Lock
+from time import monotonic
+
+from api_tools.client import get_rpc_client
+from api_tools.schedule import MINUTES_IN_WEEK, random_schedule
+from api_tools.user_pool import get_user_pool
+
+
+WORKERS = 4
+# Попыток setSchedule на уменьшение одного расхождения
+SHRINK_ATTEMPTS = 200
+# Сколько разных расхождений уменьшать и показывать в отчете
+MAX_FAILURES = 5
+# Переходов в длинном корректном расписании
+LONG_SCHEDULE = 300
+# Число переходов в расписании, которое принимают тесты setSchedule и multiSchedule
+PROVEN_TRANSITIONS = 4
+
+# Вид случая и его вес при выборе
+KINDS = {
+    'valid': 8,
+    'empty': 1,
+    'long': 1,
+    'unsorted': 2,
+    'duplicate': 2,
+    'out_of_range': 2,
+    'not_int': 2,
+    'malformed': 2,
+    'too_long': 1,
+}
+
+FAILURES = {
+    'bad_response': 'Ответ setSchedule без result и error или с ошибкой сервера',
+    'accepted_invalid': 'Некорректное расписание принято',
+    'rejected_valid': 'Корректное расписание отклонено',
+    'round_trip': 'multiSchedule вернул не то расписание, что было установлено',
+    'changed_on_error': 'Расписание изменилось после отклоненного setSchedule',
+}
+
+
+def is_valid_schedule(schedule, max_transitions=None):
+    """
+    Корректно ли расписание: список пар [минута недели, активность] с целыми
+    минутами по возрастанию без повторов и не больше max_transitions переходов.
+
+    :return: True, False или None, если ожидаемый ответ сервера не известен
+    """
+    if not isinstance(schedule, list):
+        return False
+
+    verdict = True
+    previous = -1
+    for entry in schedule:
+        if not isinstance(entry, list) or len(entry) != 2:
+            return False
+        minute, active = entry
+        if isinstance(minute, bool):
+            # true в json - не число, но и отказ сервера тестами не подтвержден
+            verdict = None
+            minute = int(minute)
+        if not isinstance(minute, int) or not isinstance(active, bool):
+            return False
+        if not previous < minute < MINUTES_IN_WEEK:
+            return False
+        previous = minute
+
+    if max_transitions is not None:
+        return verdict if len(schedule) <= max_transitions else False
+    if not schedule or len(schedule) > PROVEN_TRANSITIONS:
+        return None
+
+    return verdict
+
+
+def generate_case(rng, max_transitions=None):
+    """
+    Случайный случай проверки.
+
+    :return: tuple(вид, расписание)
+    """
+    kind = rng.choices(list(KINDS), weights=list(KINDS.values()))[0]
+    limit = max_transitions or LONG_SCHEDULE
+
+    if kind == 'empty':
+        return kind, []
+    if kind == 'valid':
+        return kind, random_schedule(rng, min(max_transitions or PROVEN_TRANSITIONS, 12))
+    if kind == 'long':
+        return kind, random_schedule(rng, min(limit, LONG_SCHEDULE))
+    if kind == 'too_long':
+        return kind, random_schedule(rng, limit + rng.randint(1, 10))
+
+    schedule = random_schedule(rng, 12)
+    while kind == 'unsorted' and len(schedule) < 2:
+        schedule = random_schedule(rng, 12)
+    index = rng.randrange(len(schedule))
+    minute, active = schedule[index]
+
+    if kind == 'unsorted':
+        other = rng.choice([number for number in range(len(schedule)) if number != index])
+        schedule[index], schedule[other] = schedule[other], schedule[index]
+    elif kind == 'duplicate':
+        schedule.insert(index + 1, [minute, not active])
+    elif kind == 'out_of_range':
+        schedule[index][0] = rng.choice([-1, -rng.randint(2, 100000), MINUTES_IN_WEEK,
+                                         MINUTES_IN_WEEK + rng.randint(1, 100000)])
+    elif kind == 'not_int':
+        schedule[index][0] = rng.choice([minute + 0.5, str(minute), None, True, [minute]])
+    elif kind == 'malformed':
+        schedule[index] = rng.choice([[minute], [minute, active, 1], [], minute, {'minute': minute}])
+
+    return kind, schedule
+
+
+def simplify(entry):
+    """
+    Варианты перехода проще данного: меньшая минута, активность True.
+    """
+    if not isinstance(entry, list) or len(entry) != 2:
+        return []
+
+    minute, active = entry
+    variants = []
+    if isinstance(minute, int) and not isinstance(minute, bool):
+        for simpler in (0, minute // 2, minute - 1 if minute > 0 else minute + 1):
+            if abs(simpler) < abs(minute):
+                variants.append([simpler, active])
+    if active is not True:
+        variants.append([minute, True])
+
+    return variants
+
+
+class ScheduleChecker:
+    """
+    Проверка случаев на одном профиле. Запоминает сохраненное на сервере расписание,
+    чтобы проверить, что отклоненный setSchedule его не изменил.
+    """
+    def __init__(self, client, profile_id, max_transitions=None):
+        self.client = client
+        self.profile_id = profile_id
+        self.max_transitions = max_transitions
+        self.stored = client.call('multiSchedule', profile_id).result
+
+    def check(self, schedule):
+        """
+        :return: tuple(принято ли расписание, вид расхождения или None, подробности)
+        """
+        response = self.client.call('setSchedule', self.profile_id, schedule)
+        try:
+            body = response.body
+        except ValueError:
+            return False, 'bad_response', response.text[:200]
+        if response.status_code >= 500 or not isinstance(body, dict) or ('result' in body) == ('error' in body):
+            return False, 'bad_response', body
+
+        accepted = bool(body.get('result'))
+        valid = is_valid_schedule(schedule, self.max_transitions)
+        previous, self.stored = self.stored, self.client.call('multiSchedule', self.profile_id).result
+
+        if accepted and valid is False:
+            return accepted, 'accepted_invalid', self.stored
+        if accepted and self.stored != schedule:
+            return accepted, 'round_trip', self.stored
+        if not accepted and self.stored != previous:
+            return accepted, 'changed_on_error', self.stored
+        if not accepted and valid is True:
+            return accepted, 'rejected_valid', body.get('error')
+
+        return accepted, None, None
+
+    def shrink(self, schedule, failure, attempts=SHRINK_ATTEMPTS):
+        """
+        Минимальное расписание, на котором повторяется расхождение failure.
+
+        :return: tuple(расписание, подробности последнего повтора)
+        """
+        details = None
+
+        def fails(candidate):
+            nonlocal attempts, details
+            if attempts <= 0:
+                return False
+            attempts -= 1
+            _, candidate_failure, candidate_details = self.check(candidate)
+            if candidate_failure == failure:
+                details = candidate_details
+                return True
+            return False
+
+        if not isinstance(schedule, list):
+            return schedule, details
+
+        # Удаление групп переходов, от половины расписания до одного перехода
+        size = max(len(schedule) // 2, 1)
+        while schedule and size:
+            start = 0
+            while start < len(schedule):
+                candidate = schedule[:start] + schedule[start + size:]
+                if fails(candidate):
+                    schedule = candidate
+                else:
+                    start += size
+            size //= 2
+
+        # Упрощение оставшихся переходов
+        for index in range(len(schedule)):
+            for variant in simplify(schedule[index]):
+                candidate = schedule[:index] + [variant] + schedule[index + 1:]
+                if fails(candidate):
+                    schedule = candidate
+                    break
+
+        return schedule, details
+
+
+class ScheduleFuzzer:
+    """
+    Параллельный прогон cases случаев, но не дольше duration секунд.
+    Случай number генерируется из Random(seed + number) и воспроизводится по номеру.
+    """
+    def __init__(self, host, cases, workers=WORKERS, seed=0, duration=None, max_transitions=None,
+                 shrink_attempts=SHRINK_ATTEMPTS):
+        self.host = host
+        self.cases = cases
+        self.workers = workers
+        self.seed = seed
+        self.duration = duration
+        self.max_transitions = max_transitions
+        self.shrink_attempts = shrink_attempts
+        self._numbers = count()
+        self._lock = Lock()
+        self._done = 0
+        self._kinds = defaultdict(lambda: {'accepted': 0, 'rejected': 0})
+        self._failures = {}
+
+    def run(self):
+        """
+        :return: dict - отчет
+        """
+        pool = get_user_pool(self.host, self.workers, profiles=1)
+        started = monotonic()
+        deadline = started + self.duration if self.duration else None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self._worker, pool, deadline) for _ in range(self.workers)]
+            for future in futures:
+                future.result()
+
+        elapsed = monotonic() - started
+
+        return {
+            'cases': self._done,
+            'seconds': round(elapsed, 2),
+            'cases_per_minute': round(self._done / elapsed * 60) if elapsed else 0,
+            'seed': self.seed,
+            'kinds': dict(self._kinds),
+            'failures': list(self._failures.values()),
+        }
+
+    def _worker(self, pool, deadline):
+        user = pool.lease()
+        try:
+            client = get_rpc_client(self.host, *user)
+            checker = ScheduleChecker(client, pool.get_profiles(user)[0].id, self.max_transitions)
+
+            while deadline is None or monotonic() < deadline:
+                with self._lock:
+                    number = next(self._numbers)
+                if number >= self.cases:
+                    break
+                self._run_case(checker, number)
+        finally:
+            pool.release(user)
+
+    def _run_case(self, checker, number):
+        kind, schedule = generate_case(Random(self.seed + number), self.max_transitions)
+        accepted, failure, details = checker.check(schedule)
+
+        with self._lock:
+            self._done += 1
+            self._kinds[kind]['accepted' if accepted else 'rejected'] += 1
+            signature = (failure, kind)
+            if failure is None or signature in self._failures or len(self._failures) >= MAX_FAILURES:
+                return
+            # Место занимается сразу, чтобы другие потоки не уменьшали то же расхождение
+            self._failures[signature] = None
+
+        minimal, minimal_details = checker.shrink(schedule, failure, self.shrink_attempts)
+        with self._lock:
+            self._failures[signature] = {
+                'failure': failure,
+                'description': FAILURES[failure],
+                'kind': kind,
+                'case': number,
+                'size': len(schedule) if isinstance(schedule, list) else None,
+                'schedule': minimal,
+                'details': minimal_details if minimal_details is not None else details,
+            }
+
+
+def format_report(report):
+    lines = ['Случаев: {cases} за {seconds} с ({cases_per_minute} в минуту), seed {seed}'.format(**report)]
+    lines.append('{:<16}{:>10}{:>10}'.format('kind', 'accepted', 'rejected'))
+    for kind, counts in sorted(report['kinds'].items()):
+        lines.append('{:<16}{accepted:>10}{rejected:>10}'.format(kind, **counts))
+
+    for failure in report['failures']:
+        lines.append('{description} (случай {case}, вид {kind}, переходов {size}):'.format(**failure))
+        lines.append('    setSchedule: {}'.format(json.dumps(failure['schedule'])))
+        lines.append('    ответ: {}'.format(json.dumps(failure['details'], ensure_ascii=False)))
+
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Генеративная проверка setSchedule/multiSchedule')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--host', help='адрес хоста, например https://www.xorp.ru')
+    target.add_argument('--emulator', choices=['xorp', 'tredy'], help='запустить локальный эмулятор')
+    parser.add_argument('--cases', type=int, default=1000, help='число случаев')
+    parser.add_argument('--duration', type=float, help='ограничение по времени в секундах')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='число параллельных профилей')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-transitions', type=int, help='ограничение числа переходов на сервере')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    host = args.host
+    if args.emulator:
+        from api_tools.emulator import Emulator
+        host = Emulator(args.emulator).start_in_thread()
+
+    report = ScheduleFuzzer(
+        host, args.cases, workers=args.workers, seed=args.seed, duration=args.duration,
+        max_transitions=args.max_transitions,
+    ).run()
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+    if report['failures']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
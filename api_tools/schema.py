@@ -0,0 +1,254 @@
+"""
+Модуль компиляции схем ответов api в функции-валидаторы.
+
+Схема описывается обычными python-объектами:
+    int, str, (int, type(None))   - проверка типа
+    Truthy, Falsy                 - проверка истинности, как assert x / assert not x
+    Any                           - значение не проверяется
+    {'key': схема}                - словарь с обязательными ключами, лишние ключи допустимы
+    Dict({...}, strict=True)      - словарь без лишних ключей, Optional(схема) - необязательный ключ
+    [схема], ListOf(схема, length) - список однотипных элементов
+    Items(схема, схема, ...)      - список фиксированной длины с позиционными схемами
+    OneOf(значение, ...)          - одно из значений
+    Param('name')                 - равенство значению, переданному при проверке
+    Json(схема)                   - строка с json, разбирается и проверяется по схеме
+    любое другое значение         - равенство значению
+
+compile_schema() генерирует по схеме python-код функции и компилирует его,
+поэтому при проверке схема не интерпретируется. Валидатор проходит ответ целиком
+и возвращает все найденные нарушения, а не только первое.
+"""
+from itertools import count
+
+import pytest
+
+from api_tools.jsonlib import loads
+
+
+class _Marker:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+Any = _Marker('Any')
+Truthy = _Marker('Truthy')
+Falsy = _Marker('Falsy')
+
+
+class Dict:
+    def __init__(self, fields, strict=False):
+        self.fields = fields
+        self.strict = strict
+
+
+class Optional:
+    def __init__(self, schema):
+        self.schema = schema
+
+
+class ListOf:
+    def __init__(self, schema, length=None):
+        self.schema = schema
+        self.length = length
+
+
+class Items:
+    def __init__(self, *schemas):
+        self.schemas = schemas
+
+
+class OneOf:
+    def __init__(self, *values):
+        self.values = values
+
+
+class Param:
+    def __init__(self, name):
+        self.name = name
+
+
+class Json:
+    def __init__(self, schema):
+        self.schema = schema
+
+
+class _Compiler:
+    """
+    Генератор кода валидатора. Каждый узел схемы превращается в несколько строк
+    проверок, значения схемы попадают в пространство имен функции как константы.
+    """
+    def __init__(self):
+        self.lines = []
+        self.namespace = {'_loads': loads}
+        self._names = count()
+
+    def name(self, prefix):
+        return '{}{}'.format(prefix, next(self._names))
+
+    def const(self, value):
+        name = self.name('_c')
+        self.namespace[name] = value
+
+        return name
+
+    def emit(self, depth, line):
+        self.lines.append('    ' * depth + line)
+
+    def error(self, depth, path, message):
+        self.emit(depth, 'errors.append({} + ": " + {})'.format(path, message))
+
+    def node(self, schema, var, path, depth):
+        if schema is Any:
+            return
+        if schema is Truthy:
+            self.emit(depth, 'if not {}:'.format(var))
+            self.error(depth + 1, path, '"ожидается истинное значение, получено " + repr({})'.format(var))
+        elif schema is Falsy:
+            self.emit(depth, 'if {}:'.format(var))
+            self.error(depth + 1, path, '"ожидается ложное значение, получено " + repr({})'.format(var))
+        elif isinstance(schema, type) or (isinstance(schema, tuple) and all(isinstance(t, type) for t in schema)):
+            self.types(schema if isinstance(schema, tuple) else (schema,), var, path, depth)
+        elif isinstance(schema, dict):
+            self.dict(Dict(schema), var, path, depth)
+        elif isinstance(schema, Dict):
+            self.dict(schema, var, path, depth)
+        elif isinstance(schema, list):
+            self.list(ListOf(schema[0]), var, path, depth)
+        elif isinstance(schema, ListOf):
+            self.list(schema, var, path, depth)
+        elif isinstance(schema, Items):
+            self.items(schema, var, path, depth)
+        elif isinstance(schema, OneOf):
+            self.emit(depth, 'if {} not in {}:'.format(var, self.const(schema.values)))
+            self.error(depth + 1, path, '"ожидается одно из {!r}, получено " + repr({})'.format(schema.values, var))
+        elif isinstance(schema, Param):
+            self.emit(depth, 'if {} != params[{!r}]:'.format(var, schema.name))
+            self.error(depth + 1, path, '"ожидается " + repr(params[{!r}]) + ", получено " + repr({})'.format(
+                schema.name, var))
+        elif isinstance(schema, Json):
+            self.json(schema, var, path, depth)
+        else:
+            # bool и None сравниваются по идентичности, чтобы 0 не прошел за False
+            operator = 'is not' if schema is None or isinstance(schema, bool) else '!='
+            self.emit(depth, 'if {} {} {}:'.format(var, operator, self.const(schema)))
+            self.error(depth + 1, path, '"ожидается {!r}, получено " + repr({})'.format(schema, var))
+
+    def types(self, types, var, path, depth):
+        condition = 'not isinstance({}, {})'.format(var, self.const(types))
+        # bool - подкласс int, но за число его не принимаем
+        if int in types and bool not in types:
+            condition = 'isinstance({}, bool) or {}'.format(var, condition)
+        names = ' или '.join(t.__name__ for t in types)
+
+        self.emit(depth, 'if {}:'.format(condition))
+        self.error(depth + 1, path, '"ожидается {}, получено " + type({}).__name__'.format(names, var))
+
+    def dict(self, schema, var, path, depth):
+        self.emit(depth, 'if not isinstance({}, dict):'.format(var))
+        self.error(depth + 1, path, '"ожидается dict, получено " + type({}).__name__'.format(var))
+        self.emit(depth, 'else:')
+
+        for key, field in schema.fields.items():
+            optional = isinstance(field, Optional)
+            field = field.schema if optional else field
+            item_var = self.name('_v')
+            item_path = '{} + {!r}'.format(path, '.{}'.format(key))
+
+            self.emit(depth + 1, '{} = {}.get({!r}, _missing)'.format(item_var, var, key))
+            self.emit(depth + 1, 'if {} is _missing:'.format(item_var))
+            if optional:
+                self.emit(depth + 2, 'pass')
+            else:
+                self.error(depth + 2, item_path, '"ключ отсутствует"')
+            self.emit(depth + 1, 'else:')
+            self.emit(depth + 2, 'pass')
+            self.node(field, item_var, item_path, depth + 2)
+
+        if schema.strict:
+            extra = self.name('_v')
+            self.emit(depth + 1, '{} = {}.keys() - {}'.format(extra, var, self.const(frozenset(schema.fields))))
+            self.emit(depth + 1, 'if {}:'.format(extra))
+            self.error(depth + 2, path, '"лишние ключи " + repr(sorted({}))'.format(extra))
+
+    def list(self, schema, var, path, depth):
+        self.emit(depth, 'if not isinstance({}, list):'.format(var))
+        self.error(depth + 1, path, '"ожидается list, получено " + type({}).__name__'.format(var))
+        self.emit(depth, 'else:')
+        self.emit(depth + 1, 'pass')
+
+        if schema.length is not None:
+            self.length(schema.length, var, path, depth + 1)
+
+        if schema.schema is not Any:
+            index, item_var = self.name('_i'), self.name('_v')
+            self.emit(depth + 1, 'for {}, {} in enumerate({}):'.format(index, item_var, var))
+            self.emit(depth + 2, 'pass')
+            self.node(schema.schema, item_var, '{} + "[" + str({}) + "]"'.format(path, index), depth + 2)
+
+    def items(self, schema, var, path, depth):
+        self.emit(depth, 'if not isinstance({}, list):'.format(var))
+        self.error(depth + 1, path, '"ожидается list, получено " + type({}).__name__'.format(var))
+        self.emit(depth, 'else:')
+        self.emit(depth + 1, 'pass')
+        self.length(len(schema.schemas), var, path, depth + 1)
+
+        for index, item in enumerate(schema.schemas):
+            item_var = self.name('_v')
+            self.emit(depth + 1, 'if len({}) > {}:'.format(var, index))
+            self.emit(depth + 2, '{} = {}[{}]'.format(item_var, var, index))
+            self.node(item, item_var, '{} + {!r}'.format(path, '[{}]'.format(index)), depth + 2)
+
+    def length(self, length, var, path, depth):
+        if isinstance(length, Param):
+            expected = 'params[{!r}]'.format(length.name)
+        else:
+            expected = repr(length)
+
+        self.emit(depth, 'if len({}) != {}:'.format(var, expected))
+        self.error(depth + 1, path, '"ожидается длина " + str({}) + ", получено " + str(len({}))'.format(expected, var))
+
+    def json(self, schema, var, path, depth):
+        decoded = self.name('_v')
+        self.emit(depth, 'try:')
+        self.emit(depth + 1, '{} = _loads({})'.format(decoded, var))
+        self.emit(depth, 'except (TypeError, ValueError):')
+        self.error(depth + 1, path, '"ожидается строка с json, получено " + repr({})[:100]'.format(var))
+        self.emit(depth, 'else:')
+        self.emit(depth + 1, 'pass')
+        self.node(schema.schema, decoded, path, depth + 1)
+
+
+def compile_schema(schema, name='validate'):
+    """
+    Компилирует схему в функцию validate(value, params=None),
+    которая возвращает список нарушений вида "путь: описание". Пустой список - ответ корректен.
+    Сгенерированный код доступен в атрибуте source функции.
+
+    :return: function
+    """
+    compiler = _Compiler()
+    compiler.emit(0, 'def {}(value, params=None):'.format(name))
+    compiler.emit(1, 'errors = []')
+    compiler.node(schema, 'value', "'result'", 1)
+    compiler.emit(1, 'return errors')
+
+    source = '\n'.join(compiler.lines)
+    compiler.namespace['_missing'] = object()
+    exec(compile(source, '<schema {}>'.format(name), 'exec'), compiler.namespace)
+
+    validator = compiler.namespace[name]
+    validator.source = source
+
+    return validator
+
+
+def check_schema(validator, value, **params):
+    """
+    Проверяет значение валидатором, при нарушениях тест падает со списком всех нарушений.
+    """
+    errors = validator(value, params)
+    if errors:
+        pytest.fail('Ответ не соответствует схеме ({}):\n{}'.format(len(errors), '\n'.join(errors)))
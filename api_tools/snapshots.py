@@ -0,0 +1,188 @@
+"""
+Хранилище эталонных ответов api (снапшотов) с адресацией по содержимому.
+
+Эталон хранится в каноническом виде (json с отсортированными ключами) в файле
+snapshots/objects/<sha256>.json, индекс snapshots/index.json связывает ключ
+(хост, метод, локаль) с хешем. Проверка ответа сводится к сравнению хешей,
+эталон читается с диска и сравнивается поэлементно только при расхождении,
+чтобы показать, где именно ответ отличается.
+
+Обновление эталонов по текущим ответам:
+    UPDATE_SNAPSHOTS=1 pytest json_rpc_api_tests.py -k "categories or preset_list"
+"""
+import fcntl
+import json
+import os
+from hashlib import sha256
+from threading import Lock
+
+import pytest
+
+from api_tools.jsonlib import dumps
+
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'snapshots')
+DEFAULT_LOCALE = 'default'
+# Сколько расхождений показывать в сообщении об ошибке
+MAX_DIFF_LINES = 50
+
+
+def canonicalize(value):
+    """
+    Каноническое представление значения: одинаковые данные дают одинаковые байты.
+
+    :return: bytes
+    """
+    return dumps(value, sort_keys=True)
+
+
+def content_hash(value):
+    return sha256(canonicalize(value)).hexdigest()
+
+
+def diff(expected, actual, path='result'):
+    """
+    Поэлементное сравнение эталона с ответом.
+
+    :return: list of str - описания расхождений вида "путь: описание"
+    """
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        lines = []
+        for key in expected.keys() - actual.keys():
+            lines.append('{}.{}: ключ отсутствует в ответе'.format(path, key))
+        for key in actual.keys() - expected.keys():
+            lines.append('{}.{}: лишний ключ со значением {!r}'.format(path, key, actual[key]))
+        for key in expected.keys() & actual.keys():
+            lines.extend(diff(expected[key], actual[key], '{}.{}'.format(path, key)))
+        return sorted(lines)
+
+    if isinstance(expected, list) and isinstance(actual, list):
+        lines = []
+        if len(expected) != len(actual):
+            lines.append('{}: длина {} вместо {}'.format(path, len(actual), len(expected)))
+        for index, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+            lines.extend(diff(expected_item, actual_item, '{}[{}]'.format(path, index)))
+        for index in range(len(expected), len(actual)):
+            lines.append('{}[{}]: лишний элемент {!r}'.format(path, index, actual[index]))
+        for index in range(len(actual), len(expected)):
+            lines.append('{}[{}]: отсутствует элемент {!r}'.format(path, index, expected[index]))
+        return lines
+
+    if type(expected) is not type(actual) or expected != actual:
+        return ['{}: {!r} вместо {!r}'.format(path, actual, expected)]
+
+    return []
+
+
+class SnapshotStore:
+    """
+    Индекс снапшотов читается один раз при первой проверке.
+    В режиме обновления несовпадающие или отсутствующие эталоны записываются заново.
+    """
+    def __init__(self, directory=SNAPSHOT_DIR, update=False):
+        self.directory = directory
+        self.update = update
+        self.index_path = os.path.join(directory, 'index.json')
+        self._index = None
+        self._lock = Lock()
+
+    @staticmethod
+    def key(host, method, locale=None):
+        return '{} {} {}'.format(host, method, locale or DEFAULT_LOCALE)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', '{}.json'.format(digest))
+
+    @property
+    def index(self):
+        with self._lock:
+            if self._index is None:
+                self._index = self._read_index()
+
+        return self._index
+
+    def load(self, host, method, locale=None):
+        """
+        Эталон для ключа или None, если его нет.
+        """
+        digest = self.index.get(self.key(host, method, locale))
+        if digest is None:
+            return None
+
+        with open(self.object_path(digest), encoding='utf-8') as file:
+            return json.load(file)
+
+    def save(self, host, method, locale, value):
+        """
+        Записывает эталон и обновляет индекс. Индекс перечитывается под блокировкой каталога,
+        чтобы параллельные воркеры xdist не затирали записи друг друга.
+
+        :return: str - хеш эталона
+        """
+        digest = content_hash(value)
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+
+        if not os.path.exists(object_path):
+            self._write(object_path, json.dumps(value, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+
+        # Блокируется каталог, а не индекс: индекс заменяется новым файлом при записи
+        directory = os.open(self.directory, os.O_RDONLY)
+        try:
+            fcntl.flock(directory, fcntl.LOCK_EX)
+            index = self._read_index()
+            index[self.key(host, method, locale)] = digest
+            self._write(self.index_path, json.dumps(index, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+        finally:
+            os.close(directory)
+
+        with self._lock:
+            self._index = index
+
+        return digest
+
+    def check(self, host, method, value, locale=None):
+        """
+        Сравнивает значение с эталоном, при расхождении тест падает со списком отличий.
+        """
+        key = self.key(host, method, locale)
+        expected_digest = self.index.get(key)
+
+        if expected_digest is not None and content_hash(value) == expected_digest:
+            return
+
+        if self.update:
+            self.save(host, method, locale, value)
+            return
+
+        if expected_digest is None:
+            pytest.fail('Нет эталона для "{}", запишите его с UPDATE_SNAPSHOTS=1'.format(key))
+
+        lines = diff(self.load(host, method, locale), value)
+        if len(lines) > MAX_DIFF_LINES:
+            lines = lines[:MAX_DIFF_LINES] + ['... еще {}'.format(len(lines) - MAX_DIFF_LINES)]
+        pytest.fail('Ответ не совпадает с эталоном "{}":\n{}'.format(key, '\n'.join(lines)))
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    @staticmethod
+    def _write(path, text):
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temporary, 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(temporary, path)
+
+
+snapshots = SnapshotStore(update=bool(os.environ.get('UPDATE_SNAPSHOTS')))
+
+
+def assert_snapshot(host, method, value, locale=None):
+    """
+    Сравнивает ответ метода с эталоном общего хранилища.
+    """
+    snapshots.check(host, method, value, locale)
@@ -0,0 +1,310 @@
+"""
+Синтетическая статистика DNS-запросов по категориям и потоковое чтение getCategoriesDailyStats.
+
+Генератор строит историю запросов профиля по дням и категориям: несколько категорий
+дают основную часть запросов, остальные - длинный хвост, по выходным запросов меньше.
+Объем задается общим числом запросов (hits) и числом дней, результат воспроизводим по seed.
+
+Ответ getCategoriesDailyStats читается по частям: элементы result разбираются по мере
+получения данных и сразу агрегируются, весь ответ в памяти не держится.
+
+Замер на локальном эмуляторе (статистика генерируется и записывается в эмулятор):
+    python -m api_tools.stats --emulator xorp --hits 5000000 --days 365 --profiles 3
+
+Эмулятор работает в том же процессе, поэтому в пик памяти попадает и формирование ответа
+эмулятором, точные цифры потокового чтения дает замер на хосте.
+
+Замер на хосте для профиля, у которого уже есть статистика:
+    python -m api_tools.stats --host https://www.xorp.ru --login LOGIN --password PASSWORD --profile 123
+
+Выгрузка сгенерированной статистики в jsonl, по строке на день и категорию:
+    python -m api_tools.stats --hits 5000000 --days 365 --export stats.jsonl
+"""
+import argparse
+import codecs
+import json
+import re
+import tracemalloc
+from collections import Counter
+from datetime import date, timedelta
+from random import Random
+from time import perf_counter
+
+import pytest
+
+from api_tools.categories import VALID_CATEGORIES
+from api_tools.client import get_rpc_client
+from api_tools.jsonlib import dumps
+
+
+DATE_FIELD = 'date'
+CATEGORY_FIELD = 'category'
+HITS_FIELD = 'count'
+DATE_FORMAT = '%Y-%m-%d'
+# Показатель распределения Ципфа для долей категорий
+ZIPF_EXPONENT = 1.2
+# Доля запросов в выходные относительно будней
+WEEKEND_FACTOR = 0.6
+CHUNK_SIZE = 64 * 1024
+
+# Начало массива result в ответе json-rpc
+RESULT_START = re.compile(r'"result"\s*:\s*\[')
+SEPARATORS = ' \t\r\n,'
+
+_decoder = json.JSONDecoder()
+
+
+def split(total, weights):
+    """
+    Делит total на целые части пропорционально весам, сумма частей равна total.
+
+    :return: list of int
+    """
+    weight_sum = sum(weights)
+    exact = [total * weight / weight_sum for weight in weights]
+    parts = [int(value) for value in exact]
+
+    rest = total - sum(parts)
+    by_remainder = sorted(range(len(weights)), key=lambda index: parts[index] - exact[index])
+    for index in by_remainder[:rest]:
+        parts[index] += 1
+
+    return parts
+
+
+def generate_daily_stats(hits, days=30, categories=VALID_CATEGORIES, seed=0, end=None):
+    """
+    Синтетическая статистика профиля за days дней по end включительно.
+    Строки без запросов не выдаются.
+
+    :return: генератор dict {date, category, count}
+    """
+    rng = Random(seed)
+    end = end or date.today()
+    categories = sorted(categories)
+    rng.shuffle(categories)
+
+    category_weights = [1 / rank ** ZIPF_EXPONENT for rank in range(1, len(categories) + 1)]
+    day_weights = []
+    for offset in range(days):
+        day = end - timedelta(days=days - 1 - offset)
+        weight = WEEKEND_FACTOR if day.weekday() >= 5 else 1
+        day_weights.append(weight * rng.uniform(0.8, 1.2))
+
+    for offset, day_hits in enumerate(split(hits, day_weights)):
+        day = (end - timedelta(days=days - 1 - offset)).strftime(DATE_FORMAT)
+        noisy_weights = [weight * rng.uniform(0.7, 1.3) for weight in category_weights]
+        for category, count in zip(categories, split(day_hits, noisy_weights)):
+            if count:
+                yield {DATE_FIELD: day, CATEGORY_FIELD: category, HITS_FIELD: count}
+
+
+def iter_json_array(chunks):
+    """
+    Элементы массива result из ответа json-rpc, который приходит частями (bytes).
+    Каждый элемент разбирается, как только получен целиком, прочитанная часть
+    буфера отбрасывается.
+
+    :return: генератор элементов result
+    """
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = None
+
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+
+        if position is None:
+            match = RESULT_START.search(buffer)
+            if match is None:
+                continue
+            position = match.end()
+
+        while True:
+            while position < len(buffer) and buffer[position] in SEPARATORS:
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == ']':
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                break
+            # Число могло прийти не целиком (1. и 5 в разных частях): оно закончено,
+            # только если за ним уже пришел разделитель или конец массива
+            is_number = isinstance(item, (int, float)) and not isinstance(item, bool)
+            if is_number and (end == len(buffer) or buffer[end] not in SEPARATORS + ']'):
+                break
+
+            yield item
+            position = end
+
+        buffer = buffer[position:]
+        position = 0
+
+    buffer += text.decode(b'', final=True)
+    if position is None:
+        pytest.fail('Ошибка поиска значения по ключу "result" в ответе: {}'.format(buffer))
+    pytest.fail('Ответ оборвался до конца массива result, остаток: {}'.format(buffer[:200]))
+
+
+def iter_result_items(response, chunk_size=CHUNK_SIZE):
+    """
+    Элементы result потокового ответа (RpcClient.stream).
+
+    :return: генератор элементов result
+    """
+    try:
+        yield from iter_json_array(response.iter_content(chunk_size))
+    finally:
+        response.close()
+
+
+def aggregate(rows):
+    """
+    Сводка статистики: число строк, запросов, запросы по категориям и по дням.
+
+    :return: dict
+    """
+    by_category = Counter()
+    by_date = Counter()
+    row_count = 0
+
+    for row in rows:
+        row_count += 1
+        by_category[row[CATEGORY_FIELD]] += row[HITS_FIELD]
+        by_date[row[DATE_FIELD]] += row[HITS_FIELD]
+
+    return {
+        'rows': row_count,
+        'hits': sum(by_category.values()),
+        'by_category': dict(by_category),
+        'by_date': dict(by_date),
+    }
+
+
+def measure(read):
+    """
+    Время и пиковая память чтения ответа.
+
+    :return: tuple(сводка, время в секундах, пик памяти в байтах)
+    """
+    tracemalloc.start()
+    started = perf_counter()
+    try:
+        summary = read()
+        elapsed = perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return summary, elapsed, peak
+
+
+def benchmark(client, profile_id):
+    """
+    Сравнение потокового чтения getCategoriesDailyStats с разбором ответа целиком.
+
+    :return: dict
+    """
+    method = 'getCategoriesDailyStats'
+    stream_summary, stream_time, stream_peak = measure(
+        lambda: aggregate(iter_result_items(client.stream(method, profile_id)))
+    )
+    full_summary, full_time, full_peak = measure(lambda: aggregate(client.call(method, profile_id).result))
+
+    assert stream_summary == full_summary, 'Сводки потокового и полного чтения не совпадают'
+
+    return {
+        'profile_id': profile_id,
+        'rows': stream_summary['rows'],
+        'hits': stream_summary['hits'],
+        'stream': {'seconds': round(stream_time, 3), 'peak_mb': round(stream_peak / 2 ** 20, 2)},
+        'full': {'seconds': round(full_time, 3), 'peak_mb': round(full_peak / 2 ** 20, 2)},
+    }
+
+
+def format_report(results):
+    lines = ['{:>12}{:>10}{:>12}{:>12}{:>12}{:>12}{:>12}'.format(
+        'profile', 'rows', 'hits', 'stream_s', 'stream_mb', 'full_s', 'full_mb')]
+    for row in results:
+        lines.append('{:>12}{:>10}{:>12}{:>12}{:>12}{:>12}{:>12}'.format(
+            row['profile_id'], row['rows'], row['hits'], row['stream']['seconds'], row['stream']['peak_mb'],
+            row['full']['seconds'], row['full']['peak_mb']))
+
+    return '\n'.join(lines)
+
+
+def seed_emulator(emulator, host, hits, days, profiles, seed):
+    """
+    Регистрирует пользователя эмулятора, создает ему профили и записывает каждому
+    синтетическую статистику.
+
+    :return: tuple(client, list of profile_id, list of сводок сгенерированной статистики)
+    """
+    from api_tools.profiles import create_profiles
+    from website_tests.utils import generate_login_password
+
+    login, password = generate_login_password()
+    client = get_rpc_client(host, login, password)
+    assert client.call('register', login, password).result == [True], 'Ошибка регистрации {}'.format(login)
+
+    profile_ids = [profile.id for profile in create_profiles(host, login, password, profiles)]
+    expected = []
+    for number, profile_id in enumerate(profile_ids):
+        rows = list(generate_daily_stats(hits, days, seed=seed + number))
+        emulator.add_stats(login, profile_id, rows)
+        expected.append(aggregate(rows))
+
+    return client, profile_ids, expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Синтетическая статистика и замер getCategoriesDailyStats')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--host', help='адрес хоста, например https://www.xorp.ru')
+    target.add_argument('--emulator', choices=['xorp', 'tredy'], help='запустить локальный эмулятор')
+    target.add_argument('--export', metavar='FILE', help='записать сгенерированную статистику в jsonl')
+    parser.add_argument('--hits', type=int, default=1000000, help='число запросов на профиль')
+    parser.add_argument('--days', type=int, default=30, help='число дней истории')
+    parser.add_argument('--profiles', type=int, default=1, help='число профилей со статистикой')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--login')
+    parser.add_argument('--password')
+    parser.add_argument('--profile', type=int, action='append', help='id профиля на хосте')
+    parser.add_argument('--json', action='store_true', help='вывести отчет в json')
+    args = parser.parse_args()
+
+    if args.export:
+        with open(args.export, 'wb') as file:
+            for number in range(args.profiles):
+                for row in generate_daily_stats(args.hits, args.days, seed=args.seed + number):
+                    file.write(dumps(dict(row, profile=number)) + b'\n')
+        return
+
+    if args.emulator:
+        from api_tools.emulator import Emulator
+        emulator = Emulator(args.emulator)
+        host = emulator.start_in_thread()
+        client, profile_ids, expected = seed_emulator(
+            emulator, host, args.hits, args.days, args.profiles, args.seed)
+    else:
+        if not (args.login and args.password and args.profile):
+            parser.error('Для --host нужны --login, --password и --profile')
+        client = get_rpc_client(args.host, args.login, args.password)
+        profile_ids, expected = args.profile, None
+
+    results = [benchmark(client, profile_id) for profile_id in profile_ids]
+
+    if expected is not None:
+        for row, summary in zip(results, expected):
+            assert (row['rows'], row['hits']) == (summary['rows'], summary['hits']), \
+                'Статистика профиля {} отличается от записанной'.format(row['profile_id'])
+
+    print(json.dumps(results, ensure_ascii=False, indent=2) if args.json else format_report(results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+Модуль с пулом заранее зарегистрированных пользователей json-rpc api.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from threading import Lock
+
+import pytest
+
+from api_tools.client import get_rpc_client
+from api_tools.profiles import add_profile_calls, create_profiles, profile_from_reply
+from website_tests.utils import generate_login_password
+
+
+USER_POOL_SIZE = 8
+LIST_TYPES = ['black', 'white', 'alias']
+# Методы-переключатели профиля, пустое значение выключает настройку
+FLAG_METHODS = ['setWhiteListOnly', 'setSafeSearchEnabled', 'setSafeYoutubeEnabled', 'setBlockUnknownEnabled']
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class UserPool:
+    """
+    Пул пользователей одного хоста.
+    При создании в фоне регистрируется size пользователей. Тест берет пользователя
+    через lease(), а release() в фоне возвращает его в исходное состояние и кладет обратно.
+    Если свободных пользователей нет, новый регистрируется сразу, так пул растет по потребности.
+    С profiles > 0 каждому пользователю пула заранее создается столько дополнительных профилей,
+    их можно получить через get_profiles().
+    """
+    def __init__(self, host, size=USER_POOL_SIZE, profiles=0):
+        self.host = host
+        self.profiles = profiles
+        self._free = Queue()
+        self._baselines = {}
+        self._profiles = {}
+        self._executor = ThreadPoolExecutor(max_workers=size)
+
+        for _ in range(size):
+            self._executor.submit(self._register_free)
+
+    def lease(self):
+        """
+        Выдает свободного пользователя.
+
+        :return: tuple(login, password)
+        """
+        try:
+            return self._free.get_nowait()
+        except Empty:
+            return self.register()
+
+    def release(self, user):
+        """
+        Возвращает пользователя в пул. Сброс состояния выполняется в фоне,
+        пользователь, которого не удалось сбросить, в пул не возвращается.
+        """
+        self._executor.submit(self._reset_free, user)
+
+    def register(self):
+        """
+        Регистрирует нового пользователя и запоминает исходное состояние его дефолтного профиля.
+
+        :return: tuple(login, password)
+        """
+        login, password = generate_login_password()
+        client = get_rpc_client(self.host, login, password)
+        result = client.call('register', login, password).result
+
+        assert result == [True], 'Ошибка регистрации пользователя {}'.format(login)
+
+        self._baselines[login] = self._read_baseline(client)
+        if self.profiles:
+            self._profiles[login] = create_profiles(self.host, login, password, self.profiles)
+
+        return login, password
+
+    def get_profiles(self, user):
+        """
+        Заранее созданные профили пользователя.
+
+        :return: list of Profile
+        """
+        return self._profiles.get(user[0], [])
+
+    def reset(self, user):
+        """
+        Возвращает пользователя в исходное состояние: удаляет лишние профили,
+        очищает списки доменов, выключает настройки фильтрации,
+        восстанавливает категории и активные пресеты дефолтного профиля.
+        Дополнительные профили создаются заново вторым пакетным запросом: сервер может
+        выполнять вызовы пакета в любом порядке, и addProfile до удаления лишних профилей
+        упрется в max_profiles.
+
+        :return: bool - удалось ли сбросить состояние
+        """
+        login, password = user
+        baseline = self._baselines[login]
+        profile_id = baseline['profile_id']
+        client = get_rpc_client(self.host, login, password)
+        response = client.call('profiles')
+
+        try:
+            profiles = response.body['result']
+        except KeyError:
+            return False
+
+        calls = [('removeProfile', profile['id']) for profile in profiles if not profile['default']]
+        calls.extend(('clearDomains', profile_id, list_type) for list_type in LIST_TYPES)
+        calls.extend((method, profile_id, '') for method in FLAG_METHODS)
+        calls.append(('setFilterCats', profile_id, baseline['categories']))
+        calls.append(('setActivePresets', profile_id, baseline['presets']))
+
+        replies = client.batch(calls)
+        if any('error' in reply for reply in replies):
+            return False
+
+        if self.profiles:
+            replies = client.batch(add_profile_calls(self.profiles))
+            if any('error' in reply for reply in replies):
+                return False
+            self._profiles[login] = [profile_from_reply(reply) for reply in replies]
+
+        return True
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def _read_baseline(self, client):
+        """
+        Запрашивает состояние дефолтного профиля свежего пользователя.
+
+        :return: dict
+        """
+        response = client.call('profiles')
+
+        try:
+            profile_id = [profile['id'] for profile in response.body['result'] if profile['default']][0]
+        except (KeyError, IndexError):
+            pytest.fail('Ошибка поиска дефолтного профиля в ответе: {}'.format(response.body))
+
+        categories, presets = client.batch([('userFilter', profile_id), ('getActivePresetList', profile_id)])
+
+        try:
+            return {
+                'profile_id': profile_id,
+                'categories': categories['result'],
+                'presets': json.loads(presets['result']),
+            }
+        except KeyError:
+            pytest.fail('Ошибка поиска значения по ключу "result" в ответах: {}, {}'.format(categories, presets))
+
+    def _register_free(self):
+        self._free.put(self.register())
+
+    def _reset_free(self, user):
+        if self.reset(user):
+            self._free.put(user)
+        else:
+            self._baselines.pop(user[0], None)
+            self._profiles.pop(user[0], None)
+
+
+def get_user_pool(host, size=USER_POOL_SIZE, profiles=0):
+    """
+    Возвращает пул пользователей хоста с profiles дополнительными профилями,
+    при первом обращении создает его. Под xdist у каждого воркера свой пул.
+
+    :return: UserPool
+    """
+    key = (host, profiles)
+
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = UserPool(host, size, profiles)
+
+    return pool
+
+
+def close_user_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
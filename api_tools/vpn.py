@@ -0,0 +1,284 @@
+"""
+Модуль разбора и проверки ovpn-конфигов из ответов add_vpn и get_vpn_list.
+
+Конфиг читается построчно, в памяти держится только текущий PEM-блок: сертификаты,
+ключи и статический ключ tls-auth извлекаются по мере чтения, в том числе из inline-секций
+<ca>, <cert>, <key>, <tls-auth>, <tls-crypt>. Проверяется, что в конфиге есть сертификат
+клиента и закрытый ключ, что ключ соответствует сертификату, сертификат выпущен
+CA из конфига, а сроки действия сертификатов разумны.
+
+Разбор кэшируется по sha256 содержимого, от текущего времени зависят только проверки
+сроков, они повторяются на каждый вызов по уже разобранным датам.
+Сертификаты и ключи разбираются через cryptography. Без него проверяется только
+структура блоков (base64 и DER-последовательность), а assert_ovpn предупреждает,
+что сертификаты не проверены. Остальные проверки теста при этом выполняются.
+"""
+import base64
+import binascii
+import hashlib
+import warnings
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api_tools.cache import BoundedCache
+
+try:
+    from cryptography import x509
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat, load_der_private_key
+except ImportError:
+    x509 = None
+
+
+PEM_BEGIN = '-----BEGIN '
+PEM_END = '-----END '
+INLINE_SECTIONS = ('ca', 'cert', 'key', 'tls-auth', 'tls-crypt', 'extra-certs')
+STATIC_KEY_LABEL = 'OpenVPN Static key V1'
+STATIC_KEY_SIZE = 256
+CACHE_SIZE = 1024
+# Допустимое расхождение часов тестовой машины и сервера, выпустившего сертификат
+CLOCK_SKEW = timedelta(minutes=5)
+# Сертификаты со сроком действия дольше этого считаются ошибкой выпуска
+MAX_VALIDITY = timedelta(days=20 * 365)
+
+PemBlock = namedtuple('PemBlock', ['section', 'label', 'data'])
+Certificate = namedtuple('Certificate', ['section', 'subject', 'not_before', 'not_after'])
+VpnArtifact = namedtuple('VpnArtifact', ['digest', 'blocks', 'certificates', 'errors'])
+
+_artifacts = BoundedCache(CACHE_SIZE)
+
+
+def iter_lines(chunks):
+    """
+    Строки текста, который приходит частями произвольной длины.
+
+    :return: генератор строк без перевода строки
+    """
+    tail = ''
+    for chunk in chunks:
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+
+    if tail:
+        yield tail.rstrip('\r')
+
+
+def iter_pem_blocks(chunks):
+    """
+    PEM-блоки ovpn-конфига по мере чтения. section - inline-секция, в которой лежит блок,
+    или None для блока вне секций. data - DER-байты блока, для статического ключа OpenVPN -
+    байты ключа, None, если содержимое блока не декодируется.
+
+    :return: генератор PemBlock
+    """
+    section = None
+    label = None
+    body = []
+
+    for line in iter_lines(chunks):
+        line = line.strip()
+
+        if label is None:
+            if line.startswith('<') and line.endswith('>'):
+                name = line.strip('<>/')
+                if name in INLINE_SECTIONS:
+                    section = None if line.startswith('</') else name
+            elif line.startswith(PEM_BEGIN):
+                label = line[len(PEM_BEGIN):].rstrip('-')
+                body = []
+            continue
+
+        if not line.startswith(PEM_END):
+            body.append(line)
+            continue
+
+        try:
+            if label == STATIC_KEY_LABEL:
+                data = bytes.fromhex(''.join(body))
+            else:
+                data = base64.b64decode(''.join(body), validate=True)
+        except (ValueError, binascii.Error):
+            data = None
+
+        yield PemBlock(section, label, data)
+        label = None
+
+    if label is not None:
+        yield PemBlock(section, label, None)
+
+
+def _utc(moment):
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _load_private_key(data):
+    try:
+        # Проверка согласованности RSA-ключа занимает миллисекунды, соответствие сертификату проверяется отдельно
+        return load_der_private_key(data, password=None, unsafe_skip_rsa_key_validation=True)
+    except TypeError:
+        return load_der_private_key(data, password=None)
+
+
+def _public_bytes(key):
+    return key.public_bytes(Encoding.DER, PublicFormat.SubjectPublicKeyInfo)
+
+
+def _check_chain(certificates, keys, errors):
+    """
+    Разбирает сертификаты и ключи, проверяет соответствие ключа сертификату клиента
+    и подпись сертификата клиента CA из конфига.
+
+    :return: list of Certificate
+    """
+    parsed = []
+    for block in certificates:
+        try:
+            parsed.append((block.section, x509.load_der_x509_certificate(block.data)))
+        except ValueError:
+            errors.append('сертификат в секции {} не разбирается'.format(block.section))
+
+    public_keys = []
+    for block in keys:
+        try:
+            public_keys.append(_public_bytes(_load_private_key(block.data).public_key()))
+        except (ValueError, TypeError):
+            errors.append('закрытый ключ {} в секции {} не разбирается'.format(block.label, block.section))
+
+    client = [cert for _, cert in parsed if _public_bytes(cert.public_key()) in public_keys]
+    if public_keys and parsed and not client:
+        errors.append('закрытый ключ не соответствует ни одному сертификату')
+
+    authorities = [cert for section, cert in parsed if section == 'ca' or cert not in client]
+    for cert in client:
+        issuers = [ca for ca in authorities if ca.subject == cert.issuer]
+        if authorities and not issuers:
+            errors.append('сертификат {} выпущен не CA из конфига ({})'.format(
+                cert.subject.rfc4514_string(), cert.issuer.rfc4514_string()))
+        for ca in issuers:
+            if not hasattr(cert, 'verify_directly_issued_by'):
+                break
+            try:
+                cert.verify_directly_issued_by(ca)
+            except (ValueError, TypeError, InvalidSignature):
+                errors.append('подпись сертификата {} не проверяется ключом CA'.format(cert.subject.rfc4514_string()))
+
+    return [
+        Certificate(
+            section, cert.subject.rfc4514_string(),
+            _utc(getattr(cert, 'not_valid_before_utc', None) or cert.not_valid_before),
+            _utc(getattr(cert, 'not_valid_after_utc', None) or cert.not_valid_after),
+        )
+        for section, cert in parsed
+    ]
+
+
+def parse_ovpn(ovpn):
+    """
+    Разбирает ovpn-конфиг и проверяет не зависящие от времени свойства.
+    Результат кэшируется по sha256 содержимого.
+
+    :param ovpn: str или итератор частей текста
+    :return: VpnArtifact
+    """
+    if isinstance(ovpn, str):
+        digest = hashlib.sha256(ovpn.encode('utf-8')).hexdigest()
+        artifact = _artifacts.get(digest)
+        if artifact is not None:
+            return artifact
+        chunks = [ovpn]
+    else:
+        digest = None
+        chunks = ovpn
+
+    sha = hashlib.sha256()
+
+    def hashed(parts):
+        for part in parts:
+            sha.update(part.encode('utf-8'))
+            yield part
+
+    blocks = []
+    errors = []
+    certificates = []
+    keys = []
+    for block in iter_pem_blocks(hashed(chunks)):
+        blocks.append((block.section, block.label))
+        if block.data is None:
+            errors.append('блок {} в секции {} не декодируется или не закрыт'.format(block.label, block.section))
+        elif block.label == STATIC_KEY_LABEL:
+            if len(block.data) != STATIC_KEY_SIZE:
+                errors.append('статический ключ {} байт вместо {}'.format(len(block.data), STATIC_KEY_SIZE))
+        elif not block.data.startswith(b'\x30'):
+            errors.append('блок {} в секции {} не DER-последовательность'.format(block.label, block.section))
+        elif block.label == 'CERTIFICATE':
+            certificates.append(block)
+        elif block.label.endswith('PRIVATE KEY'):
+            keys.append(block)
+
+    if not certificates:
+        errors.append('нет сертификата')
+    if not keys:
+        errors.append('нет закрытого ключа')
+
+    parsed = _check_chain(certificates, keys, errors) if x509 is not None else []
+
+    artifact = VpnArtifact(digest or sha.hexdigest(), blocks, parsed, errors)
+    _artifacts.set(artifact.digest, artifact)
+
+    return artifact
+
+
+def check_ovpn(ovpn, now=None):
+    """
+    Проверяет ovpn-конфиг: состав блоков, соответствие ключа и сертификата, сроки действия.
+
+    :return: list of str - найденные проблемы, пустой список для корректного конфига
+    """
+    artifact = parse_ovpn(ovpn)
+    now = now or datetime.now(timezone.utc)
+    errors = list(artifact.errors)
+
+    for cert in artifact.certificates:
+        if cert.not_after <= cert.not_before:
+            errors.append('сертификат {} заканчивается раньше, чем начинается'.format(cert.subject))
+        if cert.not_before > now + CLOCK_SKEW:
+            errors.append('сертификат {} еще не действует (с {})'.format(cert.subject, cert.not_before))
+        if cert.not_after <= now:
+            errors.append('сертификат {} истек {}'.format(cert.subject, cert.not_after))
+        if cert.not_after - cert.not_before > MAX_VALIDITY:
+            errors.append('сертификат {} действует {} дней'.format(
+                cert.subject, (cert.not_after - cert.not_before).days))
+
+    return errors
+
+
+def assert_ovpn(ovpn, message='Некорректный ovpn-конфиг'):
+    """
+    Тест падает с перечнем проблем, если конфиг некорректен.
+    Без cryptography проверяется только структура конфига, о чем выдается предупреждение.
+    """
+    errors = check_ovpn(ovpn)
+    if errors:
+        pytest.fail('{}: {}'.format(message, '; '.join(errors)))
+    if x509 is None:
+        warnings.warn('Сертификаты ovpn-конфига не проверены: не установлен пакет cryptography')
+
+
+def check_vpn_list(vpns):
+    """
+    Проверяет ovpn-конфиги всех VPN из data ответа get_vpn_list, в которых они есть.
+
+    :return: dict {id VPN: list of str - проблемы} только для некорректных конфигов
+    """
+    problems = {}
+    for vpn in vpns:
+        if vpn.get('ovpn'):
+            errors = check_ovpn(vpn['ovpn'])
+            if errors:
+                problems[vpn.get('id')] = errors
+
+    return problems
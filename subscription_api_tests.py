@@ -1,45 +1,95 @@
 import json
+import os
+import threading
 import pytest
 import urllib3
 
+from api_tools.ip_pool import allocate_ip, allocate_ips, release_ip
+from api_tools.ip_scale import IpBatchScale, format_report as format_ip_scale_report
+from api_tools.plan_matrix import PlanMatrix, format_report as format_matrix_report
+from api_tools import plan_pool
+from api_tools.plan_pool import (
+    DEFAULT_PLAN, FREE_PLAN, TREDY_PLANS, XORP_PLANS, PlanUserPool, close_plan_user_pools, get_plan_user_pool,
+)
+from api_tools.provider import close_provider_clients, get_provider_client
+from api_tools.vpn import assert_ovpn, check_vpn_list
 from settings import API_PUBLIC_KEY
 from website_tests.utils import (
-    generate_login_password, get_plan, make_request, make_verification,
-    generate_public_ip, create_profile, create_user,
+    generate_login_password, get_plan, make_verification,
+    create_profile, create_user,
 )
 
-
 pytestmark = pytest.mark.usefixtures('disable_request_warnings')
 
+# Число параллельных цепочек переходов в матрице тарифов
+PLAN_MATRIX_WORKERS = int(os.environ.get('PLAN_MATRIX_WORKERS', 8))
+# Размеры пачек адресов масштабного теста add_ip
+IP_SCALE_SIZES = [int(size) for size in os.environ.get('IP_SCALE_SIZES', '10,100,1000,10000').split(',')]
+
+
+@pytest.fixture(scope='session')
+def provider_clients():
+    """
+    Фикстура закрывает пулы соединений провайдерского api по окончании сессии.
+    """
+    yield
+    close_provider_clients()
+
+
+@pytest.fixture()
+def provider(xorp_and_tredy_hosts, provider_clients):
+    """
+    Фикстура выдает клиента провайдерского api хоста с ключом API_PUBLIC_KEY.
+
+    :return: ProviderClient
+    """
+    return get_provider_client(xorp_and_tredy_hosts, API_PUBLIC_KEY)
+
 
-XORP_PLANS = {
-    'SCHOOL': 'Школа',
-    'PREMIUM': 'Домашний',
-    'BUSINESS': 'Бизнес',
-}
-
-TREDY_PLANS = {
-    'PREMIUM': 'Safe@Home',
-    'ENTERPRISE': 'Enterprise',
-    'EDU': 'Education',
-    'BUSINESS-5': 'Safe@Office 5',
-    'BUSINESS-10': 'Safe@Office 10',
-    'BUSINESS-25': 'Safe@Office 25',
-    'BUSINESS-50': 'Safe@Office 50',
-    'BUSINESS-75': 'Safe@Office 75',
-    'BUSINESS-100': 'Safe@Office 100',
-    'WIFI': 'HotSpot Advanced Edition',
-    'WIFI-1': 'HotSpot Edition 1',
-    'WIFI-2': 'HotSpot Edition 2',
-    'WIFI-3': 'HotSpot Edition 3',
-    'WIFI-4': 'HotSpot Edition 4',
-    'WIFI-5': 'HotSpot Edition 5',
-    'WIFI-10': 'HotSpot Edition 10',
-    'NONPROFIT': 'Nonprofit'
-}
-
-
-def test_subscribe_user(xorp_and_tredy_hosts):
+@pytest.fixture(scope='session')
+def plan_user_pools():
+    """
+    Фикстура закрывает запасы пользователей по тарифам по окончании сессии.
+    """
+    yield
+    close_plan_user_pools()
+
+
+@pytest.fixture()
+def plan_user(xorp_and_tredy_hosts, provider_clients, plan_user_pools):
+    """
+    Фикстура выдает функцию plan_user(plan), которая возвращает нового пользователя
+    на тарифе plan ('FREE' - без платного тарифа) из запаса, пополняемого в фоне.
+
+    :return: callable -> tuple(login, password)
+    """
+    return get_plan_user_pool(xorp_and_tredy_hosts, API_PUBLIC_KEY).lease
+
+
+def test_plan_user_pool_refill_error(monkeypatch):
+    """
+    Тест запаса пользователей по тарифам без обращения к хосту.
+    Создание пользователя падает только в фоновом пополнении запаса.
+    lease() должен сразу выбросить ошибку пополнения, а не дождаться
+    таймаута и создать пользователя сам.
+    """
+    def create(pool, plan):
+        if threading.current_thread() is not threading.main_thread():
+            pytest.fail('Ошибка создания пользователя на тарифе {}'.format(plan))
+        return 'login', 'password'
+
+    monkeypatch.setattr(PlanUserPool, 'create', create)
+    monkeypatch.setattr(plan_pool, 'PLAN_LEASE_TIMEOUT', 1)
+    pool = PlanUserPool('http://localhost', 'key', stock_size=1)
+
+    try:
+        with pytest.raises(pytest.fail.Exception, match='тарифе BUSINESS'):
+            pool.lease('BUSINESS')
+    finally:
+        pool.close()
+
+
+def test_subscribe_user(provider):
     """
     Тест проверяет метод регистрации пользователя.
     Создаем пользователя с двумя обязательными и двумя необязательными
@@ -47,15 +97,13 @@ def test_subscribe_user(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     full_subscribe_params = {
-        'key': API_PUBLIC_KEY,
         'login': login,
         'password': password,
         'email': login,
         # Привязка к конкретной таймзоне не сказывается на результатах теста
         'timezone': 'Asia/Yekaterinburg',
         }
-    response = make_request(xorp_and_tredy_hosts, 'subscribe', full_subscribe_params)
-    make_verification(response)
+    provider.call('subscribe', **full_subscribe_params)
 
 
 @pytest.mark.parametrize(
@@ -65,39 +113,32 @@ def test_subscribe_user(xorp_and_tredy_hosts):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_subscribe_plans(xorp_and_tredy_hosts, expected_plans):
+def test_subscribe_plans(xorp_and_tredy_hosts, provider, expected_plans):
     """
     Тест проверяет метод по получению списка доступных тарифов
     для создания/изменения пользователя реселлером.
     """
-    params = {'key': API_PUBLIC_KEY}
-    response = make_request(xorp_and_tredy_hosts, 'subscribe_plans', params)
-    make_verification(response)
+    response = provider.call('subscribe_plans')
 
-    try:
-        subscribe_plans = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    subscribe_plans = response.data
 
     assert subscribe_plans == expected_plans
 
 
-def test_deactivate(xorp_and_tredy_hosts):
+def test_deactivate(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод деактивации пользователя.
     Создается активный пользователь, который деактивируется.
     """
     login, password = generate_login_password()
     deactivation_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
     create_user(xorp_and_tredy_hosts, login, password)
-    response = make_request(xorp_and_tredy_hosts, 'deactivate', deactivation_params)
-    make_verification(response)
+    provider.call('deactivate', **deactivation_params)
 
 
-def test_activate(xorp_and_tredy_hosts):
+def test_activate(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод активации пользователя.
     Сперва создается активный пользователь, который деактивируется.
@@ -105,17 +146,14 @@ def test_activate(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
     create_user(xorp_and_tredy_hosts, login, password)
-    response = make_request(xorp_and_tredy_hosts, 'deactivate', params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'activate', params)
-    make_verification(response)
+    provider.call('deactivate', **params)
+    provider.call('activate', **params)
 
 
-def test_update_email(xorp_and_tredy_hosts):
+def test_update_email(provider):
     """
     Тест проверяет метод обновления email пользователя.
     Создается пользователь с почтой. Почта пользователя обновляется.
@@ -124,23 +162,19 @@ def test_update_email(xorp_and_tredy_hosts):
     # К новой почте добавляем префикс для исключения совпадений при параллельном запуске тестов
     new_email = 'new_' + login
     registration_params = {
-        'key': API_PUBLIC_KEY,
         'login': login,
         'password': password,
         'email': login,
     }
     updating_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'email': new_email,
     }
-    response = make_request(xorp_and_tredy_hosts, 'subscribe', registration_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'update_email', updating_params)
-    make_verification(response)
+    provider.call('subscribe', **registration_params)
+    provider.call('update_email', **updating_params)
 
 
-def test_update_password(xorp_and_tredy_hosts):
+def test_update_password(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод обновления пароля пользователя.
     Создается пользователь. Пароль пользователя обновляется.
@@ -148,13 +182,11 @@ def test_update_password(xorp_and_tredy_hosts):
     login, password = generate_login_password()
     _, new_password = generate_login_password()
     updating_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'password': new_password,
     }
     create_user(xorp_and_tredy_hosts, login, password)
-    response = make_request(xorp_and_tredy_hosts, 'update_password', updating_params)
-    make_verification(response)
+    provider.call('update_password', **updating_params)
 
 
 @pytest.mark.parametrize(
@@ -164,22 +196,19 @@ def test_update_password(xorp_and_tredy_hosts):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_prolongate_mandatory(xorp_and_tredy_hosts, expected_plans):
+def test_prolongate_mandatory(xorp_and_tredy_hosts, provider, plan_user, expected_plans):
     """
     Тест проверяет метод включения или изменения платного тарифа для пользователя
     Создается пользователь. Вызываем для пользователя метод prolongate c одним обязательным параметром.
     Валидируем полученный результат.
     """
-    login, password = generate_login_password()
-    create_user(xorp_and_tredy_hosts, login, password)
+    login, password = plan_user(DEFAULT_PLAN)
     mandatory_prolongate_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
     # Включаем для пользователя платный тариф. Если по умолчанию у провайдера создается пользователь
     # с платным тарифом, то метод все равно отработает корректно.
-    response = make_request(xorp_and_tredy_hosts, 'prolongate', mandatory_prolongate_params)
-    make_verification(response)
+    provider.call('prolongate', **mandatory_prolongate_params)
     result = get_plan(xorp_and_tredy_hosts, login, password)
 
     assert result.get('name') == expected_plans['PREMIUM']
@@ -192,23 +221,20 @@ def test_prolongate_mandatory(xorp_and_tredy_hosts, expected_plans):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_prolongate_full(xorp_and_tredy_hosts, expected_plans):
+def test_prolongate_full(xorp_and_tredy_hosts, provider, plan_user, expected_plans):
     """
     Тест проверяет метод включения или изменения платного тарифа для пользователя
     Создается пользователь. Вызываем для пользователя метод prolongate c двумя параметрами.
     Подключается тариф, передаваемый необязательным параметром.
     Валидируем полученный результат.
     """
-    login, password = generate_login_password()
-    create_user(xorp_and_tredy_hosts, login, password)
+    login, password = plan_user(DEFAULT_PLAN)
     for plan in expected_plans.keys():
         full_prolongate_params = {
-            'key': API_PUBLIC_KEY,
             'ident': login,
             'plan': plan,
         }
-        response = make_request(xorp_and_tredy_hosts, 'prolongate', full_prolongate_params)
-        make_verification(response)
+        provider.call('prolongate', **full_prolongate_params)
         result = get_plan(xorp_and_tredy_hosts, login, password)
 
         assert result.get('name') == expected_plans[plan]
@@ -221,31 +247,48 @@ def test_prolongate_full(xorp_and_tredy_hosts, expected_plans):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_unsubscribe(xorp_and_tredy_hosts, expected_plans):
+def test_unsubscribe(xorp_and_tredy_hosts, provider, plan_user, expected_plans):
     """
     Тест проверяет метод отключения у пользователя платного тарифа.
     Создается пользователь, подключаем ему платный тариф.
     Проверяем, что тариф подключился. Отключаем пользователю тариф.
     Проверям, что тариф отключился.
     """
-    login, password = generate_login_password()
+    login, password = plan_user(DEFAULT_PLAN)
     mandatory_prolongate_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    create_user(xorp_and_tredy_hosts, login, password)
     result = get_plan(xorp_and_tredy_hosts, login, password)
 
     assert result.get('name') == expected_plans['PREMIUM']
 
-    response = make_request(xorp_and_tredy_hosts, 'unsubscribe', mandatory_prolongate_params)
-    make_verification(response)
+    provider.call('unsubscribe', **mandatory_prolongate_params)
     result = get_plan(xorp_and_tredy_hosts, login, password)
 
     assert result.get('name') == 'FREE'
 
 
-def test_subscription_info(xorp_and_tredy_hosts):
+@pytest.mark.skipif(not os.environ.get('PLAN_MATRIX'), reason='Полная матрица тарифов, запускается с PLAN_MATRIX=1')
+@pytest.mark.parametrize(
+    "xorp_and_tredy_hosts, expected_plans", [
+        ('xorp_host', XORP_PLANS),
+        ('tredy_host', TREDY_PLANS),
+    ],
+    indirect=["xorp_and_tredy_hosts"]
+)
+def test_plan_matrix(xorp_and_tredy_hosts, expected_plans, provider_clients):
+    """
+    Тест проверяет все переходы между тарифами хоста и FREE методами prolongate и unsubscribe.
+    После каждого перехода тариф сверяется по get_plan, лимиты тарифа - между всеми переходами в него.
+    Цепочки переходов выполняются параллельно, не более PLAN_MATRIX_WORKERS одновременно.
+    """
+    report = PlanMatrix(xorp_and_tredy_hosts, API_PUBLIC_KEY, expected_plans, workers=PLAN_MATRIX_WORKERS).run()
+    print(format_matrix_report(report))
+
+    assert not report['failures'], format_matrix_report(report)
+
+
+def test_subscription_info(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод получения информации о подписке.
     Api-методы не поддерживают опционал изменения даты окончания подписки.
@@ -255,41 +298,31 @@ def test_subscription_info(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     info_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
     create_user(xorp_and_tredy_hosts, login, password)
-    response = make_request(xorp_and_tredy_hosts, 'subscription_info', info_params)
-    make_verification(response)
+    response = provider.call('subscription_info', **info_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     date_end = data.get('date_end')
 
     assert not date_end
 
 
-def test_profiles(xorp_and_tredy_hosts):
+def test_profiles(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод получения информации о профилях пользователя.
     Cоздается пользователь. Запрашиваем и валидируем его профиль.
     """
     login, password = generate_login_password()
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
     create_user(xorp_and_tredy_hosts, login, password)
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    response = provider.call('profiles', **profiles_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     profile_id = eval([key for key in data.keys()][0])
     profile_name = data.values()
@@ -305,85 +338,55 @@ def test_profiles(xorp_and_tredy_hosts):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_update_profile(xorp_and_tredy_hosts, expected_plan):
+def test_update_profile(xorp_and_tredy_hosts, provider, plan_user, expected_plan):
     """
     Тест проверяет метод update_profile.
-    Создаем пользователя, делаем для него новый профиль.
+    Берем пользователя на тарифе с поддержкой tls, делаем для него новый профиль.
     Методом update_profile меняем параметры профиля.
     """
-    login, password = generate_login_password()
-    create_user(xorp_and_tredy_hosts, login, password)
+    login, password = plan_user(expected_plan)
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     update_params = {
-        'key': API_PUBLIC_KEY,
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_profile', update_params)
-    make_verification(response)
+    response = provider.call('update_profile', **update_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert not data['tls']
     assert data['name'] == 'my_profile_test'
 
     full_update_params = {
-        'key': API_PUBLIC_KEY,
         'profile_id': profile_id,
         'name': 'modified_profile',
         'tls': 'True',
     }
-    prolongate_params = {
-        'key': API_PUBLIC_KEY,
-        'ident': login,
-        'plan': expected_plan,
-    }
-    response = make_request(xorp_and_tredy_hosts, 'prolongate', prolongate_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'update_profile', full_update_params)
-    make_verification(response)
+    response = provider.call('update_profile', **full_update_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['tls']
     assert data['name'] == 'modified_profile'
     assert data['id'] == int(profile_id)
 
 
-def test_add_ip_free(xorp_and_tredy_hosts):
+def test_add_ip_free(xorp_and_tredy_hosts, provider, plan_user):
     """
     Тест проверяет метод add_ip. Кейс1.
     Создаем пользователя с тарифом FREE и пытаемся добавить ему непубличный ip-адрес.
     Пытаемся добавить пользователю два ip-адреса.
     Первый адрес добавляется, второй не может быть добавлен.
     """
-    login, password = generate_login_password()
-    create_user(xorp_and_tredy_hosts, login, password)
-    unsubscribe_params = {
-        'key': API_PUBLIC_KEY,
-        'ident': login,
-    }
-    response = make_request(xorp_and_tredy_hosts, 'unsubscribe', unsubscribe_params)
-    make_verification(response)
+    login, password = plan_user(FREE_PLAN)
 
     # Case1
     mandatory_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': '255.255.255.255',
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', mandatory_params)
-    make_verification(response)
+    response = provider.call('add_ip', **mandatory_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['added_addresses'] == [], 'Case1. Добавлен непубличный адрес'
 
@@ -393,44 +396,34 @@ def test_add_ip_free(xorp_and_tredy_hosts):
     'Case1. Адрес отсутствует в invalid_adresses'
 
     # Case2
-    address = generate_public_ip()
+    address = allocate_ip()
     mandatory_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': address,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', mandatory_params)
-    make_verification(response)
+    response = provider.call('add_ip', **mandatory_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['added_addresses'][0] == address, 'Case2. Адрес не добавлен'
     assert 'invalid_adresses' not in data.keys()
 
     # Case3
-    address = generate_public_ip()
+    address = allocate_ip()
     mandatory_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': address,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', mandatory_params)
-    make_verification(response)
+    response = provider.call('add_ip', **mandatory_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['added_addresses'] == [], 'Case3. Добавлен лишний ip-адрес'
     assert address in data['invalid_adresses'][0].keys()
     assert data['invalid_adresses'][0].get(address) == 'The limit is reached', 'Case3. Отсутствует сообщение об ошибке'
 
 
-def test_add_user_with_the_same_ip(xorp_and_tredy_hosts):
+def test_add_user_with_the_same_ip(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод add_ip. Кейс2.
     Создаем пользователя, добавляем ему ip-адрес.
@@ -438,19 +431,14 @@ def test_add_user_with_the_same_ip(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    ip_address = generate_public_ip()
+    ip_address = allocate_ip()
     mandatory_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': ip_address,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', mandatory_params)
-    make_verification(response)
+    response = provider.call('add_ip', **mandatory_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['added_addresses'][0] == ip_address
     assert 'invalid_adresses' not in data.keys()
@@ -459,24 +447,22 @@ def test_add_user_with_the_same_ip(xorp_and_tredy_hosts):
     create_user(xorp_and_tredy_hosts, new_login, new_password)
     # Пытаемся добавить ему адрес, ранее добавленный первому пользователю
     mandatory_params_case_2 = {
-        'key': API_PUBLIC_KEY,
         'ident': new_login,
         'ip': ip_address,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', mandatory_params_case_2)
-    make_verification(response)
+    response = provider.call('add_ip', **mandatory_params_case_2)
 
     try:
-        data = response.json()['data']
+        data = response.body['data']
         invalid_adress = data['invalid_adresses'][0]
     except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.body))
 
     assert data['added_addresses'] == []
     assert invalid_adress[ip_address] == 'Address already added to another user'
 
 
-def test_add_three_ips(xorp_and_tredy_hosts):
+def test_add_three_ips(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод add_ip. Кейс3.
     Создаем пользователя. Создаем ему профиль.
@@ -484,27 +470,45 @@ def test_add_three_ips(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    ip_list = [generate_public_ip() for _ in range(3)]
+    ip_list = allocate_ips(3)
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     full_ip_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': ip_list,
         'profile': profile_id,
         'comment': ['ip_1_comment', 'ip_2_comment', 'ip_3_comment'],
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', full_ip_params)
-    make_verification(response)
+    response = provider.call('add_ip', **full_ip_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data['added_addresses'] == ip_list
 
 
-def test_clear_ip(xorp_and_tredy_hosts):
+@pytest.mark.skipif(not os.environ.get('SCALE_TESTS'), reason='Масштабный тест, запускается с SCALE_TESTS=1')
+@pytest.mark.parametrize(
+    "xorp_and_tredy_hosts, expected_plan", [
+        ('xorp_host', 'BUSINESS'),
+        ('tredy_host', 'ENTERPRISE'),
+    ],
+    indirect=["xorp_and_tredy_hosts"]
+)
+def test_add_ip_scale(xorp_and_tredy_hosts, provider, plan_user, expected_plan):
+    """
+    Масштабный тест методов add_ip, list_ip, clear_ip, update_ip, remove_ip.
+    Пользователю на платном тарифе добавляются пачки адресов размером IP_SCALE_SIZES,
+    add_ip отправляет пачку частями, уменьшая часть при отказе сервера по размеру запроса.
+    В каждой части непубличный адрес должен вернуться в invalid_adresses, остальные - добавиться.
+    Пачки больше лимита адресов тарифа не отправляются.
+    """
+    login, password = plan_user(expected_plan)
+    report = IpBatchScale(provider, login).run(IP_SCALE_SIZES)
+    print(format_ip_scale_report(report))
+
+    assert not report['failures'], format_ip_scale_report(report)
+
+
+def test_clear_ip(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод clear_ip.
     Создается пользователь. Добавляем ему ip-адреса.
@@ -513,49 +517,38 @@ def test_clear_ip(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    ip_list = [generate_public_ip() for _ in range(3)]
+    ip_list = allocate_ips(3)
     ip_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': ip_list,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', ip_params)
-    make_verification(response)
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    # Добавление адресов и запрос профилей не зависят друг от друга
+    _, response = provider.gather(('add_ip', ip_params), ('profiles', profiles_params))
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     # Инвертируем словарь для поиска айдишника профиля по его названию
     profile_id = [key for key, value in data.items() if value == 'Default'][0]
 
     clear_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'profile': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'clear_ip', clear_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'list_ip', clear_params)
-    make_verification(response)
+    provider.call('clear_ip', **clear_params)
+    response = provider.call('list_ip', **clear_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert 'ip' in data
     assert not data['ip']
 
+    release_ip(*ip_list)
 
-def test_list_ip_compulsory(xorp_and_tredy_hosts):
+
+def test_list_ip_compulsory(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод list_ip с одним обязательным параметром.
     Создается пользователь. Добавляем ему ip-адреса на дефолтный профиль.
@@ -566,70 +559,55 @@ def test_list_ip_compulsory(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    default_ip = generate_public_ip()
-    ip_for_profile = generate_public_ip()
+    default_ip = allocate_ip()
+    ip_for_profile = allocate_ip()
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    response = provider.call('profiles', **profiles_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     default_id = eval([key for key, value in data.items() if value == 'Default'][0])
 
     # Накатываем айпишники на каждый профиль отдельно, т.к. совместно запрос не проходит
     ip_params_default = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': default_ip,
         'comment': 'comment_list_default_ip',
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', ip_params_default)
+    response = provider.request('add_ip', **ip_params_default)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
-    assert data['added_addresses'][0] == default_ip, 'Адрес не добавлен {}'.format(response.json())
+    assert data['added_addresses'][0] == default_ip, 'Адрес не добавлен {}'.format(response.body)
 
     make_verification(response)
     ip_params_my_profile = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': ip_for_profile,
         'profile': profile_id,
         'comment': 'comment_list_ip_my_profile',
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', ip_params_my_profile)
+    response = provider.request('add_ip', **ip_params_my_profile)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
-    assert data['added_addresses'][0] == ip_for_profile, 'Адрес не добавлен {}'.format(response.json())
+    assert data['added_addresses'][0] == ip_for_profile, 'Адрес не добавлен {}'.format(response.body)
 
     make_verification(response)
     list_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'list_ip', list_params)
-    make_verification(response)
+    response = provider.call('list_ip', **list_params)
 
     try:
-        data = response.json()['data']
+        data = response.body['data']
         default = data['ip'][0]
         profile = data['ip'][1]
     except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.body))
 
     assert default['profile'] == int(default_id)
     assert default['comment'] == 'comment_list_default_ip'
@@ -640,7 +618,7 @@ def test_list_ip_compulsory(xorp_and_tredy_hosts):
     assert profile['address'] == ip_for_profile
 
 
-def test_list_ip_optional(xorp_and_tredy_hosts):
+def test_list_ip_optional(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод list_ip с обязательным и дополнительным параметрами.
     Создается пользователь. Добавляем ему ip-адреса на дефолтный профиль.
@@ -651,37 +629,33 @@ def test_list_ip_optional(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    ip_for_profile = generate_public_ip()
+    ip_for_profile = allocate_ip()
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     ip_params_my_profile = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': ip_for_profile,
         'profile': profile_id,
         'comment': 'comment_list_ip_my_profile',
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_ip', ip_params_my_profile)
-    make_verification(response)
+    provider.call('add_ip', **ip_params_my_profile)
     list_params_full = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'profile': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'list_ip', list_params_full)
-    make_verification(response)
+    response = provider.call('list_ip', **list_params_full)
 
     try:
-        data = response.json()['data']
+        data = response.body['data']
         profile = data['ip'][0]
     except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.body))
 
     assert profile['profile'] == int(profile_id)
     assert profile['comment'] == 'comment_list_ip_my_profile'
     assert profile['address'] == ip_for_profile
 
 
-def test_update_ip(xorp_and_tredy_hosts):
+def test_update_ip(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод update_ip по добавлению DDNS.
     Кейс1. Создается пользователь. Добавляем ему DDNS.
@@ -692,69 +666,64 @@ def test_update_ip(xorp_and_tredy_hosts):
     # Кейс1.
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    public_ip = generate_public_ip()
+    public_ip = allocate_ip()
     update_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': public_ip,
     }
     # Пока нет api-метода для получения списка динамических адресов, валидировать можем только по состоянию ответа
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', update_params)
+    response = provider.request('update_ip', **update_params)
 
     assert response.status_code == 200, 'Кейс1. Статус-код ответа != 200'
-    assert response.json()['status'] == 'ok', 'Кейс1. ' + response.json()['data'].get('message')
+    assert response.body['status'] == 'ok', 'Кейс1. ' + response.body['data'].get('message')
 
     # Кейс2.
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
     update_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': public_ip,
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', update_params)
+    response = provider.request('update_ip', **update_params)
 
     assert response.status_code == 200, 'Кейс2. Статус-код ответа != 200'
-    assert response.json()['status'] == 'ok', 'Кейс2. ' + response.json()['data'].get('message')
+    assert response.body['status'] == 'ok', 'Кейс2. ' + response.body['data'].get('message')
 
     # Кейс 3. Последовательно добавляем два разных айпишника, привязывая их к разным хостам на дефолтном профиле
     update_params_first_hostname = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
-        'ip': generate_public_ip(),
+        'ip': allocate_ip(),
         'hostname': 'first_hostname',
     }
     update_params_second_hostname = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
-        'ip': generate_public_ip(),
+        'ip': allocate_ip(),
         'hostname': 'second_hostname',
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', update_params_first_hostname)
+    response = provider.request('update_ip', **update_params_first_hostname)
 
     assert response.status_code == 200, 'Кейс3.first_hostname. Статус-код ответа != 200'
-    assert response.json()['status'] == 'ok', 'Кейс3.first_hostname. ' + response.json()['data'].get('message')
+    assert response.body['status'] == 'ok', 'Кейс3.first_hostname. ' + response.body['data'].get('message')
 
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', update_params_second_hostname)
+    response = provider.request('update_ip', **update_params_second_hostname)
 
     assert response.status_code == 200, 'Кейс3.second_hostname. Статус-код ответа != 200'
-    assert response.json()['status'] == 'ok', 'Кейс3.second_hostname. ' + response.json()['data'].get('message')
+    assert response.body['status'] == 'ok', 'Кейс3.second_hostname. ' + response.body['data'].get('message')
 
     # Кейс4.
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     update_params_profile = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
-        'ip': generate_public_ip(),
+        'ip': allocate_ip(),
         'profile': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', update_params_profile)
+    response = provider.request('update_ip', **update_params_profile)
 
     assert response.status_code == 200, 'Кейс4. Статус-код ответа != 200'
-    assert response.json()['status'] == 'ok', 'Кейс4. ' + response.json()['data'].get('message')
+    assert response.body['status'] == 'ok', 'Кейс4. ' + response.body['data'].get('message')
 
 
-def test_remove_ip(xorp_and_tredy_hosts):
+def test_remove_ip(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод remove_ip.
     Создаем пользователя, добавляем ему айпишник.
@@ -762,16 +731,15 @@ def test_remove_ip(xorp_and_tredy_hosts):
     """
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
-    public_ip = generate_public_ip()
+    public_ip = allocate_ip()
     mandatory_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'ip': public_ip,
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_ip', mandatory_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'remove_ip', mandatory_params)
-    make_verification(response)
+    provider.call('update_ip', **mandatory_params)
+    provider.call('remove_ip', **mandatory_params)
+
+    release_ip(public_ip)
 
 
 @pytest.mark.parametrize('xorp_and_tredy_hosts',
@@ -780,7 +748,7 @@ def test_remove_ip(xorp_and_tredy_hosts):
     # Xfail - из-за ожидаемой ошибке на тредях по добавлению VPN. #1530
     indirect=["xorp_and_tredy_hosts"],
 )
-def test_add_vpn(xorp_and_tredy_hosts):
+def test_add_vpn(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод add_vpn.
     Создаем пользователя. Создаем пользователю профиль.
@@ -790,34 +758,21 @@ def test_add_vpn(xorp_and_tredy_hosts):
     create_user(xorp_and_tredy_hosts, login, password)
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
-    data = response.json()['data']
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    response = provider.call('add_vpn', **add_vpn_params)
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data[0]['profile'] == 'my_profile_test'
     assert data[0]['name'] == 'vpn_name'
@@ -829,7 +784,7 @@ def test_add_vpn(xorp_and_tredy_hosts):
     # Xfail - из-за ожидаемой ошибке на тредях по добавлению VPN. #1530
     indirect=["xorp_and_tredy_hosts"],
 )
-def test_clear_vpn_for_profile(xorp_and_tredy_hosts):
+def test_clear_vpn_for_profile(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод clear_vpn_for_profile.
     Создаем пользователя. Создаем пользователю профиль.
@@ -840,48 +795,32 @@ def test_clear_vpn_for_profile(xorp_and_tredy_hosts):
     create_user(xorp_and_tredy_hosts, login, password)
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
-    data = response.json()['data']
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    response = provider.call('add_vpn', **add_vpn_params)
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data[0]['profile'] == 'my_profile_test'
     assert data[0]['name'] == 'vpn_name'
 
     clear_params = {
-        'key': API_PUBLIC_KEY,
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'clear_vpn_for_profile', clear_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    provider.call('clear_vpn_for_profile', **clear_params)
+    response = provider.call('get_vpn_list', **check_params)
 
-    assert response.json()['data'] == [], 'Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json())
+    assert response.data == [], 'Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.body)
 
 
 @pytest.mark.parametrize('xorp_and_tredy_hosts',
@@ -890,7 +829,7 @@ def test_clear_vpn_for_profile(xorp_and_tredy_hosts):
     # Xfail - из-за ожидаемой ошибке на тредях по добавлению VPN. #1530
     indirect=["xorp_and_tredy_hosts"],
 )
-def test_get_vpn_list(xorp_and_tredy_hosts):
+def test_get_vpn_list(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод get_vpn_list.
     Создаем пользователя. Добавляем пользователю VPN.
@@ -899,52 +838,38 @@ def test_get_vpn_list(xorp_and_tredy_hosts):
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    response = provider.call('profiles', **profiles_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     profile_id = [k for k, v in data.items() if v == 'Default'][0]
 
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
-    data = response.json()['data']
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    response = provider.call('add_vpn', **add_vpn_params)
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data[0]['profile'] == 'Default'
     assert data[0]['name'] == 'vpn_name'
 
+    problems = check_vpn_list(data)
+
+    assert not problems, 'Некорректные ovpn-конфиги в get_vpn_list: {}'.format(problems)
+
 
 @pytest.mark.parametrize('xorp_and_tredy_hosts',
 
@@ -952,7 +877,7 @@ def test_get_vpn_list(xorp_and_tredy_hosts):
     # Xfail - из-за ожидаемой ошибке на тредях по добавлению VPN. #1530
     indirect=["xorp_and_tredy_hosts"],
 )
-def test_clear_vpn_for_user(xorp_and_tredy_hosts):
+def test_clear_vpn_for_user(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод clear_vpn_for_profile.
     Создаем пользователя. Привязываем VPN к дефолтному профилю.
@@ -962,89 +887,53 @@ def test_clear_vpn_for_user(xorp_and_tredy_hosts):
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    response = provider.call('profiles', **profiles_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     profile_id = [k for k, v in data.items() if v == 'Default'][0]
 
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name_default',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
+    response = provider.call('add_vpn', **add_vpn_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
-
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name_my_profile',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
+    response = provider.call('add_vpn', **add_vpn_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
-
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data[0]['profile'] == 'Default'
     assert data[0]['name'] == 'vpn_name_default'
     assert data[1]['profile'] == 'my_profile_test'
     assert data[1]['name'] == 'vpn_name_my_profile'
 
-    response = make_request(xorp_and_tredy_hosts, 'clear_vpn_for_user', check_params)
-    make_verification(response)
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    provider.call('clear_vpn_for_user', **check_params)
+    response = provider.call('get_vpn_list', **check_params)
 
-    assert response.json()['data'] == []
+    assert response.data == []
 
 
 @pytest.mark.parametrize('xorp_and_tredy_hosts',
@@ -1053,7 +942,7 @@ def test_clear_vpn_for_user(xorp_and_tredy_hosts):
     # Xfail - из-за ожидаемой ошибке на тредях по добавлению VPN. #1530
     indirect=["xorp_and_tredy_hosts"],
 )
-def test_remove_vpn(xorp_and_tredy_hosts):
+def test_remove_vpn(xorp_and_tredy_hosts, provider):
     """
     Тест проверяет метод remove_vpn.
     Создаем пользователя. Добавляем пользователю VPN.
@@ -1063,72 +952,46 @@ def test_remove_vpn(xorp_and_tredy_hosts):
     login, password = generate_login_password()
     create_user(xorp_and_tredy_hosts, login, password)
     profiles_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'profiles', profiles_params)
-    make_verification(response)
+    response = provider.call('profiles', **profiles_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     profile_id = [k for k, v in data.items() if v == 'Default'][0]
 
     add_vpn_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
         'name': 'vpn_name',
         'profile_id': profile_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'add_vpn', add_vpn_params)
-    make_verification(response)
+    response = provider.call('add_vpn', **add_vpn_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
-
-    expected_keys = [
-        'BEGIN CERTIFICATE',
-        'END CERTIFICATE',
-        'BEGIN PRIVATE KEY',
-        'END PRIVATE KEY',
-    ]
+    data = response.data
 
-    assert all(key in data['ovpn'] for key in expected_keys)
+    assert_ovpn(data['ovpn'])
 
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    try:
-        data = response.json()['data']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "data" в ответе: {}'.format(response.json()))
+    data = response.data
 
     assert data[0]['profile'] == 'Default'
     assert data[0]['name'] == 'vpn_name'
 
     vpn_id = data[0]['id']
     remove_param = {
-        'key': API_PUBLIC_KEY,
         'id': vpn_id,
     }
-    response = make_request(xorp_and_tredy_hosts, 'remove_vpn', remove_param)
-    make_verification(response)
+    provider.call('remove_vpn', **remove_param)
     check_params = {
-        'key': API_PUBLIC_KEY,
         'ident': login,
     }
-    response = make_request(xorp_and_tredy_hosts, 'get_vpn_list', check_params)
-    make_verification(response)
+    response = provider.call('get_vpn_list', **check_params)
 
-    assert response.json()['data'] == []
+    assert response.data == []
 
 
 @pytest.mark.parametrize(
@@ -1138,7 +1001,7 @@ def test_remove_vpn(xorp_and_tredy_hosts):
     ],
     indirect=["xorp_and_tredy_hosts"]
 )
-def test_update_nat(xorp_and_tredy_hosts, nat_ip):
+def test_update_nat(xorp_and_tredy_hosts, provider, nat_ip):
     """
     Тест проверяет метод update_nat.
     Создаем пользователя. Добавляем ему профиль.
@@ -1149,30 +1012,24 @@ def test_update_nat(xorp_and_tredy_hosts, nat_ip):
     create_user(xorp_and_tredy_hosts, login, password)
     profile_id = create_profile(xorp_and_tredy_hosts, login, password)
     update_params = {
-        'key': API_PUBLIC_KEY,
         'profile_id': profile_id,
         'address': nat_ip,
     }
-    response = make_request(xorp_and_tredy_hosts, 'update_nat', update_params)
-    make_verification(response)
+    provider.call('update_nat', **update_params)
 
 
-def test_no_traceback_provider(xorp_and_tredy_hosts):
+def test_no_traceback_provider(provider):
     """
     Негативный тест-кейс на проверку отсутствия трейсбэка
     с указанием доступных тарифов.
     """
-    params = {'key': API_PUBLIC_KEY}
-    response = make_request(xorp_and_tredy_hosts, 'non_existing_method', params)
+    response = provider.request('non_existing_method')
 
     error_message = 'Expected Status Code is 200, but we get {code}'.format(code=response.status_code)
 
     assert response.status_code == 200, error_message
 
-    try:
-        error = response.json()['error']
-    except KeyError:
-        pytest.fail('Ошибка поиска значения по ключу "error" в ответе: {}'.format(response.json()))
+    error = response.error
 
     message = error['message']
     searching_pattern = 'Available methods'